@@ -2,6 +2,22 @@
 from django.contrib import admin
 from .models import ClassSessions
 from .models import Booking
+from catalog.csv_export import Column, csv_export_action
+
+export_bookings = csv_export_action(
+    [
+        Column("id"),
+        Column("created_at"),
+        Column("user", "user.username"),
+        Column("session", "session.title"),
+        Column("session_id", default=False),
+        Column("day_selected"),
+        Column("price_at_booking"),
+        Column("is_cancelled"),
+    ],
+    filename="bookings.csv",
+    select_related=("user", "session"),
+)
 
 
 class readOnlyAdmin(admin.ModelAdmin):
@@ -23,6 +39,7 @@ class ClassSessionsAdmin(readOnlyAdmin):
 
 @admin.register(Booking)
 class BookingAdmin(readOnlyAdmin):
+    actions = (export_bookings,)
     list_display = ('session', 'user', 'day_selected', 'created_at', 'is_cancelled')
     list_filter = ('is_cancelled', 'day_selected', 'created_at')
     search_fields = ('user__username', 'session__title')
\ No newline at end of file
@@ -0,0 +1,59 @@
+"""
+Counter ``total_bookings`` / ``confirmed_bookings`` di ClassSessions.
+
+Semua perubahan lewat ``UPDATE ... SET x = x +/- 1`` (F expression), jadi
+aman dipanggil dari transaksi paralel tanpa read-modify-write di Python.
+
+- total_bookings      : +1 saat Booking dibuat, -1 saat dihapus (signal)
+- confirmed_bookings  : +1 di jalur checkout kelas (checkout/views.py, checkout/api.py),
+                        -1 saat booking terkonfirmasi / order item-nya dihapus (signal)
+
+``recount_booking_counters()`` menghitung ulang dari tabel booking
+(backfill migrasi & command ``recount_booking_counters``).
+"""
+from django.db.models import Count, F, Q
+
+from .models import ClassSessions
+
+CONFIRMED = Q(bookings__is_cancelled=False, bookings__order_items__isnull=False)
+
+
+def _shift(session_id, field, delta):
+    qs = ClassSessions.objects.filter(pk=session_id)
+    if delta < 0:
+        qs = qs.filter(**{f"{field}__gte": -delta})  # jangan sampai negatif kalau counter sempat drift
+    qs.update(**{field: F(field) + delta})
+
+
+def booking_created(session_id):
+    _shift(session_id, "total_bookings", 1)
+
+
+def booking_deleted(session_id, was_confirmed):
+    _shift(session_id, "total_bookings", -1)
+    if was_confirmed:
+        _shift(session_id, "confirmed_bookings", -1)
+
+
+def booking_confirmed(session_id):
+    _shift(session_id, "confirmed_bookings", 1)
+
+
+def booking_unconfirmed(session_id):
+    _shift(session_id, "confirmed_bookings", -1)
+
+
+def recount_booking_counters(sessions=None):
+    """Hitung ulang counter dari tabel booking; return jumlah sesi yang berubah."""
+    qs = (sessions if sessions is not None else ClassSessions.objects.all()).annotate(
+        n_total=Count("bookings", distinct=True),
+        n_confirmed=Count("bookings", filter=CONFIRMED, distinct=True),
+    )
+    changed = 0
+    for s in qs.only("id", "total_bookings", "confirmed_bookings").iterator(chunk_size=500):
+        if (s.total_bookings, s.confirmed_bookings) != (s.n_total, s.n_confirmed):
+            ClassSessions.objects.filter(pk=s.pk).update(
+                total_bookings=s.n_total, confirmed_bookings=s.n_confirmed,
+            )
+            changed += 1
+    return changed
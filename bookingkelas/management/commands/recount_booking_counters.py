@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from bookingkelas.counters import recount_booking_counters
+
+
+class Command(BaseCommand):
+    help = "Hitung ulang total_bookings / confirmed_bookings ClassSessions dari tabel Booking (perbaikan drift)."
+
+    def handle(self, *args, **options):
+        changed = recount_booking_counters()
+        self.stdout.write(self.style.SUCCESS(f"Selesai: {changed} kelas diperbaiki."))
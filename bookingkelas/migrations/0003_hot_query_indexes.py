@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookingkelas', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', 'session', 'is_cancelled'], name='booking_user_sess_cancel_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('is_cancelled', False)), fields=['user', '-created_at'], name='booking_active_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('is_cancelled', False)), fields=['session'], name='booking_active_session_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:57
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_counters(apps, schema_editor):
+    ClassSessions = apps.get_model("bookingkelas", "ClassSessions")
+    sessions = ClassSessions.objects.annotate(
+        n_total=Count("bookings", distinct=True),
+        n_confirmed=Count(
+            "bookings",
+            filter=Q(bookings__is_cancelled=False, bookings__order_items__isnull=False),
+            distinct=True,
+        ),
+    ).filter(Q(n_total__gt=0) | Q(n_confirmed__gt=0))
+    for s in sessions.iterator(chunk_size=500):
+        ClassSessions.objects.filter(pk=s.pk).update(total_bookings=s.n_total, confirmed_bookings=s.n_confirmed)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookingkelas', '0003_hot_query_indexes'),
+        ('checkout', '0003_alter_bookingorderitem_booking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='classsessions',
+            name='confirmed_bookings',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='classsessions',
+            name='total_bookings',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='classsessions',
+            index=models.Index(fields=['-total_bookings', '-id'], name='class_total_bookings_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='classsessions',
+            index=models.Index(fields=['category', '-total_bookings', '-id'], name='class_cat_total_bookings_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='classsessions',
+            index=models.Index(fields=['-confirmed_bookings', '-id'], name='class_confirmed_bookings_idx'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -35,9 +35,33 @@ class ClassSessions(models.Model):
     room = models.CharField(max_length=5)
     days = models.JSONField(default=list, blank=True)
     time = models.CharField(max_length=255, choices=TIME_SLOTS)
-    
+
+    # counter denormalisasi untuk widget kelas populer (dijaga bookingkelas/counters.py)
+    total_bookings = models.PositiveIntegerField(default=0, editable=False)      # semua booking
+    confirmed_bookings = models.PositiveIntegerField(default=0, editable=False)  # aktif + sudah dibayar
+    COUNTER_FIELDS = ("total_bookings", "confirmed_bookings")
+
+    class Meta:
+        indexes = [
+            # landing_view: top-N per total booking (semua / per kategori)
+            models.Index(fields=["-total_bookings", "-id"], name="class_total_bookings_idx"),
+            models.Index(fields=["category", "-total_bookings", "-id"], name="class_cat_total_bookings_idx"),
+            # popular_sessions_json: top-N per booking terkonfirmasi
+            models.Index(fields=["-confirmed_bookings", "-id"], name="class_confirmed_bookings_idx"),
+        ]
+
     def __str__(self):
         return f"{self.title} - Rp{self.price:,}"
+
+    def save(self, *args, **kwargs):
+        # counter hanya diubah lewat UPDATE atomik (counters.py); save() biasa (admin form dll.)
+        # jangan menimpanya dengan nilai lama di memori
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
     
     @property
     def is_full(self):
@@ -51,6 +75,18 @@ class Booking(models.Model):
     price_at_booking = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0"))
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # cek "sudah booking?" di book_daily_session / book_session_flutter / checkout
+            models.Index(fields=["user", "session", "is_cancelled"], name="booking_user_sess_cancel_idx"),
+            # daftar booking aktif user (my_bookings) ORDER BY -created_at
+            models.Index(fields=["user", "-created_at"], condition=models.Q(is_cancelled=False),
+                         name="booking_active_user_idx"),
+            # hitung booking aktif per sesi
+            models.Index(fields=["session"], condition=models.Q(is_cancelled=False),
+                         name="booking_active_session_idx"),
+        ]
+
     def __str__(self):
         return f"{self.session.title} ({self.user.username})"
 
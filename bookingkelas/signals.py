@@ -0,0 +1,35 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from catalog.versioning import bump_catalog_version
+from checkout.models import BookingOrderItem
+from . import counters
+from .models import Booking, ClassSessions
+
+
+# jadwal/kapasitas kelas ikut versi katalog (sessions_json di-cache per versi)
+@receiver(post_save, sender=ClassSessions)
+@receiver(post_delete, sender=ClassSessions)
+def _bump_catalog_version(sender, **kwargs):
+    bump_catalog_version()
+
+
+# counter booking di ClassSessions (lihat bookingkelas/counters.py)
+@receiver(post_save, sender=Booking)
+def _count_new_booking(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.booking_created(instance.session_id)
+
+
+@receiver(pre_delete, sender=Booking)
+def _uncount_deleted_booking(sender, instance, **kwargs):
+    # pre_delete: order item (SET_NULL) masih menunjuk booking ini
+    was_confirmed = not instance.is_cancelled and instance.order_items.exists()
+    counters.booking_deleted(instance.session_id, was_confirmed)
+
+
+@receiver(post_delete, sender=BookingOrderItem)
+def _uncount_deleted_order_item(sender, instance, **kwargs):
+    booking = Booking.objects.filter(pk=instance.booking_id, is_cancelled=False).first() if instance.booking_id else None
+    if booking is not None and not booking.order_items.exists():
+        counters.booking_unconfirmed(booking.session_id)
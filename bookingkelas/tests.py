@@ -8,6 +8,8 @@ User = get_user_model()
 @override_settings(LOGIN_URL="/user/login/")
 class CatalogAndJsonTests(TestCase):
     def setUp(self):
+        from django.core.cache import cache
+        cache.clear()  # sessions_json di-cache per versi katalog
         self.client = Client()
         self.user = User.objects.create_user(username="user", password="pass")
         self.client.login(username="user", password="pass")
@@ -128,6 +130,26 @@ class CatalogAndJsonTests(TestCase):
         self.assertEqual(data["sessions"][0]["category_display"], "pilates")
         self.assertIn("Friday", data["sessions"][0]["days_names"])
 
+    def test_sessions_json_etag_changes_when_session_saved(self):
+        from bookingkelas.models import ClassSessions
+        with self.captureOnCommitCallbacks(execute=True):
+            s = ClassSessions.objects.create(
+                title="Yoga Flow - Monday", category="daily", instructor="Coach A",
+                capacity_max=10, price=50000, room="R1", days=["0"], time="08:00",
+            )
+        url = reverse("bookingkelas:sessions_json")
+        first = self.client.get(url)
+        etag = first["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            s.capacity_current = 4
+            s.save()
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp["ETag"], etag)
+        self.assertEqual(resp.json()["sessions"][0]["capacity_current"], 4)
+
     def test_sessions_json_requires_login(self):
         self.client.logout()
         resp = self.client.get(reverse("bookingkelas:sessions_json"))
@@ -457,4 +479,80 @@ class AdminViewsTests(TestCase):
 
         resp = self.client.post(reverse("bookingkelas:add_session"), {"title": ""})
         self.assertEqual(resp.status_code, 302)
-        self.assertIn(reverse("bookingkelas:catalog"), resp.url)
\ No newline at end of file
+        self.assertIn(reverse("bookingkelas:catalog"), resp.url)
+
+class BookingCounterTests(TestCase):
+    def setUp(self):
+        from bookingkelas.models import ClassSessions
+        self.user = User.objects.create_user(username="member", password="pass")
+        self.client.login(username="member", password="pass")
+        make = lambda title, category: ClassSessions.objects.create(
+            title=title, category=category, instructor="Coach", price=100000,
+            room="R1", time="10.00 AM - 11.30 AM", days=["mon"],
+        )
+        self.daily = make("Mat Basics - Monday", "daily")
+        self.weekly = make("Reformer Flow", "weekly")
+
+    def _book(self, session, user=None):
+        from bookingkelas.models import Booking
+        return Booking.objects.create(user=user or self.user, session=session, price_at_booking=100000)
+
+    def _counts(self, session):
+        session.refresh_from_db()
+        return session.total_bookings, session.confirmed_bookings
+
+    def test_checkout_confirms_and_delete_decrements(self):
+        booking = self._book(self.daily)
+        self.assertEqual(self._counts(self.daily), (1, 0))
+        resp = self.client.post(reverse("checkout:booking_checkout", args=[booking.id]))
+        self.assertEqual(resp.status_code, 302)
+        self.assertEqual(self._counts(self.daily), (1, 1))
+
+        other = User.objects.create_user(username="other", password="pass")
+        pending = self._book(self.daily, other)
+        self.assertEqual(self._counts(self.daily), (2, 1))
+        pending.delete()
+        booking.delete()
+        self.assertEqual(self._counts(self.daily), (0, 0))
+
+    def test_api_checkout_and_order_item_delete(self):
+        from checkout.models import BookingOrderItem
+        booking = self._book(self.weekly)
+        resp = self.client.post(reverse("checkout:booking_checkout_api", args=[booking.id]))
+        self.assertTrue(resp.json()["success"])
+        self.assertEqual(self._counts(self.weekly), (1, 1))
+        BookingOrderItem.objects.filter(booking=booking).delete()
+        self.assertEqual(self._counts(self.weekly), (1, 0))
+
+    def test_plain_save_does_not_clobber_counters(self):
+        stale = type(self.daily).objects.get(pk=self.daily.pk)
+        self._book(self.daily)
+        stale.description = "edited in admin"
+        stale.save()
+        self.assertEqual(self._counts(self.daily), (1, 0))
+        self.assertEqual(self.daily.description, "edited in admin")
+
+    def test_popular_widgets_read_counters(self):
+        booking = self._book(self.weekly)
+        self._book(self.daily)
+        self._book(self.daily, User.objects.create_user(username="b", password="pass"))
+        self.client.post(reverse("checkout:booking_checkout_api", args=[booking.id]))
+
+        data = self.client.get(reverse("bookingkelas:popular_sessions_json")).json()["sessions"]
+        self.assertEqual([(s["id"], s["num_bookings"]) for s in data], [(self.weekly.id, 1)])
+
+        ctx = self.client.get(reverse("main:landing")).context
+        self.assertEqual([(s["id"], s["num_bookings"]) for s in ctx["sessions"]],
+                         [(self.daily.id, 2), (self.weekly.id, 1)])
+        self.assertEqual([s["id"] for s in ctx["daily_classes"]], [self.daily.id])
+        self.assertEqual([s["id"] for s in ctx["weekly_classes"]], [self.weekly.id])
+
+    def test_recount_command_repairs_drift(self):
+        from io import StringIO
+        from django.core.management import call_command
+        self._book(self.daily)
+        type(self.daily).objects.filter(pk=self.daily.pk).update(total_bookings=7, confirmed_bookings=3)
+        out = StringIO()
+        call_command("recount_booking_counters", stdout=out)
+        self.assertIn("1 kelas diperbaiki", out.getvalue())
+        self.assertEqual(self._counts(self.daily), (1, 0))
@@ -9,7 +9,7 @@ from .forms import SessionsForm, AdminSessionsForm, AdminSessionEditForm
 from decimal import Decimal
 import json
 from django.views.decorators.csrf import csrf_exempt
-from django.db.models import Count, Q
+from catalog.versioning import catalog_cached
 
 def admin_check(u): return u.is_staff
 
@@ -88,6 +88,7 @@ def catalog(request):
     }
     return render(request, "show_class.html", context)
 
+@catalog_cached()
 def sessions_json(request):
     qs = ClassSessions.objects.all().order_by("title")
     weekday_map = _weekday_map()
@@ -439,11 +440,11 @@ def my_bookings_flutter(request):
 
 def popular_sessions_json(request):
 
+    # confirmed_bookings = booking aktif yang sudah dibayar (bookingkelas/counters.py)
     qs = (
         ClassSessions.objects
-        .annotate(num_bookings=Count("bookings", filter=Q(bookings__is_cancelled=False, bookings__order_items__isnull=False)))
-        .filter(num_bookings__gt=0)
-        .order_by("-num_bookings", "-id")
+        .filter(confirmed_bookings__gt=0)
+        .order_by("-confirmed_bookings", "-id")
     )[:6]
 
     weekday_map = _weekday_map()
@@ -463,7 +464,7 @@ def popular_sessions_json(request):
             "days_names": [weekday_map.get(str(d), str(d)) for d in days],
             "time": s.time,
             "is_full": s.is_full,
-            "num_bookings": s.num_bookings,
+            "num_bookings": s.confirmed_bookings,
             "description": s.description,
         })
     return JsonResponse({"sessions": data})
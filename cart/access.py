@@ -0,0 +1,75 @@
+"""
+Akses cart user tanpa membuat row di jalur baca.
+
+    get_cart(request)                         -> Cart, atau EmptyCart kalau belum punya (tanpa INSERT)
+    get_cart_for_update(request)              -> Cart terkunci (select_for_update), dibuat kalau belum ada
+    get_cart_for_update(request, create=False)-> Cart terkunci atau None
+
+Row Cart baru dibuat saat mutasi pertama yang butuh (add). cart_id disimpan
+di session + di-memo per request, jadi lookup berikutnya lewat primary key.
+"""
+from .models import Cart, CartItem, CartItemTombstone
+
+SESSION_KEY = "cart_id"
+
+
+class EmptyCart:
+    """Pengganti Cart read-only untuk user yang belum pernah menambah item."""
+
+    pk = cart_id = None
+    total_items = selected_count = selected_qty = version = 0
+
+    def __init__(self, user):
+        self.user = user
+
+    @property
+    def items(self):
+        return CartItem.objects.none()
+
+    @property
+    def tombstones(self):
+        return CartItemTombstone.objects.none()
+
+    def counters(self) -> dict:
+        return {name: 0 for name in Cart.COUNTER_FIELDS}
+
+
+def _remember(request, cart):
+    request._cart = cart
+    session = getattr(request, "session", None)
+    if session is not None and session.get(SESSION_KEY) != str(cart.pk):
+        session[SESSION_KEY] = str(cart.pk)
+
+
+def _lookup(request, qs):
+    qs = qs.filter(user=request.user)  # id dari session tetap dicocokkan dengan user
+    session = getattr(request, "session", None)
+    cart_id = session.get(SESSION_KEY) if session is not None else None
+    if cart_id:
+        cart = qs.filter(pk=cart_id).first()
+        if cart is not None:
+            return cart
+        session.pop(SESSION_KEY, None)  # cart lama sudah dihapus / id basi
+    return qs.first()
+
+
+def get_cart(request):
+    cart = getattr(request, "_cart", None)
+    if cart is not None:
+        return cart
+    cart = _lookup(request, Cart.objects.all())
+    if cart is None:
+        cart = EmptyCart(request.user)
+        request._cart = cart
+        return cart
+    _remember(request, cart)
+    return cart
+
+
+def get_cart_for_update(request, create=True):
+    cart = _lookup(request, Cart.objects.select_for_update())
+    if cart is None and create:
+        cart, _ = Cart.objects.select_for_update().get_or_create(user=request.user)
+    if cart is not None:
+        _remember(request, cart)
+    return cart
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Cart, CartItem
+from .models import Cart, CartItem, StockHold
 
 
 class ReadOnlyAdmin(admin.ModelAdmin):
@@ -30,7 +30,7 @@ class CartAdmin(ReadOnlyAdmin):
     ordering = ("user__username",)
 
     def total_items_display(self, obj: Cart):
-        return obj.total_items()
+        return obj.total_items
 
     total_items_display.short_description = "Total Items"
 
@@ -58,3 +58,11 @@ class CartItemAdmin(ReadOnlyAdmin):
         return obj.cart.user.username
 
     user_username.short_description = "User"
+
+
+@admin.register(StockHold)
+class StockHoldAdmin(ReadOnlyAdmin):
+    list_display = ("id", "cart", "product", "quantity", "expires_at")
+    search_fields = ("cart__user__username", "product__product_name")
+    ordering = ("expires_at",)
+    list_select_related = ("cart__user", "product")
@@ -1,5 +1,6 @@
 # cart/api.py
 import json
+import uuid
 
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse, HttpResponseBadRequest
@@ -7,9 +8,27 @@ from django.shortcuts import get_object_or_404
 from django.views.decorators.csrf import csrf_exempt
 from django.db import transaction
 
-from .models import Cart, CartItem
+from . import reservations
+from .models import CartItem
 from catalog.models import Product
-from .views import _selected_qty 
+from .access import EmptyCart, get_cart, get_cart_for_update
+from .views import _cart_counters, _cart_delta, _parse_since
+
+MAX_BATCH_OPS = 100
+
+
+def _serialize_item(it):
+    p = it.product
+    return {
+        "id": it.id,
+        "product_id": str(p.pk),  # UUID -> string
+        "product_name": getattr(p, "product_name", getattr(p, "name", str(p))),
+        "price": getattr(p, "price", 0),
+        "thumbnail": getattr(p, "thumbnail", "") or getattr(p, "image_url", ""),
+        "quantity": it.quantity,
+        "is_selected": it.is_selected,
+        "subtotal": it.quantity * getattr(p, "price", 0),
+    }
 
 @login_required
 @csrf_exempt
@@ -18,7 +37,11 @@ def cart_list_flutter(request):
         return HttpResponseBadRequest("GET required")
 
     
-    cart, _ = Cart.objects.get_or_create(user=request.user)
+    cart = get_cart(request)  # belum punya cart -> EmptyCart, tanpa INSERT
+    # ?since=<version>: hanya item berubah + id item terhapus, atau {"unchanged": true}
+    delta = _cart_delta(cart, _parse_since(request), _serialize_item)
+    if delta is not None:
+        return JsonResponse(delta)
     qs = cart.items.select_related("product")
 
     selected = request.GET.get("selected")
@@ -27,26 +50,14 @@ def cart_list_flutter(request):
     elif selected == "0":
         qs = qs.filter(is_selected=False)
 
-    items = []
-    for it in qs:
-        p = it.product
-        items.append({
-            "id": it.id,
-            "product_id": str(p.pk),  # UUID -> string
-            "product_name": getattr(p, "product_name", getattr(p, "name", str(p))),
-            "price": getattr(p, "price", 0),
-            "thumbnail": getattr(p, "thumbnail", "") or getattr(p, "image_url", ""),
-            "quantity": it.quantity,
-            "is_selected": it.is_selected,
-            "subtotal": it.quantity * getattr(p, "price", 0),
-        })
+    items = [_serialize_item(it) for it in qs]
 
     return JsonResponse({
         "ok": True,
         "message": "",
-        "total_items": cart.total_items(),
-        "selected_count": cart.items.filter(is_selected=True).count(),
-        "selected_qty": _selected_qty(cart),
+        "version": cart.version,
+        "delta": False,
+        **_cart_counters(cart, refresh=False),
         "items": items,
     })
 
@@ -82,9 +93,8 @@ def add_to_cart_flutter(request):
     if qty <= 0:
         return HttpResponseBadRequest("quantity must be > 0")
 
-    # lock product & cart untuk safety stok
-    product = get_object_or_404(Product.objects.select_for_update(), pk=product_id)
-    cart, _ = Cart.objects.select_for_update().get_or_create(user=request.user)
+    # product tanpa lock; batas stok dicek di UPDATE kondisional (reservations.add_item)
+    product = get_object_or_404(Product, pk=product_id)
 
     # cek stok
     if product.stock <= 0 or not getattr(product, "inStock", True):
@@ -93,28 +103,21 @@ def add_to_cart_flutter(request):
             "message": "Product is out of stock.",
         })
 
-    # kalau item sudah ada, tambahin quantity
-    item, created = CartItem.objects.select_for_update().get_or_create(
-        cart=cart,
-        product=product,
-        defaults={"quantity": qty, "is_selected": True},
-    )
+    cart = get_cart_for_update(request)  # mutasi pertama -> row cart dibuat di sini
 
-    if not created:
-        new_qty = item.quantity + qty
-        if new_qty > product.stock:
-            return JsonResponse({
-                "ok": False,
-                "message": f"Exceeding stock. Only {product.stock} left.",
-                "current_quantity": item.quantity,
-            })
-        item.quantity = new_qty
-        item.save(update_fields=["quantity"])
+    # kalau item sudah ada, tambahin quantity (selama masih <= stok)
+    status, _, quantity = reservations.add_item(cart, product, qty)
+    if status == "exceeds":
+        return JsonResponse({
+            "ok": False,
+            "message": f"Exceeding stock. Only {reservations.available(cart, product)} left.",
+            "current_quantity": quantity,
+        })
 
     return JsonResponse({
         "ok": True,
         "message": f"'{getattr(product, 'product_name', str(product))}' added to cart.",
-        "cart_count": cart.total_items(),
+        "cart_count": cart.counters()["total_items"],
     })
 
 @login_required
@@ -139,11 +142,11 @@ def set_quantity_flutter(request):
     except (TypeError, ValueError):
         return HttpResponseBadRequest("quantity must be integer")
 
-    cart, _ = Cart.objects.select_for_update().get_or_create(user=request.user)
+    cart = get_cart_for_update(request, create=False)
     item = get_object_or_404(
         CartItem.objects.select_for_update().select_related("product"),
         pk=item_id,
-        cart=cart,
+        cart_id=getattr(cart, "pk", None),
     )
     product = item.product
 
@@ -155,17 +158,17 @@ def set_quantity_flutter(request):
             "message": "Product is out of stock.",
             "item_id": item_id,
             "quantity": 0,
-            "selected_qty": _selected_qty(cart),
+            **_cart_counters(cart),
         })
 
-    # kalau qty minta lebih besar dr stok
-    if qty > product.stock:
+    # kalau qty minta lebih besar dr stok (reservasi aktif -> hold sekalian disesuaikan)
+    if not reservations.fits(cart, product, qty):
         return JsonResponse({
             "ok": False,
-            "message": f"Exceeding stock. Only {product.stock} left.",
+            "message": f"Exceeding stock. Only {reservations.available(cart, product)} left.",
             "item_id": item_id,
             "quantity": item.quantity,
-            "selected_qty": _selected_qty(cart),
+            **_cart_counters(cart, refresh=False),
         })
 
     # kalau qty <= 0 -> remove
@@ -176,7 +179,7 @@ def set_quantity_flutter(request):
             "message": "Item removed from cart.",
             "item_id": item_id,
             "quantity": 0,
-            "selected_qty": _selected_qty(cart),
+            **_cart_counters(cart),
         })
 
     # normal update
@@ -188,7 +191,7 @@ def set_quantity_flutter(request):
         "message": None,
         "item_id": item_id,
         "quantity": qty,
-        "selected_qty": _selected_qty(cart),
+        **_cart_counters(cart),
     })
 
 @login_required
@@ -208,17 +211,15 @@ def remove_item_flutter(request):
     if item_id is None:
         return HttpResponseBadRequest("item_id is required")
 
-    cart, _ = Cart.objects.select_for_update().get_or_create(user=request.user)
-    item = get_object_or_404(CartItem, pk=item_id, cart=cart)
+    cart = get_cart_for_update(request, create=False)
+    item = get_object_or_404(CartItem, pk=item_id, cart_id=getattr(cart, "pk", None))
     item.delete()
 
     return JsonResponse({
         "ok": True,
         "message": "Item removed from cart.",
         "item_id": item_id,
-        "total_items": cart.total_items(),
-        "selected_count": cart.items.filter(is_selected=True).count(),
-        "selected_qty": _selected_qty(cart),
+        **_cart_counters(cart),
     })
 
 @login_required
@@ -233,8 +234,9 @@ def clear_cart_flutter(request):
     except json.JSONDecodeError: 
         return HttpResponseBadRequest("Invalid JSON")
 
-    cart, _ = Cart.objects.select_for_update().get_or_create(user=request.user)
-    cart.clear()
+    cart = get_cart_for_update(request, create=False)
+    if cart is not None:
+        cart.clear()
 
     return JsonResponse({
         "ok": True,
@@ -266,8 +268,8 @@ def toggle_select_flutter(request):
     if not isinstance(is_selected, bool):
         return HttpResponseBadRequest("is_selected must be boolean")
 
-    cart, _ = Cart.objects.select_for_update().get_or_create(user=request.user)
-    item = get_object_or_404(CartItem, pk=item_id, cart=cart)
+    cart = get_cart_for_update(request, create=False)
+    item = get_object_or_404(CartItem, pk=item_id, cart_id=getattr(cart, "pk", None))
 
     item.is_selected = is_selected
     item.save(update_fields=["is_selected"])
@@ -277,8 +279,7 @@ def toggle_select_flutter(request):
         "message": "Selection updated.",
         "item_id": item_id,
         "is_selected": item.is_selected,
-        "selected_count": cart.items.filter(is_selected=True).count(),
-        "selected_qty": _selected_qty(cart),
+        **_cart_counters(cart),
     })
 
 @login_required
@@ -293,15 +294,14 @@ def select_all_flutter(request):
     except json.JSONDecodeError: 
         return HttpResponseBadRequest("Invalid JSON")
 
-    cart, _ = Cart.objects.select_for_update().get_or_create(user=request.user)
-    cart.items.update(is_selected=True)
+    cart = get_cart_for_update(request, create=False) or EmptyCart(request.user)
+    if cart.pk is not None:
+        cart.select_all(True)
 
     return JsonResponse({
         "ok": True,
         "message": "All items selected.",
-        "selected_count": cart.items.filter(is_selected=True).count(),
-        "total_items": cart.total_items(),
-        "selected_qty": _selected_qty(cart),
+        **_cart_counters(cart),
     })
 
 @login_required
@@ -316,13 +316,195 @@ def unselect_all_flutter(request):
     except json.JSONDecodeError: 
         return HttpResponseBadRequest("Invalid JSON")
 
-    cart, _ = Cart.objects.select_for_update().get_or_create(user=request.user)
-    cart.items.update(is_selected=False)
+    cart = get_cart_for_update(request, create=False) or EmptyCart(request.user)
+    if cart.pk is not None:
+        cart.select_all(False)
 
     return JsonResponse({
         "ok": True,
         "message": "Selection cleared.",
-        "selected_count": 0,
-        "total_items": cart.total_items(),
-        "selected_qty": 0,
+        **_cart_counters(cart),
+    })
+
+# batch: beberapa aksi cart dalam 1 request / 1 transaksi / 1 kali lock
+def _batch_int(value, key):
+    try:
+        return int(value), None
+    except (TypeError, ValueError):
+        return None, f"{key} must be integer"
+
+
+def _batch_item(items, op):
+    """(item, error) untuk ``op["item_id"]``; id dari JSON bisa string ("12") atau bukan angka."""
+    item_id, error = _batch_int(op.get("item_id"), "item_id")
+    if error:
+        return None, {"ok": False, "message": error}
+    item = items.get(item_id)
+    if item is None:
+        return None, {"ok": False, "message": "Item not found."}
+    return item, None
+
+
+def _batch_set_qty(items, op, cart):
+    item, error = _batch_item(items, op)
+    if error:
+        return error
+    qty, error = _batch_int(op.get("quantity"), "quantity")
+    if error:
+        return {"ok": False, "message": error}
+    product = item.product
+    if not getattr(product, "inStock", True) or product.stock <= 0:
+        del items[item.id]  # sebelum delete(): Django mengosongkan pk setelah delete
+        item.delete()
+        return {"ok": False, "message": "Product is out of stock.", "quantity": 0}
+    # cart yang sudah dikunci view, bukan item.cart (query ulang per op)
+    if not reservations.fits(cart, product, qty):
+        return {
+            "ok": False,
+            "message": f"Exceeding stock. Only {reservations.available(cart, product)} left.",
+            "quantity": item.quantity,
+        }
+    if qty <= 0:
+        del items[item.id]
+        item.delete()
+        return {"ok": True, "message": "Item removed from cart.", "quantity": 0}
+    item.quantity = qty
+    item.save(update_fields=["quantity"])
+    return {"ok": True, "message": None, "quantity": qty}
+
+
+def _batch_toggle(items, op, cart):
+    item, error = _batch_item(items, op)
+    if error:
+        return error
+    if not isinstance(op.get("is_selected"), bool):
+        return {"ok": False, "message": "is_selected must be boolean"}
+    item.is_selected = op["is_selected"]
+    item.save(update_fields=["is_selected"])
+    return {"ok": True, "message": "Selection updated.", "is_selected": item.is_selected}
+
+
+def _batch_remove(items, op, cart):
+    item, error = _batch_item(items, op)
+    if error:
+        return error
+    del items[item.id]
+    item.delete()
+    return {"ok": True, "message": "Item removed from cart.", "quantity": 0}
+
+
+def _batch_add(items, op, cart, products):
+    qty, error = _batch_int(op.get("quantity", 1), "quantity")
+    if error:
+        return {"ok": False, "message": error}
+    if qty <= 0:
+        return {"ok": False, "message": "quantity must be > 0"}
+    try:
+        product = products.get(str(uuid.UUID(str(op.get("product_id")))))
+    except ValueError:
+        product = None
+    if product is None:
+        return {"ok": False, "message": "Product not found."}
+    if product.stock <= 0 or not getattr(product, "inStock", True):
+        return {"ok": False, "message": "Product is out of stock."}
+
+    status, item_id, quantity = reservations.add_item(cart, product, qty)
+    if status == "exceeds":
+        return {
+            "ok": False,
+            "message": f"Exceeding stock. Only {reservations.available(cart, product)} left.",
+            "item_id": item_id,
+            "quantity": quantity,
+        }
+    if item_id in items:
+        items[item_id].quantity = quantity  # ditulis lewat UPDATE kondisional
+    else:
+        items[item_id] = CartItem.objects.select_related("product").get(pk=item_id)
+    return {
+        "ok": True,
+        "message": f"'{getattr(product, 'product_name', str(product))}' added to cart.",
+        "item_id": item_id,
+        "quantity": quantity,
+    }
+
+
+BATCH_OPS = {
+    "set_qty": _batch_set_qty,
+    "toggle": _batch_toggle,
+    "remove": _batch_remove,
+}
+
+
+@login_required
+@csrf_exempt
+@transaction.atomic
+def cart_batch_flutter(request):
+    """
+    Request:
+    {
+      "ops": [
+        {"op": "set_qty", "item_id": 1, "quantity": 3},
+        {"op": "toggle", "item_id": 2, "is_selected": false},
+        {"op": "remove", "item_id": 3},
+        {"op": "add", "product_id": "<uuid>", "quantity": 1}
+      ]
+    }
+    Op dijalankan berurutan; op yang gagal dilaporkan di ``results`` tanpa
+    membatalkan op lain (sama seperti endpoint per-aksi yang balas ok=false).
+    Response: {"ok": semua op sukses, "results": [...], total_items, selected_count,
+    selected_qty, "items": [...] (isi cart akhir)}
+    """
+    if request.method != "POST":
+        return HttpResponseBadRequest("POST required")
+
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return HttpResponseBadRequest("Invalid JSON")
+
+    ops = data.get("ops") if isinstance(data, dict) else None
+    if not isinstance(ops, list) or not ops:
+        return HttpResponseBadRequest("ops must be a non-empty list")
+    if len(ops) > MAX_BATCH_OPS:
+        return HttpResponseBadRequest(f"At most {MAX_BATCH_OPS} ops per batch")
+
+    # product untuk op add dibaca tanpa lock (batas stok dicek di UPDATE item); yang dikunci cuma cart + item
+    product_ids = set()
+    for op in ops:
+        if isinstance(op, dict) and op.get("op") == "add":
+            try:
+                product_ids.add(uuid.UUID(str(op.get("product_id"))))
+            except ValueError:
+                pass  # dilaporkan "Product not found." di hasil op-nya
+    products = {}
+    if product_ids:
+        products = {str(p.pk): p for p in Product.objects.filter(pk__in=product_ids)}
+
+    # cart baru dibuat kalau batch berisi op add; tanpa cart, op lain cukup "Item not found."
+    has_add = any(isinstance(op, dict) and op.get("op") == "add" for op in ops)
+    cart = get_cart_for_update(request, create=has_add) or EmptyCart(request.user)
+    items = {
+        it.id: it
+        for it in cart.items.select_for_update().select_related("product").order_by("id")
+    }
+
+    results = []
+    for index, op in enumerate(ops):
+        name = op.get("op") if isinstance(op, dict) else None
+        if name == "add":
+            result = _batch_add(items, op, cart, products)
+        elif name in BATCH_OPS:
+            result = BATCH_OPS[name](items, op, cart)
+        else:
+            result = {"ok": False, "message": f"Unknown op: {name!r}"}
+        result = {"index": index, "op": name, **result}
+        if name in BATCH_OPS:
+            result.setdefault("item_id", op.get("item_id"))
+        results.append(result)
+
+    return JsonResponse({
+        "ok": all(r["ok"] for r in results),
+        "results": results,
+        **_cart_counters(cart),
+        "items": [_serialize_item(it) for it in sorted(items.values(), key=lambda it: it.id)],
     })
@@ -0,0 +1,149 @@
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, transaction
+
+from cart.models import Cart, CartItem
+from catalog.models import Product
+
+
+def _add_locked(user_id, product_id):
+    """Alur add-to-cart lama: lock row Product dulu, baru cart + item."""
+    product = Product.objects.select_for_update().get(pk=product_id)
+    cart = Cart.objects.select_for_update().get(user_id=user_id)
+    item, created = CartItem.objects.select_for_update().get_or_create(
+        cart=cart, product=product, defaults={"quantity": 1, "is_selected": True},
+    )
+    if not created and item.quantity + 1 <= product.stock:
+        item.quantity += 1
+        item.save(update_fields=["quantity"])
+
+
+def _add_atomic(user_id, product_id):
+    """Alur sekarang: Product dibaca tanpa lock, batas stok dicek di UPDATE item."""
+    product = Product.objects.get(pk=product_id)
+    cart = Cart.objects.select_for_update().get(user_id=user_id)
+    cart.add_within_stock(product, 1)
+
+
+MODES = {"locked": _add_locked, "atomic": _add_atomic}
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _is_throwaway_db():
+    """DB test Django (test_*) atau SQLite in-memory: aman dipakai benchmark."""
+    name = str(connection.settings_dict.get("NAME") or "")
+    test_name = connection.settings_dict.get("TEST", {}).get("NAME")
+    return (
+        name == ":memory:" or "mode=memory" in name
+        or Path(name).name.startswith("test_")
+        or (test_name is not None and name == str(test_name))
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark contention add-to-cart di 1 SKU yang sama: N thread (shopper berbeda) "
+        "menambah produk yang sama berulang-ulang, mode 'locked' (select_for_update Product) "
+        "vs 'atomic' (UPDATE kondisional). Setiap add di-rollback; data benchmark (1 produk + "
+        "user) dibuat sementara lalu dihapus. Hanya jalan di DB test/sekali pakai kecuali diberi "
+        "--yes-i-know. Jalankan di Postgres; SQLite mengunci seluruh database per write jadi "
+        "angkanya tidak bermakna."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8, help="Jumlah shopper paralel.")
+        parser.add_argument("--ops", type=int, default=200, help="Add-to-cart per shopper.")
+        parser.add_argument(
+            "--hold-ms", type=float, default=2.0,
+            help="Sisa kerja request setelah add (render respons, dll.) selama transaksi masih terbuka.",
+        )
+        parser.add_argument("--mode", choices=["both", *MODES], default="both")
+        parser.add_argument(
+            "--yes-i-know", action="store_true",
+            help="Izinkan jalan di DB yang bukan DB test (membuat lalu menghapus user & produk sementara).",
+        )
+
+    def handle(self, *args, **opts):
+        threads, ops = opts["threads"], opts["ops"]
+        if threads < 1 or ops < 1:
+            raise CommandError("--threads dan --ops minimal 1")
+        if not opts["yes_i_know"] and not _is_throwaway_db():
+            raise CommandError(
+                f"DB '{connection.settings_dict.get('NAME')}' bukan DB test. Benchmark menulis user & produk "
+                "sementara; jalankan di DB sekali pakai atau tambahkan --yes-i-know."
+            )
+        if connection.vendor == "sqlite":
+            self.stdout.write(self.style.WARNING(
+                "SQLite: write diserialisasi per database, hasil tidak mewakili Postgres."
+            ))
+
+        tag = uuid.uuid4().hex[:8]
+        User = get_user_model()
+        product = Product.objects.create(
+            product_name=f"bench-hot-sku-{tag}", description="benchmark add-to-cart",
+            price=1, stock=threads * ops + 1,
+        )
+        users = [User.objects.create(username=f"bench-cart-{tag}-{i}") for i in range(threads)]
+        for user in users:
+            Cart.objects.get_or_create(user=user)
+
+        try:
+            modes = list(MODES) if opts["mode"] == "both" else [opts["mode"]]
+            results = {}
+            for mode in modes:
+                results[mode] = self._run(MODES[mode], users, product.pk, ops, opts["hold_ms"] / 1000)
+                done, errors, elapsed = results[mode]
+                self.stdout.write(
+                    f"{mode:>6}: {done} add dalam {elapsed:.2f}s = {done / elapsed:.0f} add/s"
+                    + (f" ({errors} gagal)" if errors else "")
+                )
+            if len(results) == 2:
+                speedup = (results["atomic"][0] / results["atomic"][2]) / max(
+                    results["locked"][0] / results["locked"][2], 1e-9
+                )
+                self.stdout.write(self.style.SUCCESS(f"atomic vs locked: {speedup:.1f}x throughput"))
+        finally:
+            User.objects.filter(pk__in=[u.pk for u in users]).delete()  # cascade cart + item
+            product.delete()
+
+    def _run(self, add, users, product_id, ops, hold):
+        done = [0] * len(users)
+        errors = [0] * len(users)
+        start = threading.Barrier(len(users) + 1)
+
+        def worker(slot, user_id):
+            start.wait()
+            try:
+                for _ in range(ops):
+                    try:
+                        # lock tetap dipegang sampai akhir transaksi, lalu semua perubahan di-rollback
+                        with transaction.atomic():
+                            add(user_id, product_id)
+                            if hold:
+                                time.sleep(hold)
+                            raise _Rollback
+                    except _Rollback:
+                        done[slot] += 1
+                    except OperationalError:
+                        errors[slot] += 1
+            finally:
+                connection.close()  # koneksi per thread
+
+        workers = [
+            threading.Thread(target=worker, args=(slot, user.pk)) for slot, user in enumerate(users)
+        ]
+        for t in workers:
+            t.start()
+        start.wait()
+        began = time.perf_counter()
+        for t in workers:
+            t.join()
+        return sum(done), sum(errors), time.perf_counter() - began
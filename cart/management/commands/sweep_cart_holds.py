@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cart.reservations import SWEEP_BATCH_SIZE, sweep_expired
+
+
+class Command(BaseCommand):
+    help = (
+        "Lepas reservasi stok (StockHold) yang sudah expired dan kembalikan ke stok tersedia. "
+        "Sekali jalan (cron) atau terus-menerus dengan --every <detik>."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=SWEEP_BATCH_SIZE, help="Hold per transaksi.")
+        parser.add_argument("--every", type=float, default=0, help="Ulangi tiap N detik (0 = sekali jalan).")
+
+    def handle(self, *args, **opts):
+        if opts["batch_size"] < 1:
+            raise CommandError("--batch-size minimal 1")
+        while True:
+            released = sweep_expired(batch_size=opts["batch_size"])
+            if released or not opts["every"]:
+                self.stdout.write(self.style.SUCCESS(f"Selesai: {released} hold dilepas."))
+            if not opts["every"]:
+                return
+            time.sleep(opts["every"])
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0002_initial'),
+        ('catalog', '0007_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cartitem',
+            index=models.Index(fields=['cart', 'is_selected'], name='cart_item_cart_selected_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:03
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_counters(apps, schema_editor):
+    Cart = apps.get_model("cart", "Cart")
+    carts = Cart.objects.annotate(
+        n_total=Sum("items__quantity"),
+        n_selected=Count("items", filter=Q(items__is_selected=True)),
+        n_selected_qty=Sum("items__quantity", filter=Q(items__is_selected=True)),
+    ).filter(n_total__gt=0)
+    for c in carts.iterator(chunk_size=500):
+        Cart.objects.filter(pk=c.pk).update(
+            total_items=c.n_total, selected_count=c.n_selected, selected_qty=c.n_selected_qty or 0,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0003_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='selected_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='selected_qty',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='total_items',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
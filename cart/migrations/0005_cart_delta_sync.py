@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0004_cart_counters'),
+        ('catalog', '0007_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CartItemTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_id', models.BigIntegerField()),
+                ('version', models.PositiveBigIntegerField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='cartitem',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='cartitem',
+            index=models.Index(fields=['cart', 'version'], name='cart_item_cart_version_idx'),
+        ),
+        migrations.AddField(
+            model_name='cartitemtombstone',
+            name='cart',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tombstones', to='cart.cart'),
+        ),
+        migrations.AddIndex(
+            model_name='cartitemtombstone',
+            index=models.Index(fields=['cart', 'version'], name='cart_tombstone_version_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0005_cart_delta_sync'),
+        ('catalog', '0008_product_reserved'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('expires_at', models.DateTimeField()),
+                ('cart', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='holds', to='cart.cart')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds', to='catalog.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['expires_at'], name='cart_hold_expires_idx')],
+                'constraints': [models.UniqueConstraint(fields=('cart', 'product'), name='uniq_hold_per_cart_product')],
+            },
+        ),
+    ]
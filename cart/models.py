@@ -1,6 +1,7 @@
 from django.db import models
 from django.conf import settings
-from django.db.models import Sum
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
 import uuid
 
 class Cart(models.Model):
@@ -11,6 +12,17 @@ class Cart(models.Model):
         related_name="cart",
     )
 
+    # counter denormalisasi, di-update (F expression) di transaksi yang sama dengan
+    # setiap perubahan CartItem (lihat cart/signals.py) -> respons cart cukup baca 1 baris
+    total_items = models.PositiveIntegerField(default=0, editable=False)     # sum(quantity)
+    selected_count = models.PositiveIntegerField(default=0, editable=False)  # jumlah item terpilih
+    selected_qty = models.PositiveIntegerField(default=0, editable=False)    # sum(quantity) item terpilih
+    COUNTER_FIELDS = ("total_items", "selected_count", "selected_qty")
+
+    # naik 1 di setiap write CartItem; dipakai delta sync (?since=<version>)
+    version = models.PositiveBigIntegerField(default=0, editable=False)
+    DELTA_WINDOW = 1000  # tombstone item terhapus disimpan selama sekian versi terakhir
+
     def __str__(self):
         return f"Cart({self.user.username})"
 
@@ -26,6 +38,44 @@ class Cart(models.Model):
             item.save(update_fields=["quantity"])
         return item
 
+    def add_within_stock(self, product, qty: int = 1):
+        """
+        Tambah ``qty`` produk tanpa mengunci row Product:
+
+            UPDATE item SET quantity = quantity + qty WHERE quantity + qty <= stok produk
+
+        (stok dibaca di dalam UPDATE itu sendiri), atau INSERT kalau item belum ada.
+        Caller memegang lock row cart (``get_cart_for_update``), jadi INSERT untuk
+        cart yang sama tidak bisa bentrok dan versi item/cart tetap berurutan;
+        shopper lain yang menambah produk yang sama tidak saling menunggu.
+
+        Return (status, item_id, quantity): status "added" / "created" / "exceeds"
+        (quantity = isi cart sekarang, item_id None kalau item belum ada).
+        """
+        Product = CartItem._meta.get_field("product").related_model
+        stock = Subquery(Product.objects.filter(pk=OuterRef("product_id")).values("stock")[:1])
+        items = CartItem.objects.filter(cart_id=self.pk, product_id=product.pk)
+
+        # .update() tidak lewat signal -> versi item & counter cart diset langsung
+        if items.filter(quantity__lte=stock - qty).update(
+            quantity=F("quantity") + qty, version=next_version_expr(self.pk)
+        ):
+            selected_qty = Coalesce(
+                Subquery(items.filter(is_selected=True).annotate(v=Value(qty)).values("v")[:1]),
+                0, output_field=IntegerField(),
+            )
+            apply_counter_delta(self.pk, {"total_items": qty, "selected_qty": selected_qty})
+            item_id, quantity = items.values_list("id", "quantity").get()
+            return "added", item_id, quantity
+
+        row = items.values_list("id", "quantity").first()
+        if row is not None:
+            return "exceeds", row[0], row[1]
+        if qty > product.stock:
+            return "exceeds", None, 0
+        item = self.items.create(product=product, quantity=qty, is_selected=True)  # counter via signal
+        return "created", item.id, qty
+
     def set_quantity(self, product, qty: int): #update atau delete
         try:
             item = self.items.get(product=product)
@@ -43,9 +93,59 @@ class Cart(models.Model):
 
     def clear(self): # delete all
         self.items.all().delete()
+        Cart.objects.filter(pk=self.pk).update(total_items=0, selected_count=0, selected_qty=0)
+
+    def select_all(self, selected: bool = True): # select / unselect semua item
+        # .update() tidak lewat signal -> counter & versi diset langsung di sini;
+        # hanya item yang benar-benar berubah yang ikut versi baru
+        n = (self.items.exclude(is_selected=selected)
+             .update(is_selected=selected, version=next_version_expr(self.pk)))
+        if not n:
+            return
+        Cart.objects.filter(pk=self.pk).update(
+            selected_count=F("selected_count") + n if selected else 0,
+            selected_qty=F("total_items") if selected else 0,
+            version=F("version") + 1,
+        )
+
+    def counters(self) -> dict:
+        """Baca ulang counter dari DB (1 query) & sinkronkan ke instance ini."""
+        row = Cart.objects.filter(pk=self.pk).values(*self.COUNTER_FIELDS).get()
+        for name, value in row.items():
+            setattr(self, name, value)
+        return row
+
+    def recount(self) -> dict:
+        """Hitung ulang counter dari tabel CartItem (perbaikan kalau sempat drift)."""
+        row = self.items.aggregate(
+            total_items=Sum("quantity"),
+            selected_count=Count("id", filter=Q(is_selected=True)),
+            selected_qty=Sum("quantity", filter=Q(is_selected=True)),
+        )
+        row = {k: v or 0 for k, v in row.items()}
+        Cart.objects.filter(pk=self.pk).update(**row)
+        for name, value in row.items():
+            setattr(self, name, value)
+        return row
+
+
+def apply_counter_delta(cart_id, delta):
+    """
+    ``delta``: {counter: int atau expression}; counter tidak pernah turun di bawah 0.
+    Versi cart selalu ikut naik (dipanggil untuk setiap write CartItem).
+    """
+    changes = {name: Greatest(F(name) + value, 0) for name, value in delta.items()}
+    Cart.objects.filter(pk=cart_id).update(version=F("version") + 1, **changes)
+
+
+def current_version_expr(cart_id):
+    """Versi cart saat ini sebagai subquery (dipakai di INSERT/UPDATE tanpa SELECT terpisah)."""
+    return Subquery(Cart.objects.filter(pk=cart_id).values("version")[:1])
+
+
+def next_version_expr(cart_id):
+    return Subquery(Cart.objects.filter(pk=cart_id).annotate(v=F("version") + 1).values("v")[:1])
 
-    def total_items(self) -> int:
-        return self.items.aggregate(total=Sum("quantity"))["total"] or 0
 
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name="items") # 1 cart bisa punya banyak item
@@ -54,6 +154,7 @@ class CartItem(models.Model):
     )
     quantity = models.PositiveIntegerField(default=1)
     is_selected = models.BooleanField(default=True)
+    version = models.PositiveBigIntegerField(default=0, editable=False)  # Cart.version saat terakhir ditulis
 
     class Meta:
         constraints = [ # 1 produk gabisa di double di cart yg sama
@@ -61,6 +162,56 @@ class CartItem(models.Model):
                 fields=["cart", "product"], name="uniq_product_per_cart"
             )
         ]
+        indexes = [
+            # checkout / cart_json?selected=1: items.filter(is_selected=True)
+            models.Index(fields=["cart", "is_selected"], name="cart_item_cart_selected_idx"),
+            # delta sync: items.filter(version__gt=since)
+            models.Index(fields=["cart", "version"], name="cart_item_cart_version_idx"),
+        ]
 
     def __str__(self):
         return f"{getattr(self.product, 'product_name', str(self.product))} x {self.quantity}"
+
+    def save(self, *args, **kwargs):
+        # versi item diisi signal pre_save (lihat cart/signals.py), jadi selalu ikut ditulis
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = set(update_fields) | {"version"}
+        super().save(*args, **kwargs)
+
+
+class CartItemTombstone(models.Model):
+    """Jejak item yang dihapus, supaya delta sync bisa mengirim id yang hilang."""
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name="tombstones")
+    item_id = models.BigIntegerField()
+    version = models.PositiveBigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["cart", "version"], name="cart_tombstone_version_idx"),
+        ]
+
+
+class StockHold(models.Model):
+    """
+    Reservasi stok sementara milik cart (lihat cart/reservations.py).
+    ``quantity`` ikut dihitung di ``Product.reserved`` sampai hold dijual di checkout,
+    dilepas (item dihapus) atau disapu setelah ``expires_at`` lewat.
+    """
+    # SET_NULL: hold dari cart yang dihapus tetap tercatat sampai disapu, jadi stoknya kembali
+    cart = models.ForeignKey(Cart, on_delete=models.SET_NULL, null=True, blank=True, related_name="holds")
+    product = models.ForeignKey("catalog.Product", on_delete=models.CASCADE, related_name="holds")
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["cart", "product"], name="uniq_hold_per_cart_product"),
+        ]
+        indexes = [
+            # sweeper: expires_at <= now ORDER BY expires_at
+            models.Index(fields=["expires_at"], name="cart_hold_expires_idx"),
+        ]
+
+    def __str__(self):
+        return f"Hold({self.product_id} x {self.quantity})"
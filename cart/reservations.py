@@ -0,0 +1,176 @@
+"""
+Reservasi stok (hold) untuk item cart - opsional, aktif kalau
+``settings.CART_HOLD_TTL`` > 0 (detik).
+
+    Product.stock     stok fisik, hanya turun saat checkout
+    Product.reserved  total yang sedang di-hold (= sum StockHold.quantity produk itu)
+    tersedia          stock - reserved
+
+- add-to-cart / ubah quantity: hold cart untuk produk itu diset sama dengan
+  quantity item lewat 1 UPDATE kondisional di Product (``stock >= reserved + tambahan``),
+  TTL ikut diperpanjang. Hapus item -> hold dilepas (signal post_delete CartItem).
+- checkout (``take_stock``): hold diubah jadi penjualan, ``stock`` & ``reserved``
+  turun di UPDATE yang sama. Bagian yang tidak ter-hold (hold sudah disapu) diambil
+  dari stok tersedia dengan syarat yang sama - tidak ada select_for_update Product.
+- hold yang lewat ``expires_at`` dilepas ``manage.py sweep_cart_holds`` per batch.
+  Hold expired yang belum disapu tetap berlaku.
+
+Kalau nonaktif tidak ada hold sama sekali: add-to-cart lewat ``Cart.add_within_stock``
+dan checkout hanya memakai UPDATE kondisional ``stock >= quantity``.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from catalog.models import Product
+from catalog.versioning import bump_catalog_version
+
+from .models import StockHold
+
+SWEEP_BATCH_SIZE = 500
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product):
+        super().__init__(product)
+        self.product = product
+
+
+def hold_ttl() -> int:
+    return int(getattr(settings, "CART_HOLD_TTL", 0) or 0)
+
+
+def enabled() -> bool:
+    return hold_ttl() > 0
+
+
+def _unreserve(product_id, qty):
+    if qty:
+        Product.objects.filter(pk=product_id).update(reserved=Greatest(F("reserved") - qty, 0))
+
+
+def _set_hold(cart_id, product_id, quantity) -> bool:
+    hold = StockHold.objects.select_for_update().filter(cart_id=cart_id, product_id=product_id).first()
+    diff = quantity - (hold.quantity if hold else 0)
+    if diff > 0:
+        taken = Product.objects.filter(pk=product_id, stock__gte=F("reserved") + diff).update(
+            reserved=F("reserved") + diff
+        )
+        if not taken:
+            return False  # hold lama dibiarkan apa adanya
+    elif diff < 0:
+        _unreserve(product_id, -diff)
+
+    if quantity <= 0:
+        if hold is not None:
+            hold.delete()
+        return True
+    expires_at = timezone.now() + timedelta(seconds=hold_ttl())
+    if hold is None:
+        StockHold.objects.create(cart_id=cart_id, product_id=product_id, quantity=quantity, expires_at=expires_at)
+    else:
+        hold.quantity, hold.expires_at = quantity, expires_at
+        hold.save(update_fields=["quantity", "expires_at"])
+    return True
+
+
+def release(cart_id, product_id):
+    with transaction.atomic():  # bisa dipanggil dari on_commit (hapus item setelah checkout)
+        _set_hold(cart_id, product_id, 0)
+
+
+def fits(cart, product, quantity) -> bool:
+    """
+    Quantity target item cart muat di stok? Kalau reservasi aktif, hold-nya
+    sekalian diset ke ``quantity`` (quantity <= 0 -> hold dilepas).
+    """
+    if not enabled():
+        return quantity <= product.stock
+    return _set_hold(cart.pk, product.pk, quantity)
+
+
+def available(cart, product) -> int:
+    """Stok yang masih bisa dipakai cart ini (untuk pesan "Only N left")."""
+    if not enabled():
+        return product.stock
+    held = (StockHold.objects.filter(cart_id=cart.pk, product_id=product.pk)
+            .values_list("quantity", flat=True).first()) or 0
+    row = Product.objects.filter(pk=product.pk).values_list("stock", "reserved").first()
+    return max(row[0] - row[1] + held, 0) if row else 0
+
+
+def add_item(cart, product, qty):
+    """
+    Tambah ``qty`` produk ke cart (cart sudah dikunci caller). Return sama dengan
+    ``Cart.add_within_stock``: (status, item_id, quantity).
+    """
+    if not enabled():
+        return cart.add_within_stock(product, qty)
+    row = cart.items.filter(product=product).values_list("id", "quantity").first()
+    item_id, current = row or (None, 0)
+    if not _set_hold(cart.pk, product.pk, current + qty):
+        return "exceeds", item_id, current
+    item = cart.add(product, qty)
+    return ("added" if row else "created"), item.id, item.quantity
+
+
+def take_stock(cart, items):
+    """
+    Kurangi stok untuk item checkout (di dalam transaksi checkout). Hold cart
+    untuk produk itu dipakai dulu; sisanya harus muat di stok tersedia.
+    Raise ``InsufficientStock`` (transaksi caller harus di-rollback).
+    Produk yang habis ditandai inStock=False.
+    """
+    items = sorted(items, key=lambda ci: str(ci.product_id))  # urutan lock tetap antar checkout
+    product_ids = [ci.product_id for ci in items]
+    holds = {
+        h.product_id: h.quantity
+        for h in StockHold.objects.select_for_update().filter(cart_id=cart.pk, product_id__in=product_ids)
+    }
+    for ci in items:
+        held = holds.get(ci.product_id, 0)
+        # stok - hold cart lain harus cukup untuk seluruh quantity item ini
+        taken = Product.objects.filter(pk=ci.product_id, stock__gte=F("reserved") - held + ci.quantity).update(
+            stock=F("stock") - ci.quantity,
+            reserved=Greatest(F("reserved") - held, 0),
+        )
+        if not taken:
+            raise InsufficientStock(ci.product)
+    if holds:
+        StockHold.objects.filter(cart_id=cart.pk, product_id__in=list(holds)).delete()
+
+    Product.objects.filter(pk__in=product_ids, stock__lte=0, inStock=True).update(inStock=False)
+    # stok diubah lewat .update() (tanpa signal) -> naikkan versi katalog manual
+    bump_catalog_version()
+
+
+def sweep_expired(batch_size=SWEEP_BATCH_SIZE, now=None) -> int:
+    """
+    Lepas hold yang sudah lewat ``expires_at``, ``batch_size`` row per transaksi.
+    Row yang sedang dikunci checkout dilewati (skip_locked). Return jumlah hold dilepas.
+    """
+    now = now or timezone.now()
+    released = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                StockHold.objects.select_for_update(skip_locked=True)
+                .filter(expires_at__lte=now)
+                .order_by("expires_at")
+                .values_list("id", "product_id", "quantity")[:batch_size]
+            )
+            if not batch:
+                return released
+            StockHold.objects.filter(id__in=[row[0] for row in batch]).delete()
+            per_product = {}
+            for _, product_id, qty in batch:
+                per_product[product_id] = per_product.get(product_id, 0) + qty
+            for product_id in sorted(per_product, key=str):
+                _unreserve(product_id, per_product[product_id])
+        released += len(batch)
+        if len(batch) < batch_size:
+            return released
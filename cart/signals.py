@@ -0,0 +1,103 @@
+"""
+Counter Cart (total_items / selected_count / selected_qty) mengikuti setiap
+perubahan CartItem, dalam transaksi yang sama.
+
+Nilai lama row dibaca lewat subquery di dalam UPDATE cart itu sendiri (bukan
+dari instance di memori yang bisa basi), jadi tiap save/delete item = 1 UPDATE.
+UPDATE yang sama menaikkan ``Cart.version``; item yang ditulis mendapat versi
+baru itu dan item yang dihapus meninggalkan ``CartItemTombstone`` (delta sync).
+``CartItem.objects.update()`` tidak lewat signal -> pakai ``Cart.select_all``
+atau ``Cart.recount()``.
+"""
+from django.db.models import F, IntegerField, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.contrib.auth import get_user_model
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import reservations
+from .models import Cart, CartItem, CartItemTombstone, apply_counter_delta, current_version_expr
+
+
+def _old(item_pk, expr, selected_only=False):
+    """Nilai ``expr`` dari row item di DB (0 kalau row belum ada / tidak terpilih)."""
+    qs = CartItem.objects.filter(pk=item_pk)
+    if selected_only:
+        qs = qs.filter(is_selected=True)
+    return Coalesce(Subquery(qs.annotate(v=expr).values("v")[:1]), 0, output_field=IntegerField())
+
+
+@receiver(pre_save, sender=CartItem)
+def _count_saved_item(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    qty = instance.quantity
+    if instance._state.adding or instance.pk is None:
+        # row baru: tidak ada nilai lama
+        apply_counter_delta(instance.cart_id, {
+            "total_items": qty,
+            "selected_count": int(instance.is_selected),
+            "selected_qty": qty if instance.is_selected else 0,
+        })
+        instance.version = current_version_expr(instance.cart_id)
+        return
+
+    pk = instance.pk
+    writes_qty = update_fields is None or "quantity" in update_fields
+    writes_sel = update_fields is None or "is_selected" in update_fields
+    delta = {}
+    if writes_qty and writes_sel:
+        delta["total_items"] = Value(qty) - _old(pk, F("quantity"))
+        delta["selected_count"] = Value(int(instance.is_selected)) - _old(pk, Value(1), selected_only=True)
+        delta["selected_qty"] = Value(qty if instance.is_selected else 0) - _old(pk, F("quantity"), selected_only=True)
+    elif writes_qty:
+        delta["total_items"] = Value(qty) - _old(pk, F("quantity"))
+        delta["selected_qty"] = _old(pk, Value(qty) - F("quantity"), selected_only=True)
+    elif writes_sel:
+        if instance.is_selected:
+            delta["selected_count"] = Value(1) - _old(pk, Value(1), selected_only=True)
+            delta["selected_qty"] = _old(pk, F("quantity")) - _old(pk, F("quantity"), selected_only=True)
+        else:
+            delta["selected_count"] = -_old(pk, Value(1), selected_only=True)
+            delta["selected_qty"] = -_old(pk, F("quantity"), selected_only=True)
+    apply_counter_delta(instance.cart_id, delta)
+    instance.version = current_version_expr(instance.cart_id)
+
+
+@receiver(post_save, sender=CartItem)
+def _defer_item_version(sender, instance, raw=False, **kwargs):
+    # nilai versi ada di DB (hasil subquery); jadikan deferred, dibaca ulang hanya kalau dipakai
+    if not raw:
+        instance.__dict__.pop("version", None)
+
+
+@receiver(pre_delete, sender=CartItem)
+def _uncount_deleted_item(sender, instance, origin=None, **kwargs):
+    pk = instance.pk
+    apply_counter_delta(instance.cart_id, {
+        "total_items": -_old(pk, F("quantity")),
+        "selected_count": -_old(pk, Value(1), selected_only=True),
+        "selected_qty": -_old(pk, F("quantity"), selected_only=True),
+    })
+    if not _deleting_cart(origin):
+        CartItemTombstone.objects.create(
+            cart_id=instance.cart_id, item_id=pk, version=current_version_expr(instance.cart_id),
+        )
+        # tombstone di luar jendela delta tidak pernah dibaca lagi (client di-full sync)
+        CartItemTombstone.objects.filter(
+            cart_id=instance.cart_id, version__lt=current_version_expr(instance.cart_id) - Cart.DELTA_WINDOW,
+        ).delete()
+
+
+@receiver(post_delete, sender=CartItem)
+def _release_deleted_item_hold(sender, instance, **kwargs):
+    # item dihapus -> stok yang di-hold untuknya kembali tersedia
+    if reservations.enabled():
+        reservations.release(instance.cart_id, instance.product_id)
+
+
+def _deleting_cart(origin):
+    """Item ikut terhapus karena cart / user-nya dihapus -> tidak perlu tombstone."""
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model in (Cart, get_user_model())
@@ -1,8 +1,16 @@
-from django.test import TestCase, Client
+import json
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, Client, override_settings
+from django.utils import timezone
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 
-from cart.models import Cart, CartItem
+from cart import reservations
+from cart.models import Cart, CartItem, StockHold
 from catalog.models import Product
 
 User = get_user_model()
@@ -203,3 +211,366 @@ class CartViewTests(TestCase):
         i2.refresh_from_db()
         self.assertFalse(i1.is_selected)
         self.assertFalse(i2.is_selected)
+
+
+class CartCountersTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="counter", password="pass12345")
+        self.client.login(username="counter", password="pass12345")
+        self.cart = Cart.objects.create(user=self.user)
+        self.ring = Product.objects.create(product_name="Pilates Ring", price=150000, stock=5)
+        self.roller = Product.objects.create(product_name="Foam Roller", price=200000, stock=5)
+
+    def _counters(self):
+        self.cart.refresh_from_db()
+        return (self.cart.total_items, self.cart.selected_count, self.cart.selected_qty)
+
+    def test_item_changes_keep_counters_in_sync(self):
+        ring = self.cart.add(self.ring, 2)
+        roller = self.cart.add(self.roller, 1)
+        self.assertEqual(self._counters(), (3, 2, 3))
+        self.cart.set_quantity(self.ring, 4)
+        self.assertEqual(self._counters(), (5, 2, 5))
+        roller.is_selected = False
+        roller.save(update_fields=["is_selected"])
+        self.assertEqual(self._counters(), (5, 1, 4))
+        self.cart.select_all(True)
+        self.assertEqual(self._counters(), (5, 2, 5))
+        self.cart.select_all(False)
+        self.assertEqual(self._counters(), (5, 0, 0))
+        ring.delete()
+        self.assertEqual(self._counters(), (1, 0, 0))
+        self.roller.delete()  # cascade CartItem
+        self.assertEqual(self._counters(), (0, 0, 0))
+
+    def test_mutation_responses_read_counters_in_one_query(self):
+        item = CartItem.objects.create(cart=self.cart, product=self.ring, quantity=1)
+        CartItem.objects.create(cart=self.cart, product=self.roller, quantity=2, is_selected=False)
+
+        resp = self.client.post(reverse("cart:toggle_select", args=[item.pk]), {"is_selected": "0"})
+        self.assertEqual(
+            {k: resp.json()[k] for k in Cart.COUNTER_FIELDS},
+            {"total_items": 3, "selected_count": 0, "selected_qty": 0},
+        )
+        resp = self.client.post(reverse("cart:set_qty", args=[item.pk]), {"quantity": "3"})
+        self.assertEqual(resp.json()["total_items"], 5)
+
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse("cart:json"))
+        self.assertFalse([q for q in ctx.captured_queries if "SUM(" in q["sql"] or "COUNT(" in q["sql"]])
+
+        resp = self.client.post(
+            reverse("cart:flutter_select_all"), "{}", content_type="application/json",
+        )
+        self.assertEqual(resp.json()["selected_qty"], 5)
+
+    def test_recount_repairs_drift(self):
+        self.cart.add(self.ring, 2)
+        Cart.objects.filter(pk=self.cart.pk).update(total_items=9, selected_count=9, selected_qty=9)
+        self.assertEqual(self.cart.recount(), {"total_items": 2, "selected_count": 1, "selected_qty": 2})
+
+
+class CartBatchFlutterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="batch", password="pass12345")
+        self.client.login(username="batch", password="pass12345")
+        self.cart = Cart.objects.create(user=self.user)
+        self.ring = Product.objects.create(product_name="Pilates Ring", price=150000, stock=5)
+        self.roller = Product.objects.create(product_name="Foam Roller", price=200000, stock=2)
+        self.strap = Product.objects.create(product_name="Yoga Strap", price=50000, stock=3)
+        self.ring_item = CartItem.objects.create(cart=self.cart, product=self.ring, quantity=1)
+        self.roller_item = CartItem.objects.create(cart=self.cart, product=self.roller, quantity=1)
+
+    def _batch(self, ops):
+        return self.client.post(
+            reverse("cart:flutter_batch"), json.dumps({"ops": ops}), content_type="application/json",
+        )
+
+    def test_applies_ops_in_order_and_returns_final_state(self):
+        resp = self._batch([
+            {"op": "set_qty", "item_id": self.ring_item.id, "quantity": 4},
+            {"op": "toggle", "item_id": self.roller_item.id, "is_selected": False},
+            {"op": "add", "product_id": str(self.strap.pk), "quantity": 2},
+            {"op": "add", "product_id": str(self.strap.pk)},
+            {"op": "remove", "item_id": self.roller_item.id},
+        ])
+        data = resp.json()
+        self.assertTrue(data["ok"])
+        self.assertEqual([r["index"] for r in data["results"]], [0, 1, 2, 3, 4])
+        self.assertEqual(data["results"][3]["quantity"], 3)
+        self.assertEqual(
+            {(it["product_id"], it["quantity"]) for it in data["items"]},
+            {(str(self.ring.pk), 4), (str(self.strap.pk), 3)},
+        )
+        self.assertEqual(
+            (data["total_items"], data["selected_count"], data["selected_qty"]), (7, 2, 7),
+        )
+        self.assertFalse(CartItem.objects.filter(pk=self.roller_item.pk).exists())
+
+    def test_failed_ops_are_reported_without_aborting_batch(self):
+        resp = self._batch([
+            {"op": "set_qty", "item_id": self.roller_item.id, "quantity": 9},
+            {"op": "add", "product_id": "not-a-uuid"},
+            {"op": "toggle", "item_id": 999999, "is_selected": True},
+            {"op": "explode"},
+            {"op": "set_qty", "item_id": self.ring_item.id, "quantity": 2},
+        ])
+        data = resp.json()
+        self.assertFalse(data["ok"])
+        self.assertEqual([r["ok"] for r in data["results"]], [False, False, False, False, True])
+        self.assertIn("Only 2 left", data["results"][0]["message"])
+        self.ring_item.refresh_from_db()
+        self.assertEqual(self.ring_item.quantity, 2)
+
+    def test_item_ids_are_coerced_and_cart_is_not_refetched(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self._batch([
+                {"op": "set_qty", "item_id": str(self.ring_item.id), "quantity": 3},
+                {"op": "toggle", "item_id": "abc", "is_selected": True},
+                {"op": "remove", "item_id": [1]},
+            ])
+        results = resp.json()["results"]
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([r["ok"] for r in results], [True, False, False])
+        self.assertEqual(results[1]["message"], "item_id must be integer")
+        self.ring_item.refresh_from_db()
+        self.assertEqual(self.ring_item.quantity, 3)
+        self.assertFalse(any('FROM "cart_cart" WHERE "cart_cart"."id"' in q["sql"] for q in ctx.captured_queries))
+
+    def test_set_qty_zero_and_out_of_stock_remove_the_item(self):
+        Product.objects.filter(pk=self.roller.pk).update(stock=0, inStock=False)
+        resp = self._batch([
+            {"op": "set_qty", "item_id": self.ring_item.id, "quantity": 0},
+            {"op": "set_qty", "item_id": self.roller_item.id, "quantity": 1},
+        ])
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        self.assertEqual([(r["ok"], r["quantity"]) for r in data["results"]], [(True, 0), (False, 0)])
+        self.assertEqual(data["items"], [])
+        self.assertFalse(CartItem.objects.filter(cart=self.cart).exists())
+
+    def test_rejects_bad_payloads(self):
+        self.assertEqual(self._batch([]).status_code, 400)
+        self.assertEqual(self._batch([{"op": "remove"}] * 101).status_code, 400)
+        self.assertEqual(self._batch([{"op": "toggle", "item_id": 0, "is_selected": True}] * 100).status_code, 200)
+        resp = self.client.post(reverse("cart:flutter_batch"), "nope", content_type="application/json")
+        self.assertEqual(resp.status_code, 400)
+
+
+class CartDeltaSyncTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="sync", password="pass12345")
+        self.client.login(username="sync", password="pass12345")
+        self.cart = Cart.objects.create(user=self.user)
+        self.ring = Product.objects.create(product_name="Pilates Ring", price=150000, stock=5)
+        self.roller = Product.objects.create(product_name="Foam Roller", price=200000, stock=5)
+        self.ring_item = self.cart.add(self.ring, 1)
+        self.roller_item = self.cart.add(self.roller, 1)
+
+    def _list(self, name="cart:flutter_list", **params):
+        return self.client.get(reverse(name), params).json()
+
+    def test_version_bumps_on_every_item_write(self):
+        self.cart.refresh_from_db()
+        v = self.cart.version
+        self.assertEqual(v, 2)
+        self.cart.set_quantity(self.ring, 3)
+        self.cart.select_all(False)
+        self.cart.select_all(False)  # tidak ada yang berubah -> versi tetap
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.version, v + 2)
+        self.ring_item.refresh_from_db()
+        self.assertEqual(self.ring_item.version, self.cart.version)
+
+    def test_since_returns_unchanged_or_changes_only(self):
+        full = self._list()
+        self.assertFalse(full["delta"])
+        version = full["version"]
+        self.assertEqual(self._list(since=version), {"ok": True, "unchanged": True, "version": version})
+
+        self.client.post(reverse("cart:set_qty", args=[self.ring_item.id]), {"quantity": "2"})
+        self.client.post(reverse("cart:remove_ajax", args=[self.roller_item.id]))
+        delta = self._list(since=version)
+        self.assertTrue(delta["delta"])
+        self.assertEqual([(it["id"], it["quantity"]) for it in delta["changed"]], [(self.ring_item.id, 2)])
+        self.assertEqual(delta["removed"], [self.roller_item.id])
+        self.assertEqual(delta["total_items"], 2)
+
+        # cart_json (web) memakai mekanisme yang sama
+        web = self._list("cart:json", since=delta["version"])
+        self.assertTrue(web["unchanged"])
+
+    def test_unknown_or_stale_since_falls_back_to_full_list(self):
+        for since in ("999", "garbage", "-5"):
+            data = self._list(since=since)
+            self.assertFalse(data["delta"])
+            self.assertEqual(len(data["items"]), 2)
+        Cart.objects.filter(pk=self.cart.pk).update(version=Cart.DELTA_WINDOW + 10)
+        self.assertFalse(self._list(since=1)["delta"])
+
+    def test_deleting_user_does_not_write_tombstones(self):
+        from cart.models import CartItemTombstone
+        self.ring_item.delete()
+        self.assertEqual(CartItemTombstone.objects.count(), 1)
+        self.user.delete()
+        self.assertEqual(CartItemTombstone.objects.count(), 0)
+
+
+class LazyCartTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="browser", password="pass12345")
+        self.client.login(username="browser", password="pass12345")
+        self.ring = Product.objects.create(product_name="Pilates Ring", price=150000, stock=5)
+
+    def test_read_and_noop_paths_do_not_create_cart(self):
+        self.assertEqual(self.client.get(reverse("cart:page")).status_code, 200)
+        for name in ("cart:json", "cart:flutter_list"):
+            data = self.client.get(reverse(name)).json()
+            self.assertEqual((data["items"], data["total_items"], data["version"]), ([], 0, 0))
+        self.assertEqual(self.client.post(reverse("cart:select_all")).json()["selected_count"], 0)
+        self.assertTrue(self.client.post(reverse("cart:clear_ajax")).json()["ok"])
+        self.assertEqual(self.client.post(reverse("cart:toggle_select", args=[1]), {"is_selected": "1"}).status_code, 404)
+        self.assertFalse(Cart.objects.filter(user=self.user).exists())
+
+    def test_first_mutation_creates_cart_and_caches_id_in_session(self):
+        resp = self.client.post(reverse("cart:add", args=[self.ring.pk]), HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+        self.assertEqual(resp.json()["cart_count"], 1)
+        cart = Cart.objects.get(user=self.user)
+        self.assertEqual(self.client.session["cart_id"], str(cart.pk))
+        data = self.client.get(reverse("cart:flutter_list")).json()
+        self.assertEqual(len(data["items"]), 1)
+
+    def test_stale_session_cart_id_falls_back_to_user_lookup(self):
+        cart = Cart.objects.create(user=self.user)
+        cart.add(self.ring, 2)
+        session = self.client.session
+        session["cart_id"] = "00000000-0000-0000-0000-000000000000"
+        session.save()
+        self.assertEqual(self.client.get(reverse("cart:json")).json()["total_items"], 2)
+        self.assertEqual(self.client.session["cart_id"], str(cart.pk))
+
+
+class AtomicAddToCartTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="hotsku", password="pass12345")
+        self.client.login(username="hotsku", password="pass12345")
+        self.cart = Cart.objects.create(user=self.user)
+        self.ring = Product.objects.create(product_name="Pilates Ring", price=150000, stock=3)
+
+    def test_add_within_stock_is_bounded_by_stock_in_the_update(self):
+        self.assertEqual(self.cart.add_within_stock(self.ring, 2)[::2], ("created", 2))
+        self.assertEqual(self.cart.add_within_stock(self.ring, 1)[::2], ("added", 3))
+        self.assertEqual(self.cart.add_within_stock(self.ring, 1)[::2], ("exceeds", 3))
+        # stok diubah di luar request ini (restock admin): UPDATE membaca stok terbaru
+        Product.objects.filter(pk=self.ring.pk).update(stock=10)
+        self.assertEqual(self.cart.add_within_stock(self.ring, 7)[::2], ("added", 10))
+        self.assertEqual(self.cart.add_within_stock(self.ring, 1)[0], "exceeds")
+
+    def test_conditional_update_keeps_counters_and_version_in_sync(self):
+        status, item_id, _ = self.cart.add_within_stock(self.ring, 1)
+        self.cart.add_within_stock(self.ring, 1)
+        self.cart.refresh_from_db()
+        item = CartItem.objects.get(pk=item_id)
+        self.assertEqual((self.cart.total_items, self.cart.selected_count, self.cart.selected_qty), (2, 1, 2))
+        self.assertEqual((item.quantity, item.version), (2, self.cart.version))
+
+        item.is_selected = False
+        item.save(update_fields=["is_selected"])
+        self.cart.add_within_stock(self.ring, 1)
+        self.cart.refresh_from_db()
+        self.assertEqual((self.cart.total_items, self.cart.selected_count, self.cart.selected_qty), (3, 0, 0))
+        self.assertEqual(self.cart.recount(), {"total_items": 3, "selected_count": 0, "selected_qty": 0})
+
+    def test_views_report_stock_limit(self):
+        url = reverse("cart:add", args=[self.ring.pk])
+        for _ in range(3):
+            self.assertTrue(self.client.post(url, HTTP_X_REQUESTED_WITH="XMLHttpRequest").json()["ok"])
+        data = self.client.post(url, HTTP_X_REQUESTED_WITH="XMLHttpRequest").json()
+        self.assertEqual((data["ok"], data["warn"], data["cart_count"]), (False, True, 3))
+
+        payload = json.dumps({"product_id": str(self.ring.pk), "quantity": 1})
+        data = self.client.post(reverse("cart:flutter_add"), payload, content_type="application/json").json()
+        self.assertEqual((data["ok"], data["current_quantity"]), (False, 3))
+
+
+    def test_benchmark_refuses_non_test_database(self):
+        from unittest import mock
+        from django.core.management.base import CommandError
+        from django.db import connection
+        with mock.patch.dict(connection.settings_dict, {"NAME": "lume", "TEST": {}}):
+            with self.assertRaises(CommandError):
+                call_command("bench_add_to_cart", "--threads", "1", "--ops", "1", stdout=StringIO())
+        self.assertFalse(Product.objects.filter(product_name__startswith="bench-").exists())
+
+
+@override_settings(CART_HOLD_TTL=600)
+class StockHoldTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username="alice", password="pass12345")
+        self.bob = User.objects.create_user(username="bob", password="pass12345")
+        self.ring = Product.objects.create(product_name="Pilates Ring", price=150000, stock=3)
+        self.alice_cart = Cart.objects.create(user=self.alice)
+        self.bob_cart = Cart.objects.create(user=self.bob)
+
+    def _stock(self):
+        self.ring.refresh_from_db()
+        return self.ring.stock, self.ring.reserved
+
+    def test_add_holds_stock_against_other_carts(self):
+        self.assertEqual(reservations.add_item(self.alice_cart, self.ring, 2)[::2], ("created", 2))
+        self.assertEqual(self._stock(), (3, 2))
+        self.assertEqual(reservations.add_item(self.bob_cart, self.ring, 2)[::2], ("exceeds", 0))
+        self.assertEqual(reservations.add_item(self.bob_cart, self.ring, 1)[::2], ("created", 1))
+        self.assertEqual(reservations.available(self.alice_cart, self.ring), 2)
+
+        # turun quantity / hapus item -> hold ikut mengecil / dilepas
+        self.assertTrue(reservations.fits(self.alice_cart, self.ring, 1))
+        self.assertEqual(self._stock(), (3, 2))
+        self.bob_cart.items.get().delete()
+        self.assertEqual(self._stock(), (3, 1))
+        self.assertFalse(StockHold.objects.filter(cart=self.bob_cart).exists())
+
+    def test_checkout_converts_hold_and_rolls_back_on_shortage(self):
+        reservations.add_item(self.alice_cart, self.ring, 2)
+        reservations.add_item(self.bob_cart, self.ring, 1)
+        with transaction.atomic():
+            reservations.take_stock(self.alice_cart, list(self.alice_cart.items.all()))
+        self.assertEqual(self._stock(), (1, 1))
+        self.assertFalse(StockHold.objects.filter(cart=self.alice_cart).exists())
+
+        # hold bob sudah disapu & stoknya diambil orang lain -> checkout bob gagal utuh
+        StockHold.objects.filter(cart=self.bob_cart).delete()
+        Product.objects.filter(pk=self.ring.pk).update(stock=0, reserved=0)
+        with self.assertRaises(reservations.InsufficientStock):
+            with transaction.atomic():
+                reservations.take_stock(self.bob_cart, list(self.bob_cart.items.all()))
+        self.assertEqual(self._stock(), (0, 0))
+
+    def test_sweeper_releases_expired_holds_in_batches(self):
+        other = Product.objects.create(product_name="Foam Roller", price=200000, stock=5)
+        reservations.add_item(self.alice_cart, self.ring, 2)
+        reservations.add_item(self.alice_cart, other, 1)
+        reservations.add_item(self.bob_cart, self.ring, 1)
+        StockHold.objects.filter(cart=self.alice_cart).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        out = StringIO()
+        call_command("sweep_cart_holds", "--batch-size", "1", stdout=out)
+        self.assertIn("2 hold dilepas", out.getvalue())
+        self.assertEqual(self._stock(), (3, 1))
+        other.refresh_from_db()
+        self.assertEqual(other.reserved, 0)
+        self.assertEqual(reservations.sweep_expired(), 0)
+        # item cart tetap ada, hanya reservasinya yang hilang
+        self.assertEqual(self.alice_cart.items.count(), 2)
+
+    def test_plain_product_save_keeps_reserved(self):
+        stale = Product.objects.get(pk=self.ring.pk)  # reserved=0 di memori
+        reservations.add_item(self.alice_cart, self.ring, 2)
+        stale.price = 160000
+        stale.save()
+        self.assertEqual(self._stock(), (3, 2))
+        self.assertEqual(self.ring.price, 160000)
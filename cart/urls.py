@@ -32,4 +32,5 @@ urlpatterns = [
     path("flutter/toggle/", api.toggle_select_flutter, name="flutter_toggle"),
     path("flutter/select-all/", api.select_all_flutter, name="flutter_select_all"),
     path("flutter/unselect-all/", api.unselect_all_flutter, name="flutter_unselect_all"),
+    path("flutter/batch/", api.cart_batch_flutter, name="flutter_batch"),
 ]
@@ -4,19 +4,60 @@ from django.shortcuts import get_object_or_404, render, redirect
 from django.views.decorators.http import require_POST, require_GET
 from django.db import transaction
 from django.http import JsonResponse, HttpResponseBadRequest
-from django.db.models import Sum
 from django.urls import reverse, NoReverseMatch
 from django.contrib import messages
 
+from . import reservations
+from .access import EmptyCart, get_cart, get_cart_for_update
 from .models import Cart, CartItem
 from .forms import CartItemQuantityForm
 from catalog.models import Product
 
 
 # helpers 
-def _selected_qty(cart) -> int:
-    """Jumlah total quantity yang TERPILIH (is_selected=True)."""
-    return cart.items.filter(is_selected=True).aggregate(q=Sum("quantity"))["q"] or 0
+def _cart_counters(cart, refresh=True) -> dict:
+    """
+    total_items / selected_count / selected_qty untuk respons cart.
+    Dibaca dari kolom counter Cart (1 query); refresh=False kalau cart baru saja di-load
+    dan belum ada perubahan item di request ini.
+    """
+    if refresh:
+        return cart.counters()
+    return {name: getattr(cart, name) for name in Cart.COUNTER_FIELDS}
+
+
+def _parse_since(request):
+    try:
+        return int(request.GET["since"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _cart_delta(cart, since, serialize):
+    """
+    Respons delta untuk ``?since=<version>`` (versi dari respons list sebelumnya):
+    - since == versi sekarang  -> {"unchanged": true} tanpa query item
+    - masih dalam DELTA_WINDOW -> item yang berubah + id item yang dihapus
+    - selain itu (None / terlalu lama / versi asing) -> None, panggil full list
+    Delta selalu untuk seluruh cart (filter ?selected= hanya berlaku di full list).
+    Versi dibaca sebelum item: write yang menyelip di antaranya terkirim ulang di
+    sync berikutnya (aman, client cukup menimpa item by id).
+    """
+    if since is None or since > cart.version or since < max(0, cart.version - Cart.DELTA_WINDOW):
+        return None
+    if since == cart.version:
+        return {"ok": True, "unchanged": True, "version": cart.version}
+    changed = cart.items.filter(version__gt=since).select_related("product").order_by("id")
+    removed = cart.tombstones.filter(version__gt=since).values_list("item_id", flat=True)
+    return {
+        "ok": True,
+        "unchanged": False,
+        "delta": True,
+        "version": cart.version,
+        **_cart_counters(cart, refresh=False),
+        "changed": [serialize(it) for it in changed],
+        "removed": sorted(set(removed)),
+    }
 
 # page (redirect ke login kalau belum login)
 def cart_page(request): #nampilin page cart ke user
@@ -28,20 +69,34 @@ def cart_page(request): #nampilin page cart ke user
             login_url = reverse("login")
         return redirect(f"{login_url}?next={request.get_full_path()}")
 
-    cart, _ = Cart.objects.get_or_create(user=request.user) # foreign key ke user (one to one)
+    cart = get_cart(request)  # belum punya cart -> EmptyCart, tanpa INSERT
     items = cart.items.select_related("product").all()
     return render(request, "cart/cart.html", { # read
         "cart": cart,
         "items": items,
-        "total_items": cart.total_items(),  
+        "total_items": cart.total_items,
     })
 
 # data (untuk render via JS) 
+def _serialize_cart_item(it):
+    p = it.product
+    return {
+        "id": it.id,
+        "product_name": getattr(p, "product_name", getattr(p, "name", str(p))),
+        "price": getattr(p, "price", 0),
+        "thumbnail": getattr(p, "thumbnail", "") or getattr(p, "image_url", ""),
+        "quantity": it.quantity,
+        "is_selected": it.is_selected,
+    }
+
 @require_GET
 @login_required
 def cart_json(request): #ngasih data isi cart ke javascript
     # biar JavaScript di halaman cart bisa refresh tampilan atau ambil data terbaru tanpa reload seluruh halaman
-    cart, _ = Cart.objects.get_or_create(user=request.user)
+    cart = get_cart(request)
+    delta = _cart_delta(cart, _parse_since(request), _serialize_cart_item)  # ?since= -> perubahan saja
+    if delta is not None:
+        return JsonResponse(delta)
     qs = cart.items.select_related("product")
 
     selected = request.GET.get("selected")
@@ -50,24 +105,14 @@ def cart_json(request): #ngasih data isi cart ke javascript
     elif selected == "0": #cuma item yang gak dicentang
         qs = qs.filter(is_selected=False)
 
-    items = []
-    for it in qs:
-        p = it.product
-        items.append({
-            "id": it.id,
-            "product_name": getattr(p, "product_name", getattr(p, "name", str(p))),
-            "price": getattr(p, "price", 0),
-            "thumbnail": getattr(p, "thumbnail", "") or getattr(p, "image_url", ""),
-            "quantity": it.quantity,
-            "is_selected": it.is_selected,
-        })
+    items = [_serialize_cart_item(it) for it in qs]
 
     return JsonResponse({
         "ok": True,
         "message": "",
-        "total_items": cart.total_items(),                         
-        "selected_count": cart.items.filter(is_selected=True).count(),  
-        "selected_qty": _selected_qty(cart),                      
+        "version": cart.version,
+        "delta": False,
+        **_cart_counters(cart, refresh=False),
         "items": items,
     })
 
@@ -77,10 +122,10 @@ def cart_json(request): #ngasih data isi cart ke javascript
 @login_required
 @transaction.atomic
 def set_quantity_ajax(request, item_id: int):
-    cart, _ = Cart.objects.select_for_update().get_or_create(user=request.user) # lock cart + item
+    cart = get_cart_for_update(request, create=False) # lock cart + item
     item = get_object_or_404(
         CartItem.objects.select_for_update().select_related("product"),
-        pk=item_id, cart=cart
+        pk=item_id, cart_id=getattr(cart, "pk", None)
     )
     # ambil quantity target
     try:
@@ -101,17 +146,17 @@ def set_quantity_ajax(request, item_id: int):
             "message": "Product is out of stock.",
             "item_id": item_id,
             "quantity": 0,
-            "selected_qty": _selected_qty(cart)
+            **_cart_counters(cart),
         }, status=200) 
 
-    # kalau qty minta lebih besar dr stok
-    if qty > product.stock:
+    # kalau qty minta lebih besar dr stok (reservasi aktif -> hold sekalian disesuaikan)
+    if not reservations.fits(cart, product, qty):
         return JsonResponse({
             "ok": False,
-            "message": f"Exceeding stock. Only {product.stock} left.",
+            "message": f"Exceeding stock. Only {reservations.available(cart, product)} left.",
             "item_id": item_id,
             "quantity": item.quantity,
-            "selected_qty": _selected_qty(cart)
+            **_cart_counters(cart, refresh=False),
         }, status=200) 
 
     # kalau qty <= 0 -> remove
@@ -122,7 +167,7 @@ def set_quantity_ajax(request, item_id: int):
             "message": "Item removed from cart.",
             "item_id": item_id,
             "quantity": 0,
-            "selected_qty": _selected_qty(cart)
+            **_cart_counters(cart),
         }, status=200)
 
     # normal update
@@ -134,7 +179,7 @@ def set_quantity_ajax(request, item_id: int):
         "message": None,
         "item_id": item_id,
         "quantity": qty,
-       "selected_qty": _selected_qty(cart)
+        **_cart_counters(cart),
     }, status=200)
 
 
@@ -143,24 +188,24 @@ def set_quantity_ajax(request, item_id: int):
 @login_required
 @transaction.atomic
 def remove_item_ajax(request, item_id: int):
-    cart, _ = Cart.objects.get_or_create(user=request.user)
-    item = get_object_or_404(CartItem, pk=item_id, cart=cart) #foreign ke cart (1 cart bisa punya banyak item)
+    cart = get_cart_for_update(request, create=False)
+    item = get_object_or_404(CartItem, pk=item_id, cart_id=getattr(cart, "pk", None)) #foreign ke cart (1 cart bisa punya banyak item)
     item.delete()
     return JsonResponse({
         "ok": True,
         "message": "Item removed from cart. 🗑️",
         "item_id": item_id,
         "quantity": 0,
-        "total_items": cart.total_items(),
-        "selected_count": cart.items.filter(is_selected=True).count(),
+        **_cart_counters(cart),
     })
 
 @require_POST
 @login_required
 @transaction.atomic
 def clear_cart_ajax(request):
-    cart, _ = Cart.objects.get_or_create(user=request.user)
-    cart.clear()
+    cart = get_cart_for_update(request, create=False)
+    if cart is not None:
+        cart.clear()
     return JsonResponse({
         "ok": True,
         "message": "Cart cleared.",
@@ -174,8 +219,8 @@ def clear_cart_ajax(request):
 @login_required
 @transaction.atomic
 def toggle_select_ajax(request, item_id: int): # balikin selected count sm selected qty
-    cart, _ = Cart.objects.get_or_create(user=request.user)
-    item = get_object_or_404(CartItem, pk=item_id, cart=cart)
+    cart = get_cart_for_update(request, create=False)
+    item = get_object_or_404(CartItem, pk=item_id, cart_id=getattr(cart, "pk", None))
 
     val = request.POST.get("is_selected")
     if val not in ("0", "1"):
@@ -188,43 +233,42 @@ def toggle_select_ajax(request, item_id: int): # balikin selected count sm selec
         "message": "Selection updated.",
         "item_id": item_id,
         "is_selected": item.is_selected,
-        "selected_count": cart.items.filter(is_selected=True).count(),
-        "selected_qty": _selected_qty(cart),
+        **_cart_counters(cart),
     })
 
 @require_POST
 @login_required
 @transaction.atomic
 def select_all_ajax(request): # balikin ulang angka
-    cart, _ = Cart.objects.get_or_create(user=request.user)
-    cart.items.update(is_selected=True)
+    cart = get_cart_for_update(request, create=False) or EmptyCart(request.user)
+    if cart.pk is not None:
+        cart.select_all(True)
     return JsonResponse({
         "ok": True,
         "message": "All items selected.",
-        "selected_count": cart.items.filter(is_selected=True).count(),
-        "total_items": cart.total_items(),
-        "selected_qty": _selected_qty(cart),
+        **_cart_counters(cart),
     })
 
 @require_POST
 @login_required
 @transaction.atomic
 def unselect_all_ajax(request): # balikin 0
-    cart, _ = Cart.objects.get_or_create(user=request.user)
-    cart.items.update(is_selected=False)
+    cart = get_cart_for_update(request, create=False) or EmptyCart(request.user)
+    if cart.pk is not None:
+        cart.select_all(False)
     return JsonResponse({
         "ok": True,
         "message": "Selection cleared.",
-        "selected_count": 0,
-        "total_items": cart.total_items(),
-        "selected_qty": 0,
+        **_cart_counters(cart),
     })
 
 @login_required
 @transaction.atomic
 def add_to_cart(request, product_id):
-    product = get_object_or_404(Product.objects.select_for_update(), pk=product_id) # fk ke catalog.models.Product
-    cart, _ = Cart.objects.select_for_update().get_or_create(user=request.user)
+    # product dibaca tanpa lock: batas stok dicek di UPDATE kondisional (reservations.add_item),
+    # jadi add-to-cart produk yang sama dari banyak shopper tidak antre di row Product
+    product = get_object_or_404(Product, pk=product_id) # fk ke catalog.models.Product
+    cart = get_cart_for_update(request)  # mutasi pertama -> row cart dibuat di sini
 
     is_ajax = request.headers.get("X-Requested-With") == "XMLHttpRequest"
     # balikin JSON kalau dr add to cart di katalog
@@ -238,7 +282,7 @@ def add_to_cart(request, product_id):
                     "message": msg,
                     "warn": warn,
                     "added": added,
-                    "cart_count": cart.total_items(),
+                    "cart_count": cart.counters()["total_items"],
                 },
                 status=200,  
             )
@@ -263,55 +307,26 @@ def add_to_cart(request, product_id):
             added=False,
         )
 
-    try:
-        # item udah ada di cart
-        item = cart.items.select_for_update().get(product=product)
-
-        remaining = product.stock - item.quantity
-
-        if remaining <= 0:
-            # sudah pegang semua stock terakhir
-            return respond(
-                ok=False,
-                msg="You're already holding the last available stock for this item.",
-                warn=True,     
-                added=False,
-            )
+    status, _, quantity = reservations.add_item(cart, product, 1)
 
-        # masih boleh nambah 1
-        item.quantity = item.quantity + 1
-        item.save(update_fields=["quantity"])
-
-        now_remaining = product.stock - item.quantity
-        if now_remaining <= 0:
-            # abis ini udah last stock banget
-            return respond(
-                ok=True,
-                msg=f"'{product.product_name}' added to cart. That's the last one in stock!",
-                warn=False,
-                added=True,
-            )
-
-        # normal success
+    if status == "exceeds":
+        # sudah pegang semua stock terakhir
         return respond(
-            ok=True,
-            msg=f"'{product.product_name}' added to cart.",
-            warn=False,
-            added=True,
+            ok=False,
+            msg="You're already holding the last available stock for this item.",
+            warn=True,
+            added=False,
         )
 
-    except CartItem.DoesNotExist:
-        # item belum ada di cart sama sekali -> add 1
-        cart.items.create(product=product, quantity=1, is_selected=True)
-
-        if product.stock == 1:
-            msg = f"'{product.product_name}' added to cart. That's the last one in stock!"
-        else:
-            msg = f"'{product.product_name}' added to cart."
-
-        return respond(
-            ok=True,
-            msg=msg,
-            warn=False,
-            added=True,
-        )
+    if product.stock - quantity <= 0:
+        # abis ini udah last stock banget
+        msg = f"'{product.product_name}' added to cart. That's the last one in stock!"
+    else:
+        msg = f"'{product.product_name}' added to cart."
+
+    return respond(
+        ok=True,
+        msg=msg,
+        warn=False,
+        added=True,
+    )
@@ -1,24 +1,30 @@
 from django.contrib import admin
 from django.utils.safestring import mark_safe
-from django.http import HttpResponse
 from django.db.models import Count
+from .csv_export import Column, csv_export_action
 from .models import Product 
-import csv
 
 # helper kecil buat tampilan admin yang ramah operasional
 def _rupiah(n):
     s = f"{n:,}"
     return "Rp" + s.replace(",", ".")
 
-@admin.action(description="Export selected to CSV")
-def export_as_csv(modeladmin, request, queryset):
-    response = HttpResponse(content_type="text/csv; charset=utf-8")
-    response["Content-Disposition"] = 'attachment; filename="product.csv"'
-    writer = csv.writer(response)
-    writer.writerow(["id", "product_name", "price", "stock", "inStock", "thumbnail", "description"])
-    for p in queryset:
-        writer.writerow([str(p.id), p.product_name, p.price, p.stock, p.inStock, p.thumbnail or "", p.description or ""])
-    return response
+# export streaming (lihat catalog/csv_export.py); nama action lama tetap dipakai
+export_as_csv = csv_export_action(
+    [
+        Column("id"),
+        Column("product_name"),
+        Column("price"),
+        Column("stock"),
+        Column("inStock"),
+        Column("thumbnail"),
+        Column("description"),
+        Column("external_id", default=False),
+        Column("thumbnail_proxied", default=False),
+    ],
+    filename="product.csv",
+    name="export_as_csv",
+)
 
 class ReadOnlyAdmin(admin.ModelAdmin):
     """Base admin: allow viewing but forbid add/change/delete."""
@@ -1,8 +1,14 @@
-from django.http import JsonResponse, HttpResponseBadRequest
+from django.http import JsonResponse, HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.views.decorators.gzip import gzip_page
 from django.views.decorators.http import require_http_methods
-from catalog.models import Product
+from catalog.models import Product, similar_products
+from catalog.search import search_products
+from catalog import bulk, suggest, wishlist as wishlist_cache
+from catalog.versioning import catalog_cached
+from catalog.pagination import ORDERINGS, InvalidCursor, cached_count, clamp_limit, keyset_page
 import json
+from django.core.serializers.json import DjangoJSONEncoder
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required, user_passes_test
 
@@ -26,49 +32,164 @@ def _get_user_wishlist_manager(user):
 
 
 def _get_wishlist_ids(user):
-    wishlist = _get_user_wishlist_manager(user)
-    if wishlist is None:
-        return set()
-    try:
-        return set(str(pk) for pk in wishlist.values_list("id", flat=True))
-    except Exception:
-        try:
-            return set(str(getattr(prod, "id", "")) for prod in wishlist.all())
-        except Exception:
-            return set()
-
-
-def serialize_product(p: Product, user=None, wishlist_ids=None):
-    wishlist_ids = wishlist_ids if wishlist_ids is not None else _get_wishlist_ids(user)
-    return {
-        "id": str(p.id),
-        "name": p.product_name,
-        "description": p.description,
-        "price": p.price,
-        "stock": p.stock,
-        "in_stock": p.inStock,
-        "thumbnail": p.normalized_thumbnail,
-        "thumbnail_proxy": p.proxied_thumbnail,
-        "external_id": p.external_id,
-        "is_wishlisted": str(p.id) in wishlist_ids,
-    }
+    # dari cache per-user (write-through via m2m_changed), bukan query tiap request
+    if _get_user_wishlist_manager(user) is None:
+        return wishlist_cache.EMPTY
+    return wishlist_cache.get_wishlist_ids(user)
+
+
+def _absolute(request, url):
+    # thumbnail lokal berupa path relatif; client Flutter butuh URL lengkap
+    if request is not None and url and url.startswith("/"):
+        return request.build_absolute_uri(url)
+    return url
+
+
+# field API -> (getter, kolom model yang dibutuhkan getter)
+PRODUCT_FIELDS = {
+    "id": (lambda p, ctx: str(p.id), ("id",)),
+    "name": (lambda p, ctx: p.product_name, ("product_name",)),
+    "description": (lambda p, ctx: p.description, ("description",)),
+    "price": (lambda p, ctx: p.price, ("price",)),
+    "stock": (lambda p, ctx: p.stock, ("stock",)),
+    "in_stock": (lambda p, ctx: p.inStock, ("inStock",)),
+    "thumbnail": (lambda p, ctx: p.normalized_thumbnail, ("thumbnail", "thumbnail_normalized")),
+    "thumbnail_proxy": (
+        lambda p, ctx: _absolute(ctx["request"], p.proxied_thumbnail),
+        ("thumbnail", "thumbnail_normalized", "thumbnail_proxied"),
+    ),
+    "external_id": (lambda p, ctx: p.external_id, ("external_id",)),
+    "is_wishlisted": (lambda p, ctx: p.id in ctx["wishlist_ids"], ("id",)),
+}
+
+# ?fields=card -> cukup untuk grid/kartu produk
+FIELD_PRESETS = {
+    "card": ("id", "name", "price", "stock", "thumbnail_proxy"),
+}
+
+
+def parse_fields(raw):
+    """
+    ``?fields=card`` / ``?fields=id,name,price`` -> tuple nama field (urut sesuai PRODUCT_FIELDS).
+    None kalau tidak diisi (= semua field). Raise ValueError untuk field yang tidak dikenal.
+    """
+    if not raw:
+        return None
+    wanted = set()
+    for name in (f.strip() for f in raw.split(",")):
+        if not name:
+            continue
+        if name in FIELD_PRESETS:
+            wanted.update(FIELD_PRESETS[name])
+        elif name in PRODUCT_FIELDS:
+            wanted.add(name)
+        else:
+            raise ValueError(f"Unknown field: {name}")
+    if not wanted:
+        return None
+    return tuple(f for f in PRODUCT_FIELDS if f in wanted)
+
+
+def only_columns(fields, extra=()):
+    """Kolom untuk ``QuerySet.only()`` supaya baris DB hanya membawa yang diserialisasi."""
+    columns = {"id", *extra}
+    for f in fields:
+        columns.update(PRODUCT_FIELDS[f][1])
+    return sorted(columns)
+
+
+def serialize_product(p: Product, user=None, wishlist_ids=None, request=None, fields=None):
+    fields = fields or PRODUCT_FIELDS
+    if "is_wishlisted" in fields and wishlist_ids is None:
+        wishlist_ids = _get_wishlist_ids(user)
+    ctx = {"request": request, "wishlist_ids": wishlist_ids}
+    return {f: PRODUCT_FIELDS[f][0](p, ctx) for f in fields}
 
 @require_http_methods(["GET"])
+@catalog_cached(per_user=True)
 def api_products(request):
-    qs = Product.objects.all().order_by("-id")
+    """
+    GET /catalog/api/products/
+
+    Query:
+      ?q=...        full-text search (default urutan: relevance)
+      ?sort=        -id (default) | price | -price | relevance
+      ?limit=       max pagination.MAX_LIMIT
+      ?cursor=      token dari next_cursor/prev_cursor respons sebelumnya
+      ?offset=      mode lama (offset), masih dilayani untuk client lama
+      ?count=0      skip total count
+      ?fields=      card | daftar field dipisah koma (mis. id,name,price)
+    """
+    try:
+        fields = parse_fields(request.GET.get("fields"))
+    except ValueError:
+        return HttpResponseBadRequest("Invalid fields")
+
+    qs = Product.objects.all()
     q = request.GET.get("q")
+    sort = request.GET.get("sort") or ("relevance" if q else "-id")
     if q:
-        qs = qs.filter(product_name__icontains=q)
-    limit = int(request.GET.get("limit", 50))
-    offset = int(request.GET.get("offset", 0))
-    wishlist_ids = _get_wishlist_ids(request.user)
-    data = [serialize_product(p, request.user, wishlist_ids) for p in qs[offset:offset + limit]]
-    return JsonResponse({"count": qs.count(), "results": data})
+        qs = search_products(qs, q, ordered=False)
+    elif sort == "relevance":
+        sort = "-id"
+    if sort not in ORDERINGS:
+        return HttpResponseBadRequest("Invalid sort")
+    count_qs = qs
+    if fields:
+        # kolom urutan tetap di-load: keyset butuh nilainya untuk cursor
+        order_columns = [f.lstrip("-") for f in ORDERINGS[sort] if f.lstrip("-") != "search_rank"]
+        qs = qs.only(*only_columns(fields, order_columns))
+
+    limit = clamp_limit(request.GET.get("limit"))
+    cursor = request.GET.get("cursor")
+    offset = request.GET.get("offset")
+    wishlist_ids = _get_wishlist_ids(request.user) if not fields or "is_wishlisted" in fields else None
+
+    payload = {}
+    if offset and not cursor:
+        try:
+            offset = max(0, int(offset))
+        except ValueError:
+            return HttpResponseBadRequest("Invalid offset")
+        rows = qs.order_by(*ORDERINGS[sort])[offset:offset + limit]
+        payload["next_cursor"] = payload["prev_cursor"] = None
+    else:
+        try:
+            page = keyset_page(qs, sort, cursor, limit)
+        except InvalidCursor:
+            return HttpResponseBadRequest("Invalid cursor")
+        rows = page.object_list
+        payload["next_cursor"] = page.next_cursor
+        payload["prev_cursor"] = page.prev_cursor
+
+    if request.GET.get("count") != "0":
+        payload["count"] = cached_count(count_qs)
+    payload["results"] = [
+        serialize_product(p, request.user, wishlist_ids, request=request, fields=fields) for p in rows
+    ]
+    return JsonResponse(payload)
 
 @require_http_methods(["GET"])
+def api_suggest(request):
+    """
+    GET /catalog/api/suggest/?q=quen&limit=8
+    Autocomplete nama produk dari prefix index di memori (tanpa query DB).
+    """
+    try:
+        limit = int(request.GET.get("limit", suggest.DEFAULT_LIMIT))
+    except ValueError:
+        limit = suggest.DEFAULT_LIMIT
+    return JsonResponse({"results": suggest.suggest(request.GET.get("q", ""), limit)})
+
+@require_http_methods(["GET"])
+@catalog_cached(per_user=True)
 def api_product_detail(request, pk):
     p = get_object_or_404(Product, pk=pk)
-    return JsonResponse(serialize_product(p, request.user))
+    data = serialize_product(p, request.user, request=request)
+    data["similar"] = [
+        serialize_product(n, request=request, fields=FIELD_PRESETS["card"]) for n in similar_products(p)
+    ]
+    return JsonResponse(data)
 
 @csrf_exempt
 @require_http_methods(["POST"])
@@ -88,7 +209,7 @@ def api_product_create(request):
         thumbnail=body.get("thumbnail", ""),
         external_id=body.get("external_id") or None,
     )
-    return JsonResponse(serialize_product(p, request.user), status=201)
+    return JsonResponse(serialize_product(p, request.user, request=request), status=201)
 
 @csrf_exempt
 @require_http_methods(["PUT","PATCH", "POST"])
@@ -109,7 +230,7 @@ def api_product_update(request, pk):
         if value is not None:
             setattr(p, field, value)
     p.save()
-    return JsonResponse(serialize_product(p, request.user))
+    return JsonResponse(serialize_product(p, request.user, request=request))
 
 @csrf_exempt
 @require_http_methods(["DELETE", "POST"])
@@ -121,6 +242,81 @@ def api_product_delete(request, pk):
     return JsonResponse({"ok": True})
 
 
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FIELDS = tuple(f for f in PRODUCT_FIELDS if f != "is_wishlisted")
+
+
+def _ndjson_lines(qs, fields, request):
+    # beberapa baris digabung per yield: lebih sedikit write/flush gzip, memori tetap per-chunk
+    buf = []
+    for p in qs.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        buf.append(json.dumps(serialize_product(p, request=request, fields=fields), cls=DjangoJSONEncoder))
+        if len(buf) >= EXPORT_CHUNK_SIZE:
+            yield "\n".join(buf) + "\n"
+            buf = []
+    if buf:
+        yield "\n".join(buf) + "\n"
+
+
+@require_http_methods(["GET"])
+@login_required
+@user_passes_test(is_admin)
+@gzip_page
+def api_products_export(request):
+    """
+    GET /catalog/api/products/export/
+    Seluruh katalog sebagai NDJSON (1 produk per baris), di-stream langsung dari
+    ``QuerySet.iterator()`` jadi memori tidak bergantung pada jumlah produk.
+    Di-gzip kalau client mengirim ``Accept-Encoding: gzip``.
+
+    Query:
+      ?fields=      sama seperti api_products (default: semua kecuali is_wishlisted)
+    """
+    try:
+        fields = parse_fields(request.GET.get("fields")) or EXPORT_FIELDS
+    except ValueError:
+        return HttpResponseBadRequest("Invalid fields")
+    if "is_wishlisted" in fields:
+        return HttpResponseBadRequest("Invalid fields")
+
+    qs = Product.objects.only(*only_columns(fields)).order_by("id")
+    response = StreamingHttpResponse(_ndjson_lines(qs, fields, request), content_type="application/x-ndjson")
+    response["Content-Disposition"] = 'attachment; filename="products.ndjson"'
+    return response
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@login_required
+@user_passes_test(is_admin)
+def api_products_bulk(request):
+    """
+    POST /catalog/api/products/bulk/
+    Body: {"operations": [
+        {"op": "upsert", "external_id": "SKU-1", "name": "...", "price": 10000},
+        {"op": "upsert", "id": "<uuid>", "stock": 0, "in_stock": false},
+        {"op": "delete", "id": "<uuid>"}
+    ]}
+    Upsert by external_id membuat produk baru kalau belum ada; by id hanya update.
+    Diterapkan per chunk (satu transaksi per chunk) dengan bulk_create/bulk_update.
+    """
+    try:
+        body = json.loads(request.body)
+    except json.JSONDecodeError:
+        return HttpResponseBadRequest("Invalid JSON")
+    operations = body.get("operations") if isinstance(body, dict) else body
+    if not isinstance(operations, list):
+        return HttpResponseBadRequest("operations must be a list")
+    if len(operations) > bulk.MAX_OPERATIONS:
+        return HttpResponseBadRequest(f"Too many operations (max {bulk.MAX_OPERATIONS})")
+
+    results = bulk.apply_operations(operations)
+    summary = {status: 0 for status in ("created", "updated", "deleted", "error")}
+    for r in results:
+        summary[r["status"]] += 1
+    return JsonResponse({"summary": summary, "results": results})
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 @login_required
@@ -133,6 +329,7 @@ def api_toggle_wishlist(request, pk):
             status=400,
         )
 
+    # keputusan add/remove dari DB; cache wishlist hanya untuk listing (bisa basi per worker)
     wishlisted = wishlist.filter(pk=product.pk).exists()
     if wishlisted:
         wishlist.remove(product)
@@ -0,0 +1,217 @@
+"""
+Operasi bulk untuk catalog.Product.
+
+``bulk_create`` / ``bulk_update`` / ``QuerySet.update`` tidak memanggil
+``Product.save()`` maupun signal post_save, jadi jalur bulk harus mengurus
+sendiri apa yang biasanya dikerjakan save() + signal:
+
+- kolom URL thumbnail turunan  -> ``Product.sync_thumbnail_urls()``
+- index full-text              -> ``search.index_products()``
+- index autocomplete           -> ``suggest.index_products()``
+- versi katalog (cache/ETag)   -> ``bump_catalog_version()``
+
+``save_products`` membungkus ketiganya; ``apply_operations`` dipakai
+endpoint ``api_products_bulk``.
+"""
+from uuid import UUID
+
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, transaction
+
+from . import search, suggest
+from .models import Product, normalize_thumbnail_url
+from .versioning import bump_catalog_version
+
+CHUNK_SIZE = 500
+MAX_OPERATIONS = 5000
+
+# key JSON (sama seperti api_product_create/update) -> field model
+API_FIELDS = {
+    "name": "product_name",
+    "description": "description",
+    "price": "price",
+    "stock": "stock",
+    "in_stock": "inStock",
+    "thumbnail": "thumbnail",
+    "external_id": "external_id",
+}
+# default saat create, sama seperti api_product_create
+CREATE_DEFAULTS = {
+    "product_name": "",
+    "description": "",
+    "price": 0,
+    "stock": 0,
+    "inStock": True,
+    "thumbnail": "",
+    "external_id": None,
+}
+SEARCH_FIELDS = set(Product.SEARCH_FIELDS)
+
+
+class OperationError(ValueError):
+    pass
+
+
+def save_products(created=(), updated=(), fields=(), batch_size=CHUNK_SIZE):
+    """
+    Simpan produk baru (``created``) dan produk yang diubah (``updated`` pada
+    ``fields``) secara bulk, lalu sinkronkan thumbnail, index search/suggest & versi katalog.
+    Panggil di dalam transaksi supaya index ikut rollback bila gagal.
+    """
+    created, updated, fields = list(created), list(updated), set(fields)
+    for p in created:
+        p.sync_thumbnail_urls()
+    if "thumbnail" in fields:
+        for p in updated:
+            p.sync_thumbnail_urls()
+        fields |= set(Product.THUMBNAIL_DERIVED_FIELDS)
+
+    if created:
+        Product.objects.bulk_create(created, batch_size=batch_size)
+    if updated and fields:
+        Product.objects.bulk_update(updated, sorted(fields), batch_size=batch_size)
+
+    reindex = created + (updated if fields & SEARCH_FIELDS else [])
+    search.index_products(reindex)
+    if created or (updated and fields):
+        bump_catalog_version()  # duluan: index suggest mencatat versi setelah bump ini
+    transaction.on_commit(lambda: suggest.index_products(reindex))
+
+
+# ==========================
+# Parsing operasi
+# ==========================
+
+def _clean_fields(op):
+    values = {}
+    for key, field_name in API_FIELDS.items():
+        if key not in op:
+            continue
+        value = op[key]
+        if field_name in ("thumbnail", "external_id") and value in ("", None):
+            values[field_name] = "" if field_name == "thumbnail" else None
+            continue
+        if field_name == "inStock" and not isinstance(value, bool):
+            raise OperationError("in_stock must be a boolean")
+        if field_name == "thumbnail":
+            value = normalize_thumbnail_url(value)  # terima "www..." / "//..." seperti data CSV
+        try:
+            values[field_name] = Product._meta.get_field(field_name).clean(value, None)
+        except ValidationError as e:
+            raise OperationError(f"{key}: {' '.join(e.messages)}")
+    return values
+
+
+def _parse(op):
+    """Return (action, key_field, key_value, values) atau raise OperationError."""
+    if not isinstance(op, dict):
+        raise OperationError("Operation must be an object")
+    action = op.get("op", "upsert")
+    if action not in ("upsert", "delete"):
+        raise OperationError("op must be 'upsert' or 'delete'")
+
+    if op.get("id"):
+        try:
+            key = ("id", UUID(str(op["id"])))
+        except ValueError:
+            raise OperationError("Invalid id")
+    elif op.get("external_id"):
+        key = ("external_id", str(op["external_id"]).strip())
+    else:
+        raise OperationError("id or external_id is required")
+
+    values = _clean_fields(op) if action == "upsert" else {}
+    return action, key[0], key[1], values
+
+
+def _result(index, status, product=None, key=None, error=None):
+    out = {"index": index, "status": status}
+    if product is not None:
+        out["id"] = str(product.pk)
+        out["external_id"] = product.external_id
+    elif key is not None:
+        out[key[0]] = str(key[1])
+    if error:
+        out["error"] = error
+    return out
+
+
+# ==========================
+# Apply
+# ==========================
+
+def _apply_chunk(items):
+    """
+    ``items``: list (index, action, key_field, key_value, values).
+    Satu transaksi per chunk; kalau DB menolak, seluruh chunk di-rollback
+    dan setiap item dilaporkan error.
+    """
+    ids = [v for _, _, f, v, _ in items if f == "id"]
+    exts = [v for _, _, f, v, _ in items if f == "external_id"]
+    by_id = {p.pk: p for p in Product.objects.filter(pk__in=ids)} if ids else {}
+    by_ext = {p.external_id: p for p in Product.objects.filter(external_id__in=exts)} if exts else {}
+
+    results, created, updated, fields, deletes = [], [], [], set(), []
+    for index, action, key_field, key_value, values in items:
+        existing = (by_id if key_field == "id" else by_ext).get(key_value)
+        key = (key_field, key_value)
+
+        if action == "delete":
+            if existing is None:
+                results.append(_result(index, "error", key=key, error="Product not found"))
+            else:
+                deletes.append(existing.pk)
+                results.append(_result(index, "deleted", existing))
+            continue
+
+        if existing is None:
+            if key_field == "id":
+                # id dibuat server; upsert by id hanya untuk produk yang sudah ada
+                results.append(_result(index, "error", key=key, error="Product not found"))
+                continue
+            p = Product(**{**CREATE_DEFAULTS, **values, "external_id": key_value})
+            created.append(p)
+            results.append(_result(index, "created", p))
+        else:
+            for name, value in values.items():
+                setattr(existing, name, value)
+            fields |= set(values)
+            updated.append(existing)
+            results.append(_result(index, "updated", existing))
+
+    try:
+        with transaction.atomic():
+            save_products(created, updated, fields)
+            if deletes:
+                # lewat Collector biasa supaya cascade + signal (unindex, versi) tetap jalan
+                Product.objects.filter(pk__in=deletes).delete()
+    except DatabaseError as e:
+        return [
+            _result(index, "error", key=(key_field, key_value), error=f"Chunk rolled back: {e}")
+            for index, _, key_field, key_value, _ in items
+        ]
+    return results
+
+
+def apply_operations(operations, chunk_size=CHUNK_SIZE):
+    """
+    Terapkan list operasi upsert/delete. Operasi yang tidak valid (atau kunci
+    yang muncul lebih dari sekali) langsung dilaporkan error tanpa menggagalkan
+    sisanya. Return list hasil per item, urut sesuai input.
+    """
+    results, pending, seen = [], [], set()
+    for index, op in enumerate(operations):
+        try:
+            action, key_field, key_value, values = _parse(op)
+        except OperationError as e:
+            results.append(_result(index, "error", error=str(e)))
+            continue
+        if (key_field, key_value) in seen:
+            results.append(_result(index, "error", key=(key_field, key_value), error="Duplicate key in batch"))
+            continue
+        seen.add((key_field, key_value))
+        pending.append((index, action, key_field, key_value, values))
+
+    for start in range(0, len(pending), chunk_size):
+        results.extend(_apply_chunk(pending[start:start + chunk_size]))
+    return sorted(results, key=lambda r: r["index"])
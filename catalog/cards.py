@@ -0,0 +1,90 @@
+"""
+Cache fragmen HTML kartu produk (catalog/product_card.html).
+
+    render_cards(products, request) -> [html, ...]  (urutan sama dengan ``products``)
+
+Key cache = id produk + versi produk + state viewer:
+
+- versi produk = hash kolom yang dirender kartu (``CARD_FIELDS``: nama, harga,
+  ``inStock``, thumbnail; jumlah stok tidak ditampilkan kartu), jadi setiap save
+  Product yang mengubah tampilan kartu otomatis pindah ke key baru - termasuk
+  jalur bulk (``bulk.save_products``) dan ``.update()`` ``inStock`` di checkout
+  yang tidak lewat signal. Entry lama cukup dibiarkan expire.
+- state viewer = anon / user / admin (superuser non-staff) / staff, karena
+  hanya itu yang dibaca template dari ``user``.
+- hash source template ikut di key, jadi deploy yang mengubah template tidak
+  menyajikan kartu lama.
+
+CSRF token per user tidak ikut di-cache: kartu dirender dengan placeholder
+lalu diganti token request saat dijahit.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.middleware.csrf import get_token
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+CARD_TEMPLATE = "catalog/product_card.html"
+CARD_CACHE_TIMEOUT = 60 * 60
+CARD_FIELDS = ("product_name", "price", "inStock", "proxied_thumbnail")
+_CSRF_PLACEHOLDER = "__lume_card_csrf__"
+
+_template_token = None
+
+
+def _template_version():
+    global _template_token
+    if _template_token is None:
+        source = get_template(CARD_TEMPLATE).template.source
+        _template_token = hashlib.sha1(source.encode("utf-8")).hexdigest()[:8]
+    return _template_token
+
+
+def card_version(p):
+    raw = "\x1f".join(str(getattr(p, f, "")) for f in CARD_FIELDS)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def viewer_state(user):
+    if user is None or not user.is_authenticated:
+        return "anon"
+    if user.is_staff:
+        return "staff"
+    if user.is_superuser:
+        return "admin"
+    return "user"
+
+
+def card_key(p, viewer):
+    return f"catalog:card:{_template_version()}:{p.pk}:{card_version(p)}:{viewer}"
+
+
+def _render(p, user):
+    return get_template(CARD_TEMPLATE).render({"p": p, "user": user, "csrf_token": _CSRF_PLACEHOLDER})
+
+
+def render_cards(products, request):
+    """HTML kartu untuk ``products``: 1x get_many, render + set_many hanya untuk yang miss."""
+    products = list(products)
+    if not products:
+        return []
+    user = getattr(request, "user", None)
+    viewer = viewer_state(user)
+    keys = [card_key(p, viewer) for p in products]
+    cached = cache.get_many(keys)
+
+    missing = {}
+    for p, key in zip(products, keys):
+        if key not in cached and key not in missing:
+            missing[key] = _render(p, user)
+    if missing:
+        cache.set_many(missing, CARD_CACHE_TIMEOUT)
+        cached.update(missing)
+
+    html = [cached[key] for key in keys]
+    if viewer == "user":
+        # hanya kartu untuk customer login yang punya form add-to-cart (+ csrf)
+        token = get_token(request)
+        html = [h.replace(_CSRF_PLACEHOLDER, token) for h in html]
+    return [mark_safe(h) for h in html]
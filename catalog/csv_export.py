@@ -0,0 +1,124 @@
+"""
+Export CSV streaming untuk Django admin.
+
+Baris ditulis satu per satu ke ``StreamingHttpResponse`` lewat writer
+"pseudo-buffer" (``Echo``) dan queryset dibaca dengan ``.iterator()``,
+jadi memori worker tetap kecil berapa pun jumlah baris yang dipilih.
+
+Pemakaian di ModelAdmin:
+
+    export_orders = csv_export_action(
+        [Column("id"), Column("user", "user.username"), ...],
+        filename="orders.csv",
+        items="items",                       # opsional: 1 baris CSV per item
+        item_columns=[Column("item_name", "product_name"), ...],
+    )
+    actions = (export_orders,)
+
+Saat action dipilih, admin menampilkan halaman pilih kolom dulu; setelah
+dikonfirmasi, file di-stream.
+"""
+import csv
+from dataclasses import dataclass
+from typing import Callable, Union
+
+from django.contrib.admin import helpers
+from django.http import StreamingHttpResponse
+from django.template.response import TemplateResponse
+
+CHUNK_SIZE = 2000
+
+
+class Echo:
+    """Objek "file" yang hanya mengembalikan nilai yang ditulis (untuk csv.writer)."""
+
+    def write(self, value):
+        return value
+
+
+@dataclass(frozen=True)
+class Column:
+    key: str
+    source: Union[str, Callable, None] = None  # "user.username" / callable(obj) / None = key
+    header: str = ""
+    default: bool = True
+
+    @property
+    def label(self):
+        return self.header or self.key
+
+    def value(self, obj):
+        if callable(self.source):
+            return self.source(obj)
+        for attr in (self.source or self.key).split("."):
+            obj = getattr(obj, attr, None)
+            if obj is None:
+                return ""
+        return obj
+
+
+def stream_csv(header, rows, filename):
+    writer = csv.writer(Echo())
+
+    def generate():
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(generate(), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+def export_rows(queryset, columns, items=None, item_columns=(), chunk_size=CHUNK_SIZE):
+    """
+    Generator baris CSV. Kalau ada ``item_columns`` terpilih, tiap objek
+    dipecah jadi satu baris per item (relasi ``items``, di-prefetch per chunk).
+    Objek tanpa item tetap muncul sekali dengan kolom item kosong.
+    """
+    if item_columns:
+        queryset = queryset.prefetch_related(items)
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        base = [col.value(obj) for col in columns]
+        if not item_columns:
+            yield base
+            continue
+        children = list(getattr(obj, items).all())
+        if not children:
+            yield base + [""] * len(item_columns)
+        for child in children:
+            yield base + [col.value(child) for col in item_columns]
+
+
+def csv_export_action(columns, filename, items=None, item_columns=(), select_related=(),
+                      description="Export selected to CSV", name=None):
+    columns, item_columns = list(columns), list(item_columns)
+    keyed = {c.key: c for c in columns + item_columns}
+
+    def export(modeladmin, request, queryset):
+        if not request.POST.get("csv_export"):
+            return TemplateResponse(request, "admin/csv_export.html", {
+                **modeladmin.admin_site.each_context(request),
+                "title": description,
+                "opts": modeladmin.model._meta,
+                "columns": columns + item_columns,
+                "action": export.__name__,
+                "select_across": request.POST.get("select_across", "0"),
+                "selected": request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+                "action_checkbox_name": helpers.ACTION_CHECKBOX_NAME,
+            })
+
+        chosen = [keyed[k] for k in request.POST.getlist("columns") if k in keyed]
+        if not chosen:
+            chosen = [c for c in columns + item_columns if c.default]
+        head = [c for c in columns if c in chosen]
+        tail = [c for c in item_columns if c in chosen]
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        rows = export_rows(queryset, head, items, tail)
+        return stream_csv([c.label for c in head + tail], rows, filename)
+
+    export.short_description = description
+    export.allowed_permissions = ("view",)
+    export.__name__ = name or f"export_{filename.rsplit('.', 1)[0]}_csv"
+    return export
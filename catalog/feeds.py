@@ -0,0 +1,76 @@
+"""
+Parsing + normalisasi feed CSV supplier untuk ``import_pilates_csv``.
+
+Modul ini sengaja tidak meng-import model/ORM supaya ``parse_file`` bisa
+dijalankan di worker ``ProcessPoolExecutor`` (termasuk start method
+"spawn") tanpa setup Django. Penulisan ke DB tetap di proses utama.
+"""
+import csv
+import hashlib
+import json
+import re
+from pathlib import Path
+
+
+def _clean_price(v):
+    if v is None:
+        return None
+    s = str(v).strip()
+    digits = re.sub(r"[^\d]", "", s)
+    return int(digits) if digits else None
+
+def _strip_keys(row: dict):
+    return {(k.strip() if isinstance(k, str) else k): v for k, v in row.items()}
+
+def _coalesce_description(row: dict) -> str:
+    parts = []
+    ks = (row.get("key_specs") or "").strip()
+    if ks:
+        parts.append(ks)
+    meta = []
+    if row.get("brand"):
+        meta.append(f"Brand: {row.get('brand')}")
+    if row.get("category"):
+        meta.append(f"Kategori: {row.get('category')}")
+    if row.get("variant"):
+        meta.append(f"Varian: {row.get('variant')}")
+    if meta:
+        parts.append(" | ".join(meta))
+    desc = "\n\n".join([p for p in parts if p])
+    return desc or (row.get("product_name") or "").strip()
+
+def _content_hash(fields: dict) -> str:
+    """Hash baris yang sudah dinormalisasi (deskripsi gabungan, harga bersih, dst)."""
+    payload = json.dumps(fields, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def normalize_row(raw: dict, id_prefix: str = ""):
+    """Satu baris CSV -> dict field Product (+ ``import_hash``), atau None kalau baris harus di-skip."""
+    row = _strip_keys(raw)
+    product_name = (row.get("product_name") or "").strip()
+    price = _clean_price(row.get("price"))
+    if not product_name or price is None:
+        return None
+    stock = 1
+    external_id = (row.get("id") or "").strip() or None
+    fields = {
+        "product_name": product_name,
+        "stock": stock,
+        "inStock": True if stock and stock > 0 else False,
+        "thumbnail": (row.get("image_url") or row.get("thumbnail") or "").strip() or None,
+        "description": _coalesce_description(row),
+        "price": price,
+        "external_id": f"{id_prefix}{external_id}" if external_id else None,
+    }
+    fields["import_hash"] = _content_hash(fields)
+    return fields
+
+def parse_file(path, namespace_ids=False):
+    """
+    Dijalankan di worker: baca + normalisasi seluruh file.
+    Return list hasil ``normalize_row`` per baris (``None`` = baris di-skip).
+    """
+    path = Path(path)
+    prefix = f"{path.stem}:" if namespace_ids else ""
+    with path.open(newline="", encoding="utf-8") as f:
+        return [normalize_row(raw, prefix) for raw in csv.DictReader(f)]
@@ -0,0 +1,133 @@
+import heapq
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from catalog.models import Product, ProductNeighbor
+from catalog.versioning import bump_catalog_version
+
+
+class Command(BaseCommand):
+    help = (
+        "Hitung tabel ProductNeighbor (produk mirip) dari TF-IDF nama + deskripsi. "
+        "Default: rebuild penuh; --missing-only: hanya produk yang belum punya tetangga."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--k", type=int, default=8, help="Jumlah tetangga per produk.")
+        parser.add_argument("--batch-size", type=int, default=500, help="Baris per batch perkalian matriks.")
+        parser.add_argument("--min-score", type=float, default=0.05, help="Cosine minimum supaya dianggap mirip.")
+        parser.add_argument(
+            "--missing-only",
+            action="store_true",
+            help="Refresh incremental: hitung produk baru, lalu sisipkan mereka ke daftar tetangga produk lama.",
+        )
+
+    def handle(self, *args, **opts):
+        try:
+            from catalog import similarity
+        except ImportError as e:
+            raise CommandError(f"NumPy/SciPy belum terpasang ({e}). Jalankan: pip install numpy scipy")
+        if opts["k"] < 1:
+            raise CommandError("--k minimal 1")
+
+        started = time.perf_counter()
+        ids, docs = [], []
+        for pk, name, description in (Product.objects.order_by("pk")
+                                      .values_list("pk", "product_name", "description")
+                                      .iterator(chunk_size=2000)):
+            ids.append(pk)
+            docs.append(similarity.document(name, description))
+        if not ids:
+            self.stdout.write("Katalog kosong, tidak ada yang dihitung.")
+            return
+
+        X = similarity.vectorize(docs)
+        index_of = {pk: i for i, pk in enumerate(ids)}
+        k, min_score = opts["k"], opts["min_score"]
+
+        if opts["missing_only"]:
+            has_neighbors = set(ProductNeighbor.objects.values_list("product_id", flat=True).distinct())
+            rows = [i for i, pk in enumerate(ids) if pk not in has_neighbors]
+        else:
+            rows = list(range(len(ids)))
+
+        written = 0
+        for batch in _batches(similarity.top_k(X, rows, k, opts["batch_size"], min_score), opts["batch_size"]):
+            written += self._write({ids[row]: [(ids[c], s) for c, s in found] for row, found in batch})
+
+        touched = 0
+        if opts["missing_only"] and rows and len(rows) < len(ids):
+            touched = self._merge_into_existing(similarity, X, ids, index_of, rows, k, min_score)
+
+        bump_catalog_version()  # detail produk (api_product_detail) di-cache per versi katalog
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Selesai: {len(rows)} produk dihitung, {touched} produk lama diperbarui, "
+            f"{written} baris tetangga ditulis dalam {elapsed:.2f}s."
+        ))
+
+    def _write(self, neighbors_by_product):
+        """Ganti daftar tetangga produk-produk ini dalam satu transaksi."""
+        objs = [
+            ProductNeighbor(product_id=pk, neighbor_id=nb, rank=rank, score=score)
+            for pk, found in neighbors_by_product.items()
+            for rank, (nb, score) in enumerate(found)
+        ]
+        with transaction.atomic():
+            ProductNeighbor.objects.filter(product_id__in=list(neighbors_by_product)).delete()
+            ProductNeighbor.objects.bulk_create(objs, batch_size=1000)
+        return len(objs)
+
+    def _merge_into_existing(self, similarity, X, ids, index_of, new_rows, k, min_score):
+        """
+        Produk baru bisa masuk top-k produk lama. Karena cosine simetris, cukup
+        hitung baru x semua, lalu gabungkan dengan daftar tersimpan produk lama
+        yang terdampak (skor lama dipakai apa adanya; rebuild penuh berkala
+        menyamakan IDF).
+        """
+        new_set = set(new_rows)
+        old_cols = [i for i in range(len(ids)) if i not in new_set]
+        candidates = {}
+        for start in range(0, len(new_rows), 500):
+            batch = new_rows[start:start + 500]
+            sims = similarity.scores_against(X, old_cols, batch).tocoo()
+            for r, c, s in zip(sims.row, sims.col, sims.data):
+                if s > min_score:
+                    candidates.setdefault(ids[old_cols[r]], []).append((ids[batch[c]], float(s)))
+        if not candidates:
+            return 0
+
+        stored = {}
+        affected = list(candidates)
+        for start in range(0, len(affected), 500):
+            for pk, nb, score in (ProductNeighbor.objects
+                                  .filter(product_id__in=affected[start:start + 500])
+                                  .order_by("product_id", "rank")
+                                  .values_list("product_id", "neighbor_id", "score")):
+                stored.setdefault(pk, []).append((nb, score))
+
+        updates = {}
+        for pk, new in candidates.items():
+            current = stored.get(pk, [])
+            best = dict(current)
+            for nb, score in new:
+                best[nb] = max(best.get(nb, 0.0), score)
+            merged = heapq.nsmallest(k, best.items(), key=lambda t: (-t[1], index_of.get(t[0], 0)))
+            if merged != current:
+                updates[pk] = merged
+        for batch in _batches(updates.items(), 500):
+            self._write(dict(batch))
+        return len(updates)
+
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -1,129 +1,292 @@
 import csv
-import re
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import islice
 from pathlib import Path
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
+from catalog.bulk import save_products
+from catalog.feeds import normalize_row, parse_file
 from catalog.models import Product
 from django.conf import settings
 
-def _clean_price(v):
-    if v is None:
-        return None
-    s = str(v).strip()
-    digits = re.sub(r"[^\d]", "", s)
-    return int(digits) if digits else None
-
-def _strip_keys(row: dict):
-    return {(k.strip() if isinstance(k, str) else k): v for k, v in row.items()}
-
-def _coalesce_description(row: dict) -> str:
-    parts = []
-    ks = (row.get("key_specs") or "").strip()
-    if ks:
-        parts.append(ks)
-    meta = []
-    if row.get("brand"):
-        meta.append(f"Brand: {row.get('brand')}")
-    if row.get("category"):
-        meta.append(f"Kategori: {row.get('category')}")
-    if row.get("variant"):
-        meta.append(f"Varian: {row.get('variant')}")
-    if meta:
-        parts.append(" | ".join(meta))
-    desc = "\n\n".join([p for p in parts if p])
-    return desc or (row.get("product_name") or "").strip()
+DEDUPE_FIELDS = ("external_id", "product_name", "price", "thumbnail")
+UPDATE_FIELDS = ("product_name", "stock", "inStock", "thumbnail", "description", "price", "external_id", "import_hash")
+DELETE_BATCH = 500
+_BY_NAME = object()  # penanda kunci fallback (nama produk) untuk baris dengan kunci dedupe kosong
+
+def _chunks(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _new_stats():
+    return {"rows": 0, "created": 0, "updated": 0, "unchanged": 0, "skipped": 0}
+
+def _expand_paths(specs):
+    """File, direktori (semua *.csv di dalamnya) atau pola glob -> list Path unik, urut."""
+    paths = []
+    for spec in specs:
+        p = Path(spec)
+        if p.is_dir():
+            matches = sorted(p.glob("*.csv"))
+        elif glob.has_magic(spec):
+            matches = sorted(Path(m) for m in glob.glob(spec, recursive=True) if Path(m).is_file())
+        elif p.exists():
+            matches = [p]
+        else:
+            raise CommandError(f"CSV tidak ditemukan: {spec}")
+        if not matches:
+            raise CommandError(f"Tidak ada file CSV yang cocok: {spec}")
+        paths.extend(m for m in matches if m not in paths)
+    return paths
+
+def _parsed_files(paths, workers, namespace_ids):
+    """
+    Yield (path, rows, error) per file, selalu urut sesuai ``paths``. Parsing +
+    normalisasi jalan paralel di process pool; satu writer (proses utama) menulis
+    hasilnya sesuai urutan input, jadi kalau kunci yang sama muncul di beberapa file
+    (tanpa ``--namespace-ids``) file terakhir selalu menang, bukan yang paling lambat selesai.
+    """
+    if workers <= 1:
+        for path in paths:
+            try:
+                yield path, parse_file(path, namespace_ids), None
+            except Exception as e:
+                yield path, None, e
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [(path, pool.submit(parse_file, str(path), namespace_ids)) for path in paths]
+        for path, future in futures:
+            try:
+                yield path, future.result(), None
+            except Exception as e:
+                yield path, None, e
 
 class Command(BaseCommand):
-    help = "Import produk ke catalog.Product dari file CSV."
+    help = (
+        "Import produk ke catalog.Product dari satu atau banyak file CSV "
+        "(parsing paralel per file, bulk write per chunk)."
+    )
 
     def add_arguments(self, parser):
         default_csv = Path(settings.BASE_DIR) / "catalog" / "management" / "data" / "dataset_pilates.csv"
         parser.add_argument(
-            "csv_path",
-            nargs="?",
-            default=str(default_csv),
+            "csv_paths",
+            nargs="*",
             type=str,
-            help=f"Path ke file CSV. (optional) Default: {default_csv}",
+            help=f"File CSV, direktori, atau pola glob (mis. 'feeds/*.csv'). (optional) Default: {default_csv}",
         )
         parser.add_argument(
             "--dedupe-by",
             default="external_id",
-            help="Field untuk pencocokan update_or_create. Contoh: external_id ATAU product_name,thumbnail,price",
+            help="Field untuk pencocokan update/create. Contoh: external_id ATAU product_name,thumbnail,price",
         )
         parser.add_argument(
             "--dry-run",
             action="store_true",
             help="Jalankan tanpa commit (cek hasil dulu).",
         )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Jumlah baris per chunk (1 transaksi + 1 bulk write per chunk).",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Jumlah proses parser untuk multi-file. Default: min(jumlah CPU, jumlah file).",
+        )
+        parser.add_argument(
+            "--namespace-ids",
+            action="store_true",
+            help="Prefix external_id dengan nama file (mis. 'stanley:12') supaya id antar feed tidak bentrok.",
+        )
+        parser.add_argument(
+            "--delete-missing",
+            action="store_true",
+            help="Hapus produk hasil import (punya external_id) yang tidak ada lagi di CSV.",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Lanjutkan import yang terputus dari checkpoint <csv_path>.progress (hanya 1 file).",
+        )
 
-    @transaction.atomic
     def handle(self, *args, **opts):
-        csv_path = Path(opts["csv_path"])
-        if not csv_path.exists():
-            raise CommandError(f"CSV tidak ditemukan: {csv_path}")
+        default_csv = Path(settings.BASE_DIR) / "catalog" / "management" / "data" / "dataset_pilates.csv"
+        paths = _expand_paths(opts["csv_paths"] or [str(default_csv)])
+        if opts["chunk_size"] < 1:
+            raise CommandError("--chunk-size minimal 1")
+        multi = len(paths) > 1
+        if opts["resume"] and multi:
+            raise CommandError("--resume hanya bisa dipakai untuk satu file CSV")
 
         # admin bisa pilih kunci pencocokan ulang (default external_id)
-        dedupe_fields = [f.strip() for f in str(opts["dedupe_by"]).split(",") if f.strip()]
+        dedupe_fields = tuple(
+            f.strip() for f in str(opts["dedupe_by"]).split(",") if f.strip() in DEDUPE_FIELDS
+        ) or ("external_id",)
         dry_run = opts["dry_run"]
+        delete_missing = opts["delete_missing"]
+        if delete_missing and (opts["resume"] or dedupe_fields != ("external_id",)):
+            raise CommandError("--delete-missing hanya bisa dipakai dengan --dedupe-by external_id dan tanpa --resume")
+        workers = opts["workers"] or min(os.cpu_count() or 1, len(paths))
 
-        with csv_path.open(newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            rows = list(reader)
-
-        created, updated, skipped = 0, 0, 0
-
-        for raw in rows:
-            row = _strip_keys(raw)
-            external_id = (row.get("id") or "").strip() or None
-            product_name = (row.get("product_name") or "").strip()
-            thumbnail = (row.get("image_url") or row.get("thumbnail") or "").strip() or None
-            price = _clean_price(row.get("price"))
-            stock = 1
-            in_stock = True if stock and stock > 0 else False
-            description = _coalesce_description(row)
-
-            if not product_name:
-                skipped += 1
-                continue
+        self.totals = {**_new_stats(), "deleted": 0}
+        self.seen = set() if delete_missing else None
+        self.failures = []
+        self.opts = opts
+        started = time.perf_counter()
 
-            lookup = {}
-            for f in dedupe_fields:
-                if f == "external_id":
-                    lookup["external_id"] = external_id
-                elif f == "product_name":
-                    lookup["product_name"] = product_name
-                elif f == "price":
-                    lookup["price"] = price
-                elif f == "thumbnail":
-                    lookup["thumbnail"] = thumbnail
-                else:
-                    pass
-
-            if not lookup:
-                lookup = {"external_id": external_id} if external_id else {"product_name": product_name}
-
-            defaults = {
-                "product_name": product_name,
-                "stock": stock,
-                "inStock": in_stock,
-                "thumbnail": thumbnail,
-                "description": description,
-                "price": price,
-                "external_id": external_id,  
-            }
-
-            obj, was_created = Product.objects.update_or_create(defaults=defaults, **lookup)
-            if was_created:
-                created += 1
+        # dry-run: semua chunk jadi savepoint di dalam satu transaksi yang di-rollback di akhir
+        with transaction.atomic() if dry_run else nullcontext():
+            if multi:
+                self._import_files(paths, workers, dedupe_fields)
             else:
-                updated += 1
+                self._import_stream(paths[0], dedupe_fields)
+            if delete_missing and self.failures:
+                self.stderr.write(self.style.WARNING("Ada file yang gagal, --delete-missing dilewati."))
+            elif delete_missing:
+                self._delete_missing()
+            if dry_run:
+                transaction.set_rollback(True)
+
+        elapsed = time.perf_counter() - started
+        summary = self._format(self.totals, elapsed)
 
+        for path, error in self.failures:
+            self.stderr.write(self.style.ERROR(f"GAGAL {path}: {error}"))
         if dry_run:
-            transaction.set_rollback(True)
             self.stdout.write(self.style.WARNING("Dry-run aktif: semua perubahan akan dibatalkan (rollback)."))
-            self.stdout.write(self.style.SUCCESS(f"Preview selesai. created={created}, updated={updated}, skipped={skipped}"))
+            self.stdout.write(self.style.SUCCESS(f"Preview selesai. {summary}"))
             return
+        self.stdout.write(self.style.SUCCESS(f"Import selesai. {summary}"))
+
+    def _format(self, stats, elapsed):
+        rate = stats["rows"] / elapsed if elapsed > 0 else float(stats["rows"])
+        deleted = f"deleted={stats['deleted']}, " if "deleted" in stats else ""
+        return (
+            f"created={stats['created']}, updated={stats['updated']}, unchanged={stats['unchanged']}, "
+            f"{deleted}skipped={stats['skipped']} ({stats['rows']} baris dalam {elapsed:.2f}s, {rate:,.0f} baris/detik)"
+        )
 
-        self.stdout.write(self.style.SUCCESS(
-            f"Import selesai. created={created}, updated={updated}, skipped={skipped}"
-        ))
+    def _add(self, stats):
+        for k, v in stats.items():
+            self.totals[k] += v
+
+    def _import_stream(self, csv_path, dedupe_fields):
+        """Satu file: dibaca streaming per chunk, checkpoint setelah tiap chunk (untuk --resume)."""
+        checkpoint = csv_path.with_name(csv_path.name + ".progress")
+        start_row = 0
+        if self.opts["resume"] and checkpoint.exists():
+            start_row = int(checkpoint.read_text().strip() or 0)
+            self.stdout.write(f"Resume dari baris {start_row}.")
+
+        processed = start_row
+        with csv_path.open(newline="", encoding="utf-8") as f:
+            reader = islice(csv.DictReader(f), start_row, None)
+            for chunk in _chunks(reader, self.opts["chunk_size"]):
+                stats = _new_stats()
+                with transaction.atomic():
+                    self._import_chunk([normalize_row(raw) for raw in chunk], dedupe_fields, stats)
+                self._add(stats)
+                processed += len(chunk)
+                if not self.opts["dry_run"]:
+                    checkpoint.write_text(str(processed))
+                if self.opts["verbosity"] >= 2:
+                    self.stdout.write(f"  {processed} baris diproses")
+        if not self.opts["dry_run"]:
+            checkpoint.unlink(missing_ok=True)
+
+    def _import_files(self, paths, workers, dedupe_fields):
+        """Multi-file: parsing paralel, satu writer; file yang gagal dicatat tanpa menghentikan run."""
+        self.stdout.write(f"{len(paths)} file, {workers} worker.")
+        for path, rows, error in _parsed_files(paths, workers, self.opts["namespace_ids"]):
+            started = time.perf_counter()
+            stats = _new_stats()
+            if error is None:
+                try:
+                    for chunk in _chunks(rows, self.opts["chunk_size"]):
+                        with transaction.atomic():
+                            self._import_chunk(chunk, dedupe_fields, stats)
+                except Exception as e:
+                    # chunk yang sudah commit tetap tersimpan; sisanya dilaporkan gagal
+                    error = e
+            self._add(stats)
+            if error is not None:
+                self.failures.append((path, f"{type(error).__name__}: {error}"))
+                continue
+            self.stdout.write(f"  {path.name}: {self._format(stats, time.perf_counter() - started)}")
+
+    def _import_chunk(self, chunk, dedupe_fields, stats):
+        """``chunk``: list hasil ``normalize_row`` (None = baris di-skip)."""
+        # baris valid per kunci dedupe; baris terakhir menang kalau kunci muncul dua kali
+        stats["rows"] += len(chunk)
+        incoming = {}
+        for fields in chunk:
+            if fields is None:
+                stats["skipped"] += 1
+                continue
+            if self.seen is not None and fields["external_id"]:
+                self.seen.add(fields["external_id"])
+            key = tuple(fields[f] for f in dedupe_fields)
+            if None in key:
+                # kunci kosong (mis. baris tanpa id): cocokkan lewat nama produk ke produk
+                # yang field kuncinya juga kosong, supaya import ulang tidak menduplikasi
+                key = (_BY_NAME, fields["product_name"], *key)
+            incoming[key] = fields
+        if not incoming:
+            return
+
+        # 1 query untuk semua produk existing di chunk ini (filter field pertama, cocokkan tuple di Python)
+        first = dedupe_fields[0]
+        lookup_values = {key[0] for key in incoming if key[0] is not _BY_NAME}
+        names = {key[1] for key in incoming if key[0] is _BY_NAME}
+        existing = {}
+        if lookup_values:
+            for p in Product.objects.filter(**{f"{first}__in": lookup_values}):
+                existing.setdefault(tuple(getattr(p, f) for f in dedupe_fields), p)
+        if names:
+            for p in Product.objects.filter(product_name__in=names).order_by("pk"):
+                existing.setdefault((_BY_NAME, p.product_name, *(getattr(p, f) for f in dedupe_fields)), p)
+
+        created, updated = [], []
+        for key, fields in incoming.items():
+            obj = existing.get(key)
+            if obj is None:
+                created.append(Product(**fields))
+            elif obj.import_hash == fields["import_hash"]:
+                stats["unchanged"] += 1  # baris supplier sama persis -> tidak ditulis
+            else:
+                for name, value in fields.items():
+                    setattr(obj, name, value)
+                updated.append(obj)
+
+        save_products(created, updated, UPDATE_FIELDS)
+        stats["created"] += len(created)
+        stats["updated"] += len(updated)
+
+    def _delete_missing(self):
+        """Hapus produk ber-external_id yang tidak muncul di CSV (dibaca per chunk, dihapus per batch)."""
+        if not self.seen:
+            # feed kosong/rusak jangan sampai menghapus seluruh katalog
+            self.stderr.write(self.style.WARNING("Tidak ada external_id di CSV, --delete-missing dilewati."))
+            return
+        missing = [
+            pk for pk, ext in Product.objects.filter(external_id__isnull=False)
+            .values_list("pk", "external_id").iterator(chunk_size=2000)
+            if ext not in self.seen
+        ]
+        for start in range(0, len(missing), DELETE_BATCH):
+            with transaction.atomic():
+                # delete() biasa supaya cascade + signal (unindex, versi katalog) tetap jalan
+                Product.objects.filter(pk__in=missing[start:start + DELETE_BATCH]).delete()
+        self.totals["deleted"] = len(missing)
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:28
+
+from urllib.parse import quote
+
+from django.db import migrations, models
+
+
+# salinan beku helper catalog.models saat migrasi ini ditulis (jangan import kode app yang hidup)
+def normalize_thumbnail_url(raw):
+    url = (raw or "").strip().strip('"').strip("'")
+    if not url:
+        return ""
+    if url.startswith("//"):
+        url = "https:" + url
+    elif url.startswith("www."):
+        url = "https://" + url
+    return url
+
+
+def proxy_thumbnail_url(url):
+    if not url:
+        return ""
+    no_scheme = url.replace("https://", "").replace("http://", "")
+    return (
+        "https://images.weserv.nl/?url="
+        + quote(no_scheme, safe="")
+        + "&w=1200&h=800&fit=cover&we&il"
+    )
+
+
+def backfill_thumbnail_urls(apps, schema_editor):
+    Product = apps.get_model("catalog", "Product")
+    batch = []
+    for p in Product.objects.exclude(thumbnail__isnull=True).exclude(thumbnail="").only("id", "thumbnail").iterator(chunk_size=1000):
+        p.thumbnail_normalized = normalize_thumbnail_url(p.thumbnail)
+        p.thumbnail_proxied = proxy_thumbnail_url(p.thumbnail_normalized)
+        batch.append(p)
+        if len(batch) >= 1000:
+            Product.objects.bulk_update(batch, ["thumbnail_normalized", "thumbnail_proxied"])
+            batch = []
+    if batch:
+        Product.objects.bulk_update(batch, ["thumbnail_normalized", "thumbnail_proxied"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0002_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='thumbnail_normalized',
+            field=models.URLField(blank=True, db_index=True, default='', editable=False, max_length=1000),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='thumbnail_proxied',
+            field=models.URLField(blank=True, db_index=True, default='', editable=False, max_length=1000),
+        ),
+        migrations.RunPython(backfill_thumbnail_urls, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:02
+
+import hashlib
+
+from django.conf import settings
+from django.db import migrations
+
+
+# salinan beku catalog.thumbnails.thumbnail_path saat migrasi ini ditulis
+# (PIPELINE_VERSION "1", ukuran "card", webp); jangan import kode app yang hidup
+def thumbnail_path(url):
+    if not url:
+        return ""
+    key = hashlib.sha256(f"1:{url}".encode()).hexdigest()[:32]
+    prefix = getattr(settings, "THUMBNAIL_URL", "/catalog/thumbs/")
+    return f"{prefix}{key}/card.webp"
+
+
+def repoint_thumbnails(apps, schema_editor):
+    # thumbnail_proxied pindah dari URL images.weserv.nl ke thumbnail lokal
+    Product = apps.get_model("catalog", "Product")
+    batch = []
+    for p in Product.objects.exclude(thumbnail_normalized="").only("id", "thumbnail_normalized").iterator(chunk_size=1000):
+        p.thumbnail_proxied = thumbnail_path(p.thumbnail_normalized)
+        batch.append(p)
+        if len(batch) >= 1000:
+            Product.objects.bulk_update(batch, ["thumbnail_proxied"])
+            batch = []
+    if batch:
+        Product.objects.bulk_update(batch, ["thumbnail_proxied"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0003_product_thumbnail_urls'),
+    ]
+
+    operations = [
+        migrations.RunPython(repoint_thumbnails, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0004_product_local_thumbnails'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='import_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+    ]
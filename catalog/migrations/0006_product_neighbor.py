@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0005_product_import_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductNeighbor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('neighbor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='catalog.product')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbors', to='catalog.product')),
+            ],
+            options={
+                'ordering': ('product', 'rank'),
+                'constraints': [models.UniqueConstraint(fields=('product', 'rank'), name='catalog_neighbor_product_rank')],
+            },
+        ),
+    ]
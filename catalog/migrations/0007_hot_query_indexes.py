@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0006_product_neighbor'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('inStock', True)), fields=['-id'], name='catalog_prod_instock_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['price', '-id'], name='catalog_prod_price_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-price', '-id'], name='catalog_prod_price_desc_idx'),
+        ),
+    ]
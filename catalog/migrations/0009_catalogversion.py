@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:02
+
+import time
+
+from django.db import migrations, models
+
+
+def create_row(apps, schema_editor):
+    CatalogVersion = apps.get_model("catalog", "CatalogVersion")
+    # mulai dari timestamp supaya tidak mengulang versi yang mungkin masih ada di cache lama
+    CatalogVersion.objects.get_or_create(pk=1, defaults={"value": int(time.time() * 1000)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0008_product_reserved'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.BigIntegerField()),
+            ],
+        ),
+        migrations.RunPython(create_row, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# FTS SQLite di-key lewat rowid integer (lihat catalog/search.py): baris FTS
+# dihapus/di-join per rowid, bukan lewat kolom product_id UNINDEXED (full scan).
+
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    "DROP TABLE IF EXISTS catalog_product_fts",
+    """
+    CREATE TABLE IF NOT EXISTS catalog_product_fts_key (
+        id INTEGER PRIMARY KEY,
+        product_id char(32) NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE catalog_product_fts USING fts5(
+        product_name,
+        description,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    "INSERT INTO catalog_product_fts_key (product_id) SELECT id FROM catalog_product",
+    """
+    INSERT INTO catalog_product_fts (rowid, product_name, description)
+    SELECT k.id, p.product_name, p.description
+    FROM catalog_product_fts_key k JOIN catalog_product p ON p.id = k.product_id
+    """,
+]
+SQLITE_REVERSE = [
+    "DROP TABLE IF EXISTS catalog_product_fts",
+    "DROP TABLE IF EXISTS catalog_product_fts_key",
+    """
+    CREATE VIRTUAL TABLE catalog_product_fts USING fts5(
+        product_id UNINDEXED,
+        product_name,
+        description,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    INSERT INTO catalog_product_fts (product_id, product_name, description)
+    SELECT id, product_name, description FROM catalog_product
+    """,
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for sql in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0009_catalogversion"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({"sqlite": SQLITE_FORWARD}),
+            _run({"sqlite": SQLITE_REVERSE}),
+        ),
+    ]
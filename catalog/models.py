@@ -1,8 +1,10 @@
 import uuid
-from urllib.parse import quote
 
+from django.conf import settings
 from django.db import models
 
+from .thumbnails import thumbnail_path
+
 class Product(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     product_name = models.CharField(max_length=255)
@@ -19,35 +21,155 @@ class Product(models.Model):
         blank=True,
         help_text="ID unik dari dataset/CSV (1 baris CSV = 1 produk).",)  # dipakai importer buat dedupe/update
 
+    # turunan dari `thumbnail`, dihitung sekali di save() supaya listing tidak olah URL per baris
+    thumbnail_normalized = models.URLField(max_length=1000, blank=True, default="", db_index=True, editable=False)
+    thumbnail_proxied = models.URLField(max_length=1000, blank=True, default="", db_index=True, editable=False)
+
+    THUMBNAIL_DERIVED_FIELDS = ("thumbnail_normalized", "thumbnail_proxied")
+
+    # sha256 baris supplier terakhir yang di-import; importer skip baris yang hash-nya sama
+    import_hash = models.CharField(max_length=64, blank=True, default="", editable=False)
+
+    # jumlah yang sedang di-hold cart (cart/reservations.py); tersedia = stock - reserved.
+    # hanya diubah lewat UPDATE atomik, selalu 0 kalau reservasi stok nonaktif
+    reserved = models.PositiveIntegerField(default=0, editable=False)
+    COUNTER_FIELDS = ("reserved",)
+
+    # field yang masuk index full-text (catalog/search.py)
+    SEARCH_FIELDS = ("product_name", "description")
+
+    class Meta:
+        indexes = [
+            # landing_highlights: inStock=True ORDER BY -id
+            models.Index(fields=["-id"], condition=models.Q(inStock=True), name="catalog_prod_instock_id_idx"),
+            # show_main / api_products: sort price / -price (tie-breaker -id, lihat pagination.ORDERINGS)
+            models.Index(fields=["price", "-id"], name="catalog_prod_price_id_idx"),
+            models.Index(fields=["-price", "-id"], name="catalog_prod_price_desc_idx"),
+        ]
+
     def __str__(self):
         return f"{self.product_name} - Rp{self.price:,}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._search_snapshot = instance._search_values()
+        return instance
+
+    def _search_values(self):
+        # lewat __dict__ supaya field yang di-defer tidak memicu query
+        return tuple(self.__dict__.get(f) for f in self.SEARCH_FIELDS)
+
+    def search_fields_changed(self) -> bool:
+        """Nama/deskripsi berubah sejak dimuat dari DB (atau produk baru)?"""
+        return getattr(self, "_search_snapshot", None) != self._search_values()
+
+    def sync_thumbnail_urls(self):
+        """Isi ulang kolom URL turunan dari `thumbnail` (dipakai save() & jalur bulk)."""
+        self.thumbnail_normalized = normalize_thumbnail_url(self.thumbnail)
+        self.thumbnail_proxied = proxy_thumbnail_url(self.thumbnail_normalized)
+
+    def save(self, *args, **kwargs):
+        self.sync_thumbnail_urls()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "thumbnail" in update_fields:
+            kwargs["update_fields"] = set(update_fields) | set(self.THUMBNAIL_DERIVED_FIELDS)
+        elif update_fields is None and not self._state.adding:
+            # save() biasa (admin, API) jangan menimpa counter hold dengan nilai lama di memori
+            kwargs["update_fields"] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
     @property
     def normalized_thumbnail(self) -> str:
-        """Bersihkan kutip/whitespace & pastikan ada protokol."""
-        url = (self.thumbnail or "").strip().strip('"').strip("'")
-        if not url:
-            return ""
-        if url.startswith("//"):
-            url = "https:" + url
-        elif url.startswith("www."):
-            url = "https://" + url
-        return url
+        if self.thumbnail_normalized or not self.thumbnail:
+            return self.thumbnail_normalized
+        return normalize_thumbnail_url(self.thumbnail)
 
     @property
     def proxied_thumbnail(self) -> str:
-        """
-        Pakai images.weserv.nl biar lolos hotlink/CORS.
-        Kita kirim host+path saja (tanpa skema), di-encode aman.
-        """
-        url = self.normalized_thumbnail
-        if not url:
-            return ""
-        
-        no_scheme = url.replace("https://", "").replace("http://", "")
-        return (
-            "https://images.weserv.nl/?url="
-            + quote(no_scheme, safe="")
-            + "&w=1200&h=800&fit=cover&we&il"
-        )
-    
+        if self.thumbnail_proxied or not self.thumbnail:
+            return self.thumbnail_proxied
+        return proxy_thumbnail_url(self.normalized_thumbnail)
+
+    @property
+    def detail_thumbnail(self) -> str:
+        return proxy_thumbnail_url(self.normalized_thumbnail, "detail")
+
+
+def normalize_thumbnail_url(raw) -> str:
+    """Bersihkan kutip/whitespace & pastikan ada protokol."""
+    url = (raw or "").strip().strip('"').strip("'")
+    if not url:
+        return ""
+    if url.startswith("//"):
+        url = "https:" + url
+    elif url.startswith("www."):
+        url = "https://" + url
+    return url
+
+
+def proxy_thumbnail_url(url, size="card") -> str:
+    """
+    URL thumbnail lokal hasil resize (lihat catalog/thumbnails.py),
+    gantinya proxy images.weserv.nl.
+    """
+    return thumbnail_path(url, size)
+
+
+class ProductNeighbor(models.Model):
+    """
+    Top-k produk mirip (cosine TF-IDF nama + deskripsi), dihitung offline oleh
+    ``manage.py build_product_neighbors``; halaman detail cukup 1 query ter-index.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="neighbors")
+    neighbor = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ("product", "rank")
+        constraints = [
+            models.UniqueConstraint(fields=["product", "rank"], name="catalog_neighbor_product_rank"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.neighbor_id} ({self.score:.3f})"
+
+
+SIMILAR_LIMIT = 8
+
+
+def similar_products(product, limit=SIMILAR_LIMIT):
+    """Produk mirip ``product`` dari tabel ProductNeighbor (1 query, urut rank)."""
+    rows = (ProductNeighbor.objects
+            .filter(product=product, rank__lt=limit)
+            .select_related("neighbor")
+            .order_by("rank"))
+    return [row.neighbor for row in rows]
+
+
+class CatalogVersion(models.Model):
+    """
+    Satu row (pk=1): versi katalog untuk key cache / ETag (lihat ``catalog.versioning``).
+    Disimpan di DB supaya semua worker melihat angka yang sama walau cache-nya per proses.
+    """
+    value = models.BigIntegerField()
+
+    def __str__(self):
+        return str(self.value)
+
+
+class WishlistVersion(models.Model):
+    """
+    Versi wishlist per user, naik setiap ``User.wishlist`` berubah (lihat ``catalog.wishlist``).
+    Key cache ID wishlist memakai versi ini, jadi write di satu worker langsung
+    membuat blob di cache worker lain tidak terpakai lagi.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name="+")
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.value}"
@@ -0,0 +1,175 @@
+"""
+Keyset (cursor) pagination untuk listing produk.
+
+Beda dengan offset (``qs[offset:offset + limit]``), keyset tidak perlu
+men-skip baris sebelumnya, jadi halaman 1 dan halaman 500 sama murahnya:
+
+    page = keyset_page(qs, "price", request.GET.get("cursor"), limit)
+    page.object_list, page.next_cursor, page.prev_cursor
+
+Cursor adalah token opaque (base64 JSON) berisi nilai kolom urutan dari
+baris terakhir/pertama halaman, jadi client tinggal kirim balik apa adanya.
+"""
+import base64
+import hashlib
+import json
+from uuid import UUID
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+
+from .versioning import get_catalog_version
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 100
+COUNT_CACHE_TIMEOUT = 60  # detik
+
+# key urutan -> field order_by (field terakhir selalu tie-breaker unik: id)
+ORDERINGS = {
+    "-id": ("-id",),
+    "price": ("price", "-id"),
+    "-price": ("-price", "-id"),
+    "relevance": ("-search_rank", "-id"),  # hanya valid untuk hasil search_products()
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def clamp_limit(raw, default=DEFAULT_LIMIT):
+    try:
+        limit = int(raw)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def encode_cursor(ordering, values, direction="n"):
+    payload = json.dumps({"o": ordering, "v": values, "d": direction}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token, ordering):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        values, direction = data["v"], data["d"]
+    except (ValueError, TypeError, KeyError, UnicodeDecodeError):
+        raise InvalidCursor("Malformed cursor")
+    fields = ORDERINGS[ordering]
+    if data.get("o") != ordering or direction not in ("n", "p") or len(values) != len(fields):
+        raise InvalidCursor("Cursor does not match ordering")
+    return values, direction
+
+
+def _flip(field):
+    return field[1:] if field.startswith("-") else "-" + field
+
+
+def _value(obj, field):
+    v = getattr(obj, field.lstrip("-"))
+    return str(v) if isinstance(v, UUID) else v
+
+
+def _after(fields, values):
+    """
+    Q untuk "baris setelah (values)" mengikuti urutan ``fields``:
+    (a > x) OR (a = x AND b > y) OR ... dengan arah per kolom.
+    """
+    cond = Q()
+    for i, field in enumerate(fields):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        step = Q(**{f"{name}__{lookup}": values[i]})
+        for prev_field, prev_value in zip(fields[:i], values[:i]):
+            step &= Q(**{prev_field.lstrip("-"): prev_value})
+        cond |= step
+    return cond
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor, prev_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def keyset_page(qs, ordering, cursor=None, limit=DEFAULT_LIMIT):
+    """Ambil satu halaman ``qs`` setelah/sebelum ``cursor`` (None = halaman pertama)."""
+    if ordering not in ORDERINGS:
+        raise InvalidCursor(f"Unsupported ordering: {ordering}")
+    fields = ORDERINGS[ordering]
+    limit = clamp_limit(limit)
+
+    direction = "n"
+    if cursor:
+        values, direction = decode_cursor(cursor, ordering)
+        walk = fields if direction == "n" else tuple(_flip(f) for f in fields)
+        qs = qs.filter(_after(walk, values)).order_by(*walk)
+    else:
+        qs = qs.order_by(*fields)
+
+    rows = list(qs[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if direction == "p":
+        rows.reverse()
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, bool(cursor)
+
+    next_cursor = prev_cursor = None
+    if rows and has_next:
+        next_cursor = encode_cursor(ordering, [_value(rows[-1], f) for f in fields], "n")
+    if rows and has_previous:
+        prev_cursor = encode_cursor(ordering, [_value(rows[0], f) for f in fields], "p")
+    return KeysetPage(rows, next_cursor, prev_cursor)
+
+
+# ==========================
+# Count (cached / estimated)
+# ==========================
+
+def _estimated_table_count(model):
+    # statistik planner Postgres, cukup untuk "± N produk" di katalog tanpa filter
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [model._meta.db_table])
+        row = cursor.fetchone()
+    return row[0] if row and row[0] is not None and row[0] >= 0 else None
+
+
+def cached_count(qs, timeout=COUNT_CACHE_TIMEOUT):
+    """
+    COUNT(*) yang di-cache per bentuk query selama ``timeout`` detik
+    (atau sampai versi katalog naik karena ada Product yang berubah).
+    Untuk tabel tanpa filter di Postgres dipakai estimasi dari pg_class.
+    """
+    if connection.vendor == "postgresql" and not qs.query.where:
+        estimate = _estimated_table_count(qs.model)
+        if estimate:
+            return estimate
+
+    sql, params = qs.order_by().query.sql_with_params()
+    key = f"catalog:count:{get_catalog_version()}:" + hashlib.md5(f"{sql}|{params}".encode()).hexdigest()
+    total = cache.get(key)
+    if total is None:
+        total = qs.count()
+        cache.set(key, total, timeout)
+    return total
@@ -0,0 +1,191 @@
+"""
+Full-text search untuk catalog.Product.
+
+Satu API dipakai shop page (main.views.show_main) dan catalog API:
+
+    qs = search_products(Product.objects.all(), q)
+
+Backend:
+- SQLite   -> tabel virtual FTS5 ``catalog_product_fts`` (diisi lewat
+              signal save/delete + ``index_products`` untuk jalur bulk/importer).
+              Baris FTS di-key rowid integer; ``catalog_product_fts_key``
+              memetakan rowid itu ke Product.id (UUID)
+- Postgres -> kolom generated ``search_vector`` (tsvector) + GIN index,
+              otomatis ikut ter-update oleh database setiap INSERT/UPDATE
+- lainnya  -> fallback ``icontains`` (tanpa ranking)
+"""
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = "catalog_product_fts"
+KEY_TABLE = "catalog_product_fts_key"  # rowid FTS <-> product_id
+
+# bobot ranking: nama produk jauh lebih penting daripada deskripsi
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+MAX_TERMS = 8
+INDEX_BATCH = 500  # batas parameter per query IN (...)
+
+
+def tokenize(q: str):
+    """Pecah query user jadi token alfanumerik (aman dipakai di MATCH/tsquery)."""
+    return _TOKEN_RE.findall((q or "").lower())[:MAX_TERMS]
+
+
+def backend() -> str:
+    vendor = connection.vendor
+    if vendor in ("sqlite", "postgresql"):
+        return vendor
+    return "fallback"
+
+
+# ==========================
+# Index maintenance (SQLite)
+# ==========================
+
+def _db_pk(pk):
+    from catalog.models import Product
+    return Product._meta.pk.get_db_prep_value(pk, connection)
+
+
+def _rowids(cursor, db_pks):
+    """product_id -> rowid FTS untuk ``db_pks`` yang sudah punya key."""
+    found = {}
+    for start in range(0, len(db_pks), INDEX_BATCH):
+        batch = db_pks[start:start + INDEX_BATCH]
+        cursor.execute(
+            f"SELECT product_id, id FROM {KEY_TABLE} WHERE product_id IN ({', '.join(['%s'] * len(batch))})",
+            batch,
+        )
+        found.update(cursor.fetchall())
+    return found
+
+
+def index_products(products):
+    """
+    Upsert baris FTS untuk produk yang diberikan.
+    Dipanggil dari signal post_save dan dari jalur bulk (importer, dsb).
+    Di Postgres tidak perlu apa-apa karena tsvector adalah generated column.
+    """
+    if backend() != "sqlite":
+        return
+    rows = {_db_pk(p.pk): (p.product_name or "", p.description or "") for p in products}
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {KEY_TABLE} (product_id) VALUES (%s) ON CONFLICT (product_id) DO NOTHING",
+            [(pk,) for pk in rows],
+        )
+        rowids = _rowids(cursor, list(rows))
+        # hapus per rowid (integer primary key FTS) -> seek, bukan scan seluruh tabel
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(r,) for r in rowids.values()])
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, product_name, description) VALUES (%s, %s, %s)",
+            [(rowids[pk], *fields) for pk, fields in rows.items()],
+        )
+
+
+def unindex_products(pks):
+    if backend() != "sqlite":
+        return
+    pks = [_db_pk(pk) for pk in pks]
+    if not pks:
+        return
+    with connection.cursor() as cursor:
+        rowids = [(r,) for r in _rowids(cursor, pks).values()]
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", rowids)
+        cursor.executemany(f"DELETE FROM {KEY_TABLE} WHERE id = %s", rowids)
+
+
+def rebuild_index():
+    """Bangun ulang seluruh index FTS dari tabel catalog_product."""
+    if backend() != "sqlite":
+        return
+    from catalog.models import Product
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(f"DELETE FROM {KEY_TABLE}")
+        cursor.execute(f"INSERT INTO {KEY_TABLE} (product_id) SELECT id FROM {Product._meta.db_table}")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, product_name, description) "
+            f"SELECT k.id, p.product_name, p.description FROM {KEY_TABLE} k "
+            f"JOIN {Product._meta.db_table} p ON p.id = k.product_id"
+        )
+
+
+# ==========================
+# Query API
+# ==========================
+
+def _fts5_match(terms):
+    # setiap token jadi prefix query, di-quote supaya operator FTS5 tidak ikut terbaca
+    return " ".join(f'"{t}"*' for t in terms)
+
+
+def _tsquery(terms):
+    return " & ".join(f"{t}:*" for t in terms)
+
+
+def search_products(qs, q, ordered=True):
+    """
+    Filter ``qs`` dengan full-text search atas product_name + description.
+
+    Hasil diberi anotasi ``search_rank`` (makin besar makin relevan) dan,
+    kalau ``ordered=True``, diurutkan berdasarkan relevansi lalu ``-id``.
+    Query tanpa token (kosong, "!!", "-") tidak memfilter apa pun, tapi tetap
+    diberi ``search_rank`` = 0 supaya ordering "relevance" caller tetap valid.
+    """
+    terms = tokenize(q)
+    if not terms:
+        qs = qs.annotate(search_rank=Value(0.0, output_field=FloatField()))
+        return qs.order_by("-search_rank", "-id") if ordered else qs
+
+    table = qs.model._meta.db_table
+    kind = backend()
+
+    if kind == "sqlite":
+        # MATCH sekali, lalu join ke produk lewat rowid (tanpa subquery per baris)
+        qs = qs.extra(
+            tables=[KEY_TABLE, FTS_TABLE],
+            where=[
+                f"{KEY_TABLE}.product_id = {table}.id",
+                f"{FTS_TABLE}.rowid = {KEY_TABLE}.id",
+                f"{FTS_TABLE} MATCH %s",
+            ],
+            params=[_fts5_match(terms)],
+        ).annotate(
+            # bm25() negatif (makin kecil makin relevan) -> dibalik supaya konsisten dgn Postgres
+            search_rank=RawSQL(
+                f"-bm25({FTS_TABLE}, %s, %s)",
+                [NAME_WEIGHT, DESCRIPTION_WEIGHT],
+                output_field=FloatField(),
+            )
+        )
+    elif kind == "postgresql":
+        tsq = _tsquery(terms)
+        qs = qs.extra(
+            where=[f"{table}.search_vector @@ to_tsquery('simple', %s)"],
+            params=[tsq],
+        ).annotate(
+            search_rank=RawSQL(
+                f"ts_rank({table}.search_vector, to_tsquery('simple', %s))",
+                [tsq],
+                output_field=FloatField(),
+            )
+        )
+    else:
+        cond = Q()
+        for t in terms:
+            cond &= Q(product_name__icontains=t) | Q(description__icontains=t)
+        # tanpa ranking, tapi tetap sediakan search_rank supaya ordering "relevance" valid
+        qs = qs.filter(cond).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    if ordered:
+        qs = qs.order_by("-search_rank", "-id")
+    return qs
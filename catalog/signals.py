@@ -0,0 +1,35 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from . import search, suggest, wishlist
+from .versioning import bump_catalog_version
+from .models import Product
+
+
+# jaga index full-text tetap sinkron setiap Product disimpan / dihapus
+@receiver(post_save, sender=Product)
+def _index_product_on_save(sender, instance, **kwargs):
+    # edit stok/harga dsb. tidak menyentuh teks yang di-index
+    changed = [instance] if instance.search_fields_changed() else []
+    search.index_products(changed)
+    instance._search_snapshot = instance._search_values()
+    bump_catalog_version()  # duluan: index suggest mencatat versi setelah bump ini
+    transaction.on_commit(lambda: suggest.index_products(changed))
+
+
+@receiver(post_delete, sender=Product)
+def _unindex_product_on_delete(sender, instance, **kwargs):
+    search.unindex_products([instance.pk])
+    pk = instance.pk
+    bump_catalog_version()
+    transaction.on_commit(lambda: suggest.unindex_products([pk]))
+
+
+# versi cache wishlist per user dinaikkan setiap write (lihat catalog/wishlist.py)
+m2m_changed.connect(
+    wishlist.on_wishlist_changed,
+    sender=get_user_model().wishlist.through,
+    dispatch_uid="catalog_wishlist_cache",
+)
@@ -0,0 +1,81 @@
+"""
+TF-IDF + cosine top-k untuk tabel ProductNeighbor.
+
+Butuh NumPy + SciPy (lihat requirements.txt); hanya dipakai command offline
+``build_product_neighbors``, bukan di jalur request.
+
+Alur:
+1. ``vectorize(docs)``      -> matriks CSR (n_docs x vocab), baris ter-normalisasi L2
+2. ``top_k(X, rows, k)``    -> untuk tiap baris di ``rows``: k tetangga teratas
+   (X[rows] @ X.T dikerjakan per batch supaya memori tetap kecil)
+"""
+import math
+import re
+from collections import Counter
+
+import numpy as np
+from scipy import sparse
+
+_TOKEN_RE = re.compile(r"[^\W\d_]{2,}|\d+[^\W_]*", re.UNICODE)
+NAME_WEIGHT = 3     # kata di nama produk dihitung 3x kata di deskripsi
+BATCH_SIZE = 500
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+def document(name, description):
+    return tokenize(name) * NAME_WEIGHT + tokenize(description)
+
+
+def vectorize(docs):
+    """
+    ``docs``: list token per dokumen. TF sublinear (1 + log tf) x IDF smooth
+    (log((1 + n) / (1 + df)) + 1), lalu normalisasi L2 per baris.
+    """
+    vocab = {}
+    rows, cols, vals = [], [], []
+    for i, tokens in enumerate(docs):
+        for term, tf in Counter(tokens).items():
+            j = vocab.setdefault(term, len(vocab))
+            rows.append(i)
+            cols.append(j)
+            vals.append(1.0 + math.log(tf))
+    X = sparse.csr_matrix(
+        (np.asarray(vals, dtype=np.float32), (rows, cols)),
+        shape=(len(docs), max(len(vocab), 1)),
+    )
+    df = np.bincount(X.indices, minlength=X.shape[1])
+    idf = np.log((1.0 + X.shape[0]) / (1.0 + df)) + 1.0
+    X = X @ sparse.diags(idf.astype(np.float32))
+    norms = np.sqrt(np.asarray(X.multiply(X).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.csr_matrix(sparse.diags(1.0 / norms) @ X)
+
+
+def top_k(X, rows, k, batch_size=BATCH_SIZE, min_score=0.0):
+    """
+    Yield (row, [(col, score), ...]) untuk tiap ``row`` di ``rows``:
+    k kolom X dengan cosine tertinggi (tanpa dirinya sendiri), urut menurun.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    XT = X.T.tocsc()
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        sims = (X[batch] @ XT).tocsr()
+        for offset, row in enumerate(batch):
+            lo, hi = sims.indptr[offset], sims.indptr[offset + 1]
+            cols, scores = sims.indices[lo:hi], sims.data[lo:hi]
+            keep = (cols != row) & (scores > min_score)
+            cols, scores = cols[keep], scores[keep]
+            if len(cols) > k:
+                part = np.argpartition(-scores, k)[:k]
+                cols, scores = cols[part], scores[part]
+            order = np.lexsort((cols, -scores))  # skor menurun, tie -> index kecil dulu (deterministik)
+            yield int(row), [(int(cols[i]), float(scores[i])) for i in order]
+
+
+def scores_against(X, rows, cols):
+    """Cosine ``rows`` x ``cols`` (sparse) - dipakai refresh incremental."""
+    return (X[np.asarray(rows)] @ X[np.asarray(cols)].T).tocsr()
@@ -0,0 +1,267 @@
+"""
+Autocomplete produk dari prefix index (trie) di memori proses.
+
+    suggest("quen", limit=8) -> [{"id": "...", "name": "The Quencher H.2 Flowstate"}, ...]
+
+- Setiap kata di ``product_name`` dimasukkan ke trie; tiap node menyimpan
+  cache ``top`` (TOP_K entri terbaik di subtree-nya), jadi query 1 kata
+  cukup jalan sepanjang prefix lalu baca list yang sudah jadi.
+- Index dibangun sekali dari DB saat pertama dipakai, lalu di-update
+  incremental lewat signal save/delete Product (lihat catalog/signals.py)
+  dan ``bulk.save_products``.
+- Setiap perubahan lokal ikut menyamakan ``index.version`` dengan versi katalog.
+  Perubahan dari proses/worker lain terlihat sebagai versi yang berbeda: index
+  dibangun ulang di thread background (paling cepat tiap REBUILD_INTERVAL detik),
+  request tetap dilayani index lama tanpa menyentuh DB.
+"""
+import heapq
+import re
+import threading
+import time
+from bisect import insort
+
+from django.db import connection
+
+from .versioning import get_catalog_version
+
+TOP_K = 50          # cache per node; > MAX_LIMIT supaya masih cukup setelah dedupe nama
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+REBUILD_INTERVAL = 60  # detik
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+def _index_text(name):
+    # brand belum disimpan di Product; begitu ada, gabungkan di sini
+    return name
+
+
+class _Node:
+    __slots__ = ("children", "ids", "top")
+
+    def __init__(self):
+        self.children = {}
+        self.ids = set()   # entri yang punya kata tepat berakhir di node ini
+        self.top = []      # cache TOP_K (rank, id) terbaik di subtree; None = perlu dihitung ulang
+
+
+class SuggestIndex:
+    def __init__(self, version=None):
+        self.root = _Node()
+        self.entries = {}  # id -> (rank, name, tokens)
+        self.version = version
+        self.built_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _rank(name):
+        # nama pendek duluan (biasanya lebih "tepat"), lalu alfabetis
+        return (len(name), name.lower())
+
+    # ---------- mutasi ----------
+
+    def add(self, pk, name):
+        pk = str(pk)
+        with self._lock:
+            self._remove(pk)
+            name = (name or "").strip()
+            tokens = set(tokenize(_index_text(name)))
+            if not tokens:
+                return
+            rank = self._rank(name)
+            self.entries[pk] = (rank, name, tokens)
+            item = (rank, pk)
+            for token in tokens:
+                node = self.root
+                for ch in token:
+                    node = node.children.setdefault(ch, _Node())
+                    if node.top is not None and item not in node.top:
+                        insort(node.top, item)
+                        del node.top[TOP_K:]
+                node.ids.add(pk)
+
+    def remove(self, pk):
+        with self._lock:
+            self._remove(str(pk))
+
+    def _remove(self, pk):
+        entry = self.entries.pop(pk, None)
+        if entry is None:
+            return
+        rank, _, tokens = entry
+        item = (rank, pk)
+        for token in tokens:
+            node, path = self.root, []
+            for ch in token:
+                node = node.children.get(ch)
+                if node is None:
+                    break
+                path.append((ch, node))
+                if node.top is not None and item in node.top:
+                    node.top = None  # subtree mungkin masih punya kandidat lain -> hitung ulang saat dibaca
+            else:
+                node.ids.discard(pk)
+                # buang node kosong dari bawah
+                for i in range(len(path) - 1, -1, -1):
+                    ch, n = path[i]
+                    if n.ids or n.children:
+                        break
+                    parent = path[i - 1][1] if i else self.root
+                    del parent.children[ch]
+
+    # ---------- query ----------
+
+    def _find(self, prefix):
+        node = self.root
+        for ch in prefix:
+            node = node.children.get(ch)
+            if node is None:
+                return None
+        return node
+
+    def _subtree_ids(self, node):
+        out, stack = set(), [node]
+        while stack:
+            n = stack.pop()
+            out |= n.ids
+            stack.extend(n.children.values())
+        return out
+
+    def _top(self, node):
+        if node.top is None:
+            ids = self._subtree_ids(node)
+            node.top = heapq.nsmallest(TOP_K, ((self.entries[i][0], i) for i in ids))
+        return node.top
+
+    def suggest(self, q, limit=DEFAULT_LIMIT):
+        terms = tokenize(q)
+        if not terms:
+            return []
+        with self._lock:
+            nodes = [self._find(t) for t in terms]
+            if any(n is None for n in nodes):
+                return []
+            if len(terms) == 1:
+                candidates = self._top(nodes[0])
+            else:
+                # mulai dari term paling spesifik (terpanjang), cek term lain lewat token entri
+                order = sorted(range(len(terms)), key=lambda i: -len(terms[i]))
+                ids = self._subtree_ids(nodes[order[0]])
+                others = [terms[i] for i in order[1:]]
+                candidates = heapq.nsmallest(TOP_K, (
+                    (self.entries[i][0], i) for i in ids
+                    if all(any(tok.startswith(t) for tok in self.entries[i][2]) for t in others)
+                ))
+
+            results, seen_names = [], set()
+            for _, pk in candidates:
+                name = self.entries[pk][1]
+                if name.lower() in seen_names:
+                    continue  # varian dengan nama sama cukup muncul sekali
+                seen_names.add(name.lower())
+                results.append({"id": pk, "name": name})
+                if len(results) >= limit:
+                    break
+            return results
+
+
+_index = None
+_build_lock = threading.Lock()
+_rebuilding = False
+
+
+def build_index():
+    from .models import Product
+
+    index = SuggestIndex(version=get_catalog_version())
+    for pk, name in Product.objects.values_list("id", "product_name").iterator(chunk_size=2000):
+        index.add(pk, name)
+    return index
+
+
+def _rebuild(stale):
+    global _index, _rebuilding
+    try:
+        fresh = build_index()
+        with _build_lock:
+            if _index is stale:
+                _index = fresh
+    finally:
+        _rebuilding = False
+        connection.close()  # koneksi milik thread ini
+
+
+def _start_rebuild(stale):
+    threading.Thread(target=_rebuild, args=(stale,), daemon=True, name="suggest-rebuild").start()
+
+
+def get_index():
+    global _index, _rebuilding
+    index = _index
+    if index is None:
+        # build pertama (proses baru) memang harus menunggu DB
+        with _build_lock:
+            if _index is None:
+                _index = build_index()
+            return _index
+    if (
+        not _rebuilding
+        and time.monotonic() - index.built_at > REBUILD_INTERVAL
+        and index.version != get_catalog_version()
+    ):
+        with _build_lock:
+            if not _rebuilding and _index is index:
+                _rebuilding = True
+                index.built_at = time.monotonic()  # jangan cek ulang sebelum interval berikutnya
+                _start_rebuild(index)
+    return index
+
+
+def suggest(q, limit=DEFAULT_LIMIT):
+    return get_index().suggest(q, max(1, min(limit, MAX_LIMIT)))
+
+
+# ---------- hook incremental (signal / jalur bulk) ----------
+
+# Dipanggil on_commit *setelah* bump versi katalog (lihat signals.py / bulk.py),
+# satu hook per satu bump.
+
+def _advance(index):
+    """
+    Catat versi katalog kalau bump terakhir memang bump milik perubahan lokal ini
+    (versi = versi index + 1). Kalau ada bump lain di antaranya (proses lain,
+    mis. importer) perubahannya belum ada di index -> versi dibiarkan basi
+    supaya ``get_index`` menjadwalkan rebuild.
+    """
+    version = get_catalog_version()
+    if version == index.version + 1:
+        index.version = version
+
+
+def index_products(products):
+    index = _index
+    if index is None:
+        return  # belum pernah dibangun; nanti dibangun lengkap saat query pertama
+    for p in products:
+        index.add(p.pk, p.product_name)
+    _advance(index)
+
+
+def unindex_products(pks):
+    index = _index
+    if index is None:
+        return
+    for pk in pks:
+        index.remove(pk)
+    _advance(index)
+
+
+def reset():
+    global _index, _rebuilding
+    _index = None
+    _rebuilding = False
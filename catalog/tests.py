@@ -1,8 +1,35 @@
+import csv
+import gzip
+import io
+import json
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from io import StringIO
+from pathlib import Path
 from django.test import TestCase, Client, override_settings, RequestFactory
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse, NoReverseMatch
+from django.contrib.admin import helpers
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.db.models import F
 from unittest.mock import patch, MagicMock
+from PIL import Image
+from catalog import cards, search, suggest, thumbnails, wishlist
 from catalog import views as catalog_views
+from catalog.api import serialize_product
+from catalog.cards import render_cards
+from catalog.models import CatalogVersion, Product, ProductNeighbor, similar_products
+from catalog.pagination import MAX_LIMIT
+from catalog.search import FTS_TABLE, KEY_TABLE, search_products
+from catalog.suggest import SuggestIndex
+from catalog.versioning import bump_catalog_version, get_catalog_version
+from catalog.wishlist import WishlistIds
 
 # suite ini fokus ke akses admin modal + guard HTTP method
 User = get_user_model()
@@ -32,6 +59,19 @@ def url_or(path_name, *args, **kwargs):
         raise
 
 
+class CatalogTestCase(TestCase):
+    """Cache (LocMemCache) hidup lintas test: setiap test mulai dari cache kosong."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def make_tmpdir(self) -> Path:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        return Path(tmp.name)
+
+
 @override_settings(LOGIN_URL="/user/login/")
 class CatalogAdminModalTests(TestCase):
     def setUp(self):
@@ -88,8 +128,9 @@ class CatalogListDetailTests(TestCase):
         self.assertEqual(resp.status_code, 200)
         self.assertIn("products", resp.context)
 
+    @patch("catalog.views.similar_products", return_value=[])
     @patch("catalog.views.get_object_or_404")
-    def test_product_detail_ok(self, get_object):
+    def test_product_detail_ok(self, get_object, _similar):
         obj = MagicMock()
         get_object.return_value = obj
         resp = self.client.get(url_or("catalog:detail", UID))
@@ -180,3 +221,926 @@ class CatalogCreateTests(TestCase):
         resp = self.client.post(url_or("catalog:product_create"), {"product_name": ""})
         self.assertEqual(resp.status_code, 200)
         self.assertIn("form", resp.context)
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        self.mat = Product.objects.create(
+            product_name="Align Yoga Mat", description="Natural rubber, 5mm", price=900000,
+        )
+        self.bottle = Product.objects.create(
+            product_name="FreeSip Bottle", description="Cocok buat yoga dan gym", price=450000,
+        )
+        self.tumbler = Product.objects.create(
+            product_name="Quencher Tumbler", description="Stainless steel", price=750000,
+        )
+
+    def _names(self, qs):
+        return [p.product_name for p in qs]
+
+    def test_matches_name_and_description_ranked_by_relevance(self):
+        qs = search_products(Product.objects.all(), "yoga")
+        # match di nama produk harus di atas match di deskripsi
+        self.assertEqual(self._names(qs), ["Align Yoga Mat", "FreeSip Bottle"])
+
+    def test_prefix_and_multi_term(self):
+        self.assertEqual(self._names(search_products(Product.objects.all(), "tumb")), ["Quencher Tumbler"])
+        self.assertEqual(self._names(search_products(Product.objects.all(), "yoga rubber")), ["Align Yoga Mat"])
+
+    def test_operator_characters_are_ignored(self):
+        qs = search_products(Product.objects.all(), 'yoga"* (mat')
+        self.assertIn("Align Yoga Mat", self._names(qs))
+        self.assertEqual(search_products(Product.objects.all(), "  ").count(), 3)
+
+    def test_index_follows_save_and_delete(self):
+        self.tumbler.product_name = "Quencher Flowstate"
+        self.tumbler.save()
+        self.assertEqual(search_products(Product.objects.all(), "tumbler").count(), 0)
+        self.assertEqual(search_products(Product.objects.all(), "flowstate").count(), 1)
+        self.tumbler.delete()
+        self.assertEqual(search_products(Product.objects.all(), "flowstate").count(), 0)
+
+    def test_query_without_terms_lists_everything_by_relevance(self):
+        for q in ("!!", "-"):
+            resp = self.client.get(reverse("catalog:api_products"), {"q": q})
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(resp.json()["count"], 3)
+            self.assertEqual(self.client.get(reverse("main:show_main"), {"q": q}).status_code, 200)
+
+    def test_save_without_search_field_changes_skips_reindex(self):
+        tumbler = Product.objects.get(pk=self.tumbler.pk)
+        with patch.object(search, "index_products", wraps=search.index_products) as index:
+            tumbler.price, tumbler.stock = 1, 0
+            tumbler.save()
+            index.assert_called_once_with([])
+            tumbler.description = "Double wall"
+            tumbler.save()
+            index.assert_called_with([tumbler])
+            tumbler.save()  # snapshot diperbarui setelah save
+            index.assert_called_with([])
+        self.assertEqual(search.search_products(Product.objects.all(), "double").count(), 1)
+
+    def test_match_runs_once_and_index_rows_are_keyed_by_rowid(self):
+        sql = str(search_products(Product.objects.all(), "yoga").query)
+        self.assertEqual(sql.count("MATCH"), 1)
+        self.tumbler.delete()
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {KEY_TABLE}")
+            self.assertEqual(cursor.fetchone()[0], 2)
+            cursor.execute(f"SELECT COUNT(*) FROM {FTS_TABLE}")
+            self.assertEqual(cursor.fetchone()[0], 2)
+
+    def test_api_products_uses_search(self):
+        resp = self.client.get(reverse("catalog:api_products"), {"q": "yoga"})
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        self.assertEqual(data["count"], 2)
+        self.assertEqual(data["results"][0]["name"], "Align Yoga Mat")
+
+
+class ApiProductsPaginationTests(TestCase):
+    def setUp(self):
+        for i in range(7):
+            Product.objects.create(product_name=f"Mat {i}", description="mat", price=1000 * (i % 3))
+
+    def _walk(self, params):
+        url = reverse("catalog:api_products")
+        seen, cursor, pages = [], None, 0
+        while True:
+            query = dict(params)
+            if cursor:
+                query["cursor"] = cursor
+            data = self.client.get(url, query).json()
+            seen.extend(data["results"])
+            pages += 1
+            cursor = data["next_cursor"]
+            if not cursor:
+                return seen, pages
+
+    def test_cursor_walk_by_id_covers_everything_once(self):
+        seen, pages = self._walk({"limit": 3})
+        self.assertEqual(pages, 3)
+        ids = [r["id"] for r in seen]
+        self.assertEqual(len(set(ids)), 7)
+        self.assertEqual(ids, sorted(ids, reverse=True))
+
+    def test_cursor_walk_by_price_is_stable_with_ties(self):
+        seen, _ = self._walk({"limit": 2, "sort": "price", "count": "0"})
+        self.assertEqual(len({r["id"] for r in seen}), 7)
+        self.assertEqual([r["price"] for r in seen], sorted(r["price"] for r in seen))
+
+    def test_limit_is_capped_and_count_optional(self):
+        data = self.client.get(reverse("catalog:api_products"), {"limit": 10_000}).json()
+        self.assertEqual(data["count"], 7)
+        self.assertLessEqual(len(data["results"]), MAX_LIMIT)
+        data = self.client.get(reverse("catalog:api_products"), {"count": "0"}).json()
+        self.assertNotIn("count", data)
+
+    def test_invalid_cursor_or_sort_is_400(self):
+        url = reverse("catalog:api_products")
+        self.assertEqual(self.client.get(url, {"cursor": "nope"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"sort": "stock"}).status_code, 400)
+        other = self.client.get(url, {"limit": 2}).json()["next_cursor"]
+        # cursor dari urutan -id tidak boleh dipakai di urutan price
+        self.assertEqual(self.client.get(url, {"cursor": other, "sort": "price"}).status_code, 400)
+
+    def test_legacy_offset_still_served(self):
+        data = self.client.get(reverse("catalog:api_products"), {"limit": 5, "offset": 5}).json()
+        self.assertEqual(len(data["results"]), 2)
+        self.assertEqual(data["count"], 7)
+
+    def test_cursor_walk_over_search_results_by_relevance(self):
+        seen, pages = self._walk({"limit": 3, "q": "mat"})
+        self.assertEqual(pages, 3)
+        self.assertEqual(len({r["id"] for r in seen}), 7)
+
+
+class ProductThumbnailColumnsTests(TestCase):
+    def test_save_persists_normalized_and_proxied_urls(self):
+        p = Product.objects.create(
+            product_name="Tumbler", description="x", price=1, thumbnail="  //cdn.example.com/a.png ",
+        )
+        row = Product.objects.values("thumbnail_normalized", "thumbnail_proxied").get(pk=p.pk)
+        self.assertEqual(row["thumbnail_normalized"], "https://cdn.example.com/a.png")
+        self.assertTrue(row["thumbnail_proxied"].startswith("/catalog/thumbs/"))
+        self.assertEqual(p.normalized_thumbnail, row["thumbnail_normalized"])
+        self.assertEqual(p.proxied_thumbnail, row["thumbnail_proxied"])
+
+    def test_update_fields_thumbnail_also_writes_derived_columns(self):
+        p = Product.objects.create(product_name="Mat", description="x", price=1)
+        self.assertEqual(p.thumbnail_normalized, "")
+        p.thumbnail = "www.example.com/b.png"
+        p.save(update_fields=["thumbnail"])
+        p.refresh_from_db()
+        self.assertEqual(p.thumbnail_normalized, "https://www.example.com/b.png")
+        self.assertTrue(p.thumbnail_proxied)
+
+    def test_serialize_product_reads_stored_columns(self):
+        p = Product.objects.create(product_name="Mat", description="x", price=1, thumbnail="https://e.com/c.png")
+        p = Product.objects.get(pk=p.pk)
+        with patch("catalog.models.normalize_thumbnail_url") as norm, patch("catalog.models.proxy_thumbnail_url") as prox:
+            data = serialize_product(p, wishlist_ids=set())
+        norm.assert_not_called()
+        prox.assert_not_called()
+        self.assertEqual(data["thumbnail"], "https://e.com/c.png")
+
+
+class LocalThumbnailPipelineTests(CatalogTestCase):
+    """Sumber gambar dilayani server HTTP lokal, jadi tidak ada request keluar."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        buf = io.BytesIO()
+        Image.new("RGB", (800, 400), (200, 120, 40)).save(buf, "PNG")
+        png = buf.getvalue()
+        cls.hits = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                cls.hits.append(self.path)
+                if self.path != "/img.png":
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "image/png")
+                self.send_header("Content-Length", str(len(png)))
+                self.end_headers()
+                self.wfile.write(png)
+
+            def log_message(self, *args):
+                pass
+
+        cls.server = HTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = self.make_tmpdir()
+        override = override_settings(THUMBNAIL_ROOT=str(self.tmp))
+        override.enable()
+        self.addCleanup(override.disable)
+        self.hits.clear()
+
+    def _product(self, path="/img.png"):
+        return Product.objects.create(product_name="Mat", description="x", price=1, thumbnail=self.base + path)
+
+    def test_fetches_once_resizes_and_serves_with_long_cache(self):
+        p = self._product()
+        url = p.proxied_thumbnail
+        self.assertTrue(url.startswith("/catalog/thumbs/") and url.endswith("/card.webp"))
+
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["Content-Type"], "image/webp")
+        self.assertIn("immutable", resp["Cache-Control"])
+        img = Image.open(io.BytesIO(b"".join(resp.streaming_content)))
+        self.assertEqual(img.size, (624, 468))
+
+        detail = self.client.get(p.detail_thumbnail)
+        self.assertEqual(detail.status_code, 200)
+        self.assertEqual(Image.open(io.BytesIO(b"".join(detail.streaming_content))).size, (1280, 960))
+        self.client.get(url)
+        self.assertEqual(self.hits, ["/img.png"])
+
+        not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=resp["ETag"])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_identical_sources_share_one_stored_object(self):
+        a = self._product()
+        b = self._product("/img.png?v=2")
+        self.client.get(a.proxied_thumbnail)
+        self.client.get(b.proxied_thumbnail)
+        objects = [f for f in (self.tmp / "objects").rglob("*.webp")]
+        self.assertEqual(len(objects), 2)  # card + detail, dipakai bersama
+
+    def test_unknown_key_or_broken_source_is_404(self):
+        self.assertEqual(self.client.get("/catalog/thumbs/" + "0" * 32 + "/card.webp").status_code, 404)
+        self.assertEqual(self.client.get("/catalog/thumbs/nothex/card.webp").status_code, 404)
+        broken = self._product("/missing.png")
+        self.assertEqual(self.client.get(broken.proxied_thumbnail).status_code, 404)
+        # kegagalan di-cache: tidak fetch ulang
+        self.client.get(broken.proxied_thumbnail)
+        self.assertEqual(self.hits, ["/missing.png"])
+
+    @override_settings(THUMBNAIL_FETCHER="catalog.tests.bomb_fetch")
+    def test_undecodable_source_is_negative_cached(self):
+        p = self._product("/bomb.png")
+        with patch.object(Image, "MAX_IMAGE_PIXELS", 10), \
+                patch("catalog.tests.bomb_fetch", wraps=bomb_fetch) as fetch:
+            self.assertEqual(self.client.get(p.proxied_thumbnail).status_code, 404)
+            self.assertEqual(self.client.get(p.proxied_thumbnail).status_code, 404)
+        self.assertEqual(fetch.call_count, 1)
+
+    @override_settings(THUMBNAIL_FETCHER="catalog.tests.fake_fetch")
+    def test_only_one_request_fetches_a_key(self):
+        p = self._product("/anything.png")
+        key = thumbnails.source_key(p.thumbnail_normalized)
+        cache.add(f"thumbs:lock:{key}", True)  # request lain sedang fetch
+        with patch.object(thumbnails, "LOCK_WAIT", 0.2), \
+                patch("catalog.tests.fake_fetch", wraps=fake_fetch) as fetch:
+            resp = self.client.get(p.proxied_thumbnail)
+            self.assertEqual(resp.status_code, 503)
+            self.assertEqual(fetch.call_count, 0)
+            cache.delete(f"thumbs:lock:{key}")
+            self.assertEqual(self.client.get(p.proxied_thumbnail).status_code, 200)
+        self.assertEqual(fetch.call_count, 1)
+
+    @override_settings(THUMBNAIL_FETCHER="catalog.tests.fake_fetch")
+    def test_fetcher_is_pluggable(self):
+        p = self._product("/anything.png")
+        self.assertEqual(self.client.get(p.proxied_thumbnail).status_code, 200)
+        self.assertEqual(self.hits, [])
+
+
+def fake_fetch(url):
+    buf = io.BytesIO()
+    Image.new("RGB", (10, 10)).save(buf, "PNG")
+    return buf.getvalue()
+
+
+class WishlistCacheTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="fan", password="pass")
+        self.a = Product.objects.create(product_name="A", description="x", price=1)
+        self.b = Product.objects.create(product_name="B", description="x", price=2)
+        self.client.force_login(self.user)
+
+    def _flags(self):
+        data = self.client.get(reverse("catalog:api_products"), {"count": "0"}).json()
+        return {r["name"]: r["is_wishlisted"] for r in data["results"]}
+
+    def test_listing_hits_db_for_wishlist_only_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.wishlist.add(self.a)
+        self.assertEqual(self._flags(), {"A": True, "B": False})
+        with CaptureQueriesContext(connection) as ctx:
+            self._flags()
+        self.assertFalse(any("user_user_wishlist" in q["sql"] for q in ctx.captured_queries))
+
+    def test_toggle_and_m2m_writes_keep_cache_in_sync(self):
+        self.assertEqual(self._flags(), {"A": False, "B": False})
+        url = reverse("catalog:api_toggle_wishlist", args=[self.a.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(self.client.post(url).json()["wishlisted"])
+        self.assertEqual(self._flags(), {"A": True, "B": False})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.wishlist.add(self.b)
+        self.assertEqual(self._flags(), {"A": True, "B": True})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.b.wishlisted_by.remove(self.user)  # sisi reverse
+        self.assertEqual(self._flags(), {"A": True, "B": False})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertFalse(self.client.post(url).json()["wishlisted"])
+        self.assertEqual(self._flags(), {"A": False, "B": False})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.wishlist.add(self.a, self.b)
+            self.user.wishlist.clear()
+        self.assertEqual(self._flags(), {"A": False, "B": False})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.wishlist.add(self.a)
+        self.assertEqual(self._flags(), {"A": True, "B": False})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.a.wishlisted_by.clear()
+        self.assertEqual(self._flags(), {"A": False, "B": False})
+
+    def test_toggle_decides_from_db_even_if_cache_is_stale(self):
+        # cache worker lain basi: bilang A sudah di-wishlist padahal di DB belum
+        cache.set(wishlist._key(self.user.pk, wishlist._version(self.user.pk)), wishlist._pack([self.a.pk]))
+        url = reverse("catalog:api_toggle_wishlist", args=[self.a.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(self.client.post(url).json()["wishlisted"])
+        self.assertTrue(self.user.wishlist.filter(pk=self.a.pk).exists())
+        self.assertEqual(self._flags(), {"A": True, "B": False})
+
+    def test_write_in_another_worker_is_seen_through_db_version(self):
+        self.assertEqual(self._flags(), {"A": False, "B": False})
+        # worker lain: tulis wishlist (tanpa signal di proses ini) + naikkan versi di DB;
+        # blob lama masih ada di cache lokal proses ini
+        self.user.wishlist.through.objects.create(user=self.user, product=self.a)
+        wishlist.invalidate([self.user.pk])
+        self.assertEqual(self._flags(), {"A": True, "B": False})
+
+    def test_rolled_back_write_does_not_touch_cache(self):
+        self.assertEqual(self._flags(), {"A": False, "B": False})
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.user.wishlist.add(self.a)
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(self._flags(), {"A": False, "B": False})
+
+    def test_wishlist_ids_membership_accepts_uuid_and_str(self):
+        ids = WishlistIds.from_pks([self.a.pk])
+        self.assertIn(self.a.pk, ids)
+        self.assertIn(str(self.a.pk), ids)
+        self.assertNotIn(self.b.pk, ids)
+        self.assertNotIn("not-a-uuid", ids)
+        self.assertEqual(len(ids), 1)
+
+
+class CatalogResponseCacheTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.p = Product.objects.create(product_name="Mat", description="x", price=10)
+        self.url = reverse("catalog:api_products")
+
+    def test_if_none_match_returns_304_without_queries(self):
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["Cache-Control"], "no-cache")
+        etag = resp["ETag"]
+        with CaptureQueriesContext(connection) as ctx:
+            again = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again["ETag"], etag)
+        self.assertEqual(len(ctx.captured_queries), 1)  # hanya baca versi katalog
+        self.assertIn("catalog_catalogversion", ctx.captured_queries[0]["sql"])
+
+    def test_repeat_request_served_from_cache(self):
+        first = self.client.get(self.url)
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get(self.url)
+        self.assertEqual(len(ctx.captured_queries), 1)  # hanya baca versi katalog
+        self.assertEqual(first.content, second.content)
+
+    def test_version_is_shared_across_processes(self):
+        etag = self.client.get(self.url)["ETag"]
+        # write dari worker lain: cache lokal proses ini tidak tahu apa-apa
+        CatalogVersion.objects.filter(pk=1).update(value=F("value") + 1)
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp["ETag"], etag)
+
+    def test_product_write_changes_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.p.price = 25
+            self.p.save()
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp["ETag"], etag)
+        self.assertEqual(resp.json()["results"][0]["price"], 25)
+
+    def test_wishlist_change_changes_per_user_etag(self):
+        user = User.objects.create_user(username="fan", password="pass")
+        self.client.force_login(user)
+        resp = self.client.get(self.url)
+        self.assertIn("Cookie", resp["Vary"])
+        etag = resp["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            user.wishlist.add(self.p)
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.json()["results"][0]["is_wishlisted"])
+
+
+class ApiProductsBulkTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username="boss", password="pass", is_staff=True)
+        self.client.force_login(self.admin)
+        self.url = reverse("catalog:api_products_bulk")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mat = Product.objects.create(
+                product_name="Yoga Mat", description="grippy", price=100, external_id="SKU-MAT",
+            )
+
+    def _post(self, operations):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(self.url, data=json.dumps({"operations": operations}),
+                                    content_type="application/json")
+
+    def test_upsert_and_delete_with_per_item_results(self):
+        spare = Product.objects.create(product_name="Spare", description="x", price=1)
+        resp = self._post([
+            {"external_id": "SKU-BALL", "name": "Pilates Ball", "price": 50,
+             "thumbnail": "www.example.com/ball.jpg"},
+            {"external_id": "SKU-MAT", "price": 120, "stock": 0, "in_stock": False},
+            {"op": "delete", "id": str(spare.pk)},
+            {"id": "not-a-uuid"},
+            {"op": "delete", "external_id": "SKU-MISSING"},
+            {"external_id": "SKU-MAT", "price": 1},
+        ])
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        self.assertEqual(data["summary"], {"created": 1, "updated": 1, "deleted": 1, "error": 3})
+        self.assertEqual([r["status"] for r in data["results"]],
+                         ["created", "updated", "deleted", "error", "error", "error"])
+
+        ball = Product.objects.get(external_id="SKU-BALL")
+        self.assertEqual(data["results"][0]["id"], str(ball.pk))
+        self.assertEqual(ball.thumbnail_normalized, "https://www.example.com/ball.jpg")
+        self.assertTrue(ball.thumbnail_proxied.startswith("/catalog/thumbs/"))
+        self.mat.refresh_from_db()
+        self.assertEqual((self.mat.price, self.mat.stock, self.mat.inStock), (120, 0, False))
+        self.assertFalse(Product.objects.filter(pk=spare.pk).exists())
+
+    def test_bulk_writes_update_search_and_cached_listing(self):
+        listing = reverse("catalog:api_products")
+        etag = self.client.get(listing, {"q": "reformer"})["ETag"]
+        self._post([
+            {"external_id": "SKU-REF", "name": "Reformer Strap", "price": 10},
+            {"id": str(self.mat.pk), "name": "Reformer Mat"},
+        ])
+        resp = self.client.get(listing, {"q": "reformer"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        names = sorted(r["name"] for r in resp.json()["results"])
+        self.assertEqual(names, ["Reformer Mat", "Reformer Strap"])
+
+    def test_invalid_values_are_reported_per_item(self):
+        resp = self._post([
+            {"external_id": "SKU-NEG", "name": "Bad", "price": -5},
+            {"external_id": "SKU-OK", "name": "Good", "price": 5},
+        ])
+        results = resp.json()["results"]
+        self.assertEqual(results[0]["status"], "error")
+        self.assertIn("price", results[0]["error"])
+        self.assertEqual(results[1]["status"], "created")
+
+    def test_database_error_rolls_back_whole_chunk(self):
+        Product.objects.create(product_name="Taken", description="x", price=1, external_id="SKU-TAKEN")
+        resp = self._post([
+            {"external_id": "SKU-NEW2", "name": "New", "price": 5},
+            {"id": str(self.mat.pk), "external_id": "SKU-TAKEN"},
+        ])
+        self.assertEqual([r["status"] for r in resp.json()["results"]], ["error", "error"])
+        self.assertFalse(Product.objects.filter(external_id="SKU-NEW2").exists())
+
+    def test_requires_staff_and_list_body(self):
+        self.assertEqual(self.client.post(self.url, data="{}", content_type="application/json").status_code, 400)
+        self.client.logout()
+        self.client.force_login(User.objects.create_user(username="joe", password="pass"))
+        resp = self.client.post(self.url, data="[]", content_type="application/json")
+        self.assertEqual(resp.status_code, 302)
+
+
+class ApiProductsFieldsTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(3):
+            Product.objects.create(
+                product_name=f"Band {i}", description="long text " * 50, price=10 + i,
+                thumbnail=f"https://img.example.com/{i}.jpg",
+            )
+        self.url = reverse("catalog:api_products")
+
+    def test_card_preset_trims_payload(self):
+        data = self.client.get(self.url, {"fields": "card", "count": "0"}).json()
+        self.assertEqual(
+            set(data["results"][0]),
+            {"id", "name", "price", "stock", "thumbnail_proxy"},
+        )
+        self.assertTrue(data["results"][0]["thumbnail_proxy"].startswith("http://testserver/catalog/thumbs/"))
+
+    def test_default_returns_all_fields(self):
+        data = self.client.get(self.url, {"count": "0"}).json()
+        self.assertIn("description", data["results"][0])
+        self.assertIn("is_wishlisted", data["results"][0])
+
+    def test_fields_defer_unused_columns_and_keep_cursor(self):
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get(self.url, {"fields": "id,name", "sort": "price", "limit": 2, "count": "0"}).json()
+        self.assertEqual([set(r) for r in data["results"]], [{"id", "name"}] * 2)
+        product_queries = [q["sql"] for q in ctx.captured_queries if "catalog_product" in q["sql"]]
+        self.assertEqual(len(product_queries), 1)  # tidak ada query tambahan per baris (deferred load)
+        self.assertNotIn('"description"', product_queries[0])
+
+        nxt = self.client.get(self.url, {"fields": "id,name", "sort": "price", "limit": 2,
+                                         "cursor": data["next_cursor"], "count": "0"}).json()
+        self.assertEqual([r["name"] for r in nxt["results"]], ["Band 2"])
+
+    def test_unknown_field_rejected(self):
+        self.assertEqual(self.client.get(self.url, {"fields": "id,secret"}).status_code, 400)
+
+
+class ApiProductsExportTests(TestCase):
+    def setUp(self):
+        for i in range(5):
+            Product.objects.create(product_name=f"Ring {i}", description="x", price=i + 1, external_id=f"R{i}")
+        self.url = reverse("catalog:api_products_export")
+        self.client.force_login(User.objects.create_user(username="boss", password="pass", is_staff=True))
+
+    def _lines(self, resp):
+        body = b"".join(resp.streaming_content)
+        if resp.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        return [json.loads(line) for line in body.decode().splitlines()]
+
+    def test_streams_one_product_per_line(self):
+        with patch("catalog.api.EXPORT_CHUNK_SIZE", 2):
+            resp = self.client.get(self.url)
+            self.assertTrue(resp.streaming)
+            self.assertEqual(resp["Content-Type"], "application/x-ndjson")
+            rows = self._lines(resp)
+        self.assertEqual(sorted(r["external_id"] for r in rows), [f"R{i}" for i in range(5)])
+        self.assertNotIn("is_wishlisted", rows[0])
+
+    def test_gzip_and_fields(self):
+        resp = self.client.get(self.url, {"fields": "id,price"}, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(resp["Content-Encoding"], "gzip")
+        rows = self._lines(resp)
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(set(rows[0]), {"id", "price"})
+
+    def test_staff_only(self):
+        self.client.force_login(User.objects.create_user(username="joe", password="pass"))
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+
+class AdminCsvExportTests(TestCase):
+    def setUp(self):
+        for i in range(3):
+            Product.objects.create(product_name=f"Block {i}", description="foam, soft", price=i + 1)
+        self.client.force_login(User.objects.create_superuser(username="root", password="pass"))
+        self.url = reverse("admin:catalog_product_changelist")
+
+    def _action(self, **extra):
+        data = {"action": "export_as_csv", "index": 0,
+                helpers.ACTION_CHECKBOX_NAME: [str(pk) for pk in Product.objects.values_list("pk", flat=True)]}
+        data.update(extra)
+        return self.client.post(self.url, data)
+
+    def test_action_shows_column_picker_first(self):
+        resp = self._action()
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, 'name="columns" value="external_id"')
+        self.assertContains(resp, 'name="csv_export"')
+
+    def test_streams_selected_columns(self):
+        resp = self._action(csv_export="1", columns=["product_name", "price"])
+        self.assertTrue(resp.streaming)
+        rows = list(csv.reader(io.StringIO(b"".join(resp.streaming_content).decode())))
+        self.assertEqual(rows[0], ["product_name", "price"])
+        self.assertEqual(sorted(rows[1:]), [["Block 0", "1"], ["Block 1", "2"], ["Block 2", "3"]])
+
+    def test_default_columns_when_none_chosen(self):
+        resp = self._action(csv_export="1")
+        header = b"".join(resp.streaming_content).decode().splitlines()[0]
+        self.assertEqual(header, "id,product_name,price,stock,inStock,thumbnail,description")
+
+
+class ImportPilatesCsvTests(CatalogTestCase):
+    HEADER = "id,brand,product_name,category,variant,key_specs,source_url,image_url,marketplace,price\n"
+
+    def setUp(self):
+        super().setUp()
+        self.csv = self.make_tmpdir() / "feed.csv"
+
+    def _write(self, rows):
+        self.csv.write_text(self.HEADER + "".join(rows), encoding="utf-8")
+
+    def _run(self, *args):
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("import_pilates_csv", str(self.csv), *args, stdout=out)
+        return out.getvalue()
+
+    def test_chunked_import_creates_then_updates(self):
+        rows = [f"{i},Brand,Ring {i},Ring,,specs,,www.img.example.com/{i}.jpg,,Rp{i}0.000\n" for i in range(1, 8)]
+        rows.append("8,Brand,,Ring,,specs,,,,100\n")  # tanpa nama -> skip
+        self._write(rows)
+
+        out = self._run("--chunk-size", "3")
+        self.assertIn("created=7, updated=0, unchanged=0, deleted=0, skipped=1", out)
+        self.assertIn("baris/detik", out)
+        ring = Product.objects.get(external_id="3")
+        self.assertEqual(ring.price, 30000)
+        self.assertEqual(ring.thumbnail_normalized, "https://www.img.example.com/3.jpg")
+        self.assertEqual(search_products(Product.objects.all(), "ring").count(), 7)
+        self.assertFalse(self.csv.with_name("feed.csv.progress").exists())
+
+        self._write(["3,Brand,Ring Three,Ring,,specs,,,,Rp1\n"])
+        self.assertIn("created=0, updated=1", self._run())
+        ring.refresh_from_db()
+        self.assertEqual((ring.product_name, ring.price), ("Ring Three", 1))
+        self.assertEqual(Product.objects.count(), 7)
+
+    def test_unchanged_rows_are_not_rewritten(self):
+        rows = ["1,B,Band,C,,s,,,,5\n", "2,B,Ball,C,,s,,,,7\n"]
+        self._write(rows)
+        self._run()
+        version = get_catalog_version()
+        with patch("catalog.models.Product.objects.bulk_update") as bulk_update:
+            out = self._run()
+        self.assertIn("created=0, updated=0, unchanged=2", out)
+        bulk_update.assert_not_called()
+        self.assertEqual(get_catalog_version(), version)
+
+        self._write([rows[0], "2,B,Ball,C,,s,,,,8\n"])  # harga berubah
+        self.assertIn("updated=1, unchanged=1", self._run())
+        self.assertEqual(Product.objects.get(external_id="2").price, 8)
+
+    def test_rows_without_id_match_by_name_on_rerun(self):
+        self._write([",B,Band,C,,s,,,,5\n", ",B,Ball,C,,s,,,,7\n"])
+        self.assertIn("created=2", self._run())
+        self.assertIn("created=0, updated=0, unchanged=2", self._run())
+
+        self._write([",B,Band,C,,s,,,,6\n"])
+        self.assertIn("created=0, updated=1", self._run())
+        self.assertEqual(Product.objects.count(), 2)
+        self.assertEqual(Product.objects.get(product_name="Band").price, 6)
+
+    def test_delete_missing(self):
+        self._write(["1,B,Band,C,,s,,,,5\n", "2,B,Ball,C,,s,,,,7\n"])
+        self._run()
+        manual = Product.objects.create(product_name="Manual", description="x", price=1)
+        self._write(["2,B,Ball,C,,s,,,,7\n"])
+        out = self._run("--delete-missing")
+        self.assertIn("unchanged=1, deleted=1", out)
+        self.assertEqual(set(Product.objects.values_list("external_id", flat=True)), {"2", None})
+        self.assertTrue(Product.objects.filter(pk=manual.pk).exists())
+
+    def test_resume_skips_committed_rows(self):
+        self._write([f"{i},B,Band {i},C,,s,,,,{i}\n" for i in range(1, 6)])
+        self.csv.with_name("feed.csv.progress").write_text("3")
+        out = self._run("--resume")
+        self.assertIn("created=2", out)
+        self.assertEqual(sorted(Product.objects.values_list("external_id", flat=True)), ["4", "5"])
+
+    def test_dry_run_rolls_back(self):
+        self._write(["1,B,Band,C,,s,,,,5\n"])
+        out = self._run("--dry-run", "--chunk-size", "1")
+        self.assertIn("Preview selesai. created=1", out)
+        self.assertFalse(Product.objects.exists())
+
+
+class ImportMultipleFeedsTests(CatalogTestCase):
+    HEADER = ImportPilatesCsvTests.HEADER
+
+    def setUp(self):
+        super().setUp()
+        self.dir = self.make_tmpdir()
+        (self.dir / "stanley.csv").write_text(self.HEADER + "1,Stanley,Quencher,Tumbler,,s,,,,750000\n", encoding="utf-8")
+        (self.dir / "owala.csv").write_text(
+            self.HEADER + "1,Owala,FreeSip,Bottle,,s,,,,450000\n2,Owala,,Bottle,,s,,,,1\n", encoding="utf-8")
+
+    def _run(self, *args):
+        out, err = StringIO(), StringIO()
+        call_command("import_pilates_csv", *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_directory_with_process_pool_and_namespaced_ids(self):
+        out, err = self._run(str(self.dir), "--workers", "2", "--namespace-ids")
+        self.assertIn("stanley.csv: created=1", out)
+        self.assertIn("owala.csv: created=1", out)
+        self.assertIn("Import selesai. created=2, updated=0, unchanged=0, deleted=0, skipped=1", out)
+        self.assertEqual(set(Product.objects.values_list("external_id", flat=True)), {"stanley:1", "owala:1"})
+        self.assertEqual(err, "")
+
+    def test_workers_apply_files_in_input_order(self):
+        (self.dir / "owala.csv").unlink()
+        # id sama tanpa --namespace-ids: file yang urutannya terakhir (stanley.csv) menang
+        (self.dir / "a.csv").write_text(self.HEADER + "1,Stanley,Old Name,Tumbler,,s,,,,1\n", encoding="utf-8")
+        out, err = self._run(str(self.dir), "--workers", "2")
+        self.assertEqual(err, "")
+        self.assertLess(out.index("a.csv"), out.index("stanley.csv"))
+        self.assertEqual(Product.objects.get(external_id="1").product_name, "Quencher")
+
+    def test_bad_file_is_reported_without_aborting(self):
+        (self.dir / "broken.csv").write_bytes(self.HEADER.encode() + b"1,X,\xff\xfe,C,,s,,,,1\n")
+        out, err = self._run(str(self.dir / "*.csv"), "--workers", "1", "--namespace-ids", "--delete-missing")
+        self.assertIn("GAGAL", err)
+        self.assertIn("broken.csv", err)
+        self.assertIn("--delete-missing dilewati", err)
+        self.assertEqual(Product.objects.count(), 2)
+
+    def test_resume_rejected_for_multiple_files(self):
+        with self.assertRaises(CommandError):
+            self._run(str(self.dir), "--resume")
+
+
+class SuggestTests(TestCase):
+    def setUp(self):
+        suggest.reset()
+        self.addCleanup(suggest.reset)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.quencher = Product.objects.create(product_name="The Quencher H.2 Flowstate", description="x", price=1)
+            Product.objects.create(product_name="The Quencher H.2 Flowstate", description="x", price=2)
+            Product.objects.create(product_name="Quick Dry Tee", description="x", price=3)
+            Product.objects.create(product_name="FreeSip Bottle", description="x", price=4)
+        self.url = reverse("catalog:api_suggest")
+
+    def _names(self, q, **params):
+        return [r["name"] for r in self.client.get(self.url, {"q": q, **params}).json()["results"]]
+
+    def test_prefix_match_without_db_after_warmup(self):
+        self._names("qu")  # build index
+        with CaptureQueriesContext(connection) as ctx:
+            names = self._names("qu")
+        self.assertEqual(len(ctx.captured_queries), 0)
+        # nama pendek duluan, varian dengan nama sama cukup sekali
+        self.assertEqual(names, ["Quick Dry Tee", "The Quencher H.2 Flowstate"])
+        self.assertEqual(self._names("quen flow"), ["The Quencher H.2 Flowstate"])
+        self.assertEqual(self._names("zzz"), [])
+        self.assertEqual(self._names(""), [])
+
+    def test_index_follows_save_and_delete(self):
+        self.assertEqual(self._names("free"), ["FreeSip Bottle"])
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(product_name="Free Band", description="x", price=5)
+            self.quencher.product_name = "Freestyle Tumbler"
+            self.quencher.save()
+        self.assertEqual(self._names("free"), ["Free Band", "FreeSip Bottle", "Freestyle Tumbler"])
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(product_name="Free Band").delete()
+        self.assertEqual(self._names("free", limit=1), ["FreeSip Bottle"])
+
+    def test_local_writes_keep_index_version_and_drift_rebuilds_in_background(self):
+        self._names("free")
+        index = suggest.get_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(product_name="Free Band", description="x", price=5)
+        self.assertEqual(index.version, get_catalog_version())
+
+        # write dari worker lain: versi beda, tapi request tidak membangun ulang dari DB
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_catalog_version()
+        index.built_at -= suggest.REBUILD_INTERVAL + 1
+        with patch.object(suggest, "_start_rebuild") as start:
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertIs(suggest.get_index(), index)
+            start.assert_called_once_with(index)
+            self.assertIs(suggest.get_index(), index)
+            start.assert_called_once()  # rebuild yang sedang jalan tidak dijadwalkan ulang
+        self.assertFalse(any("catalog_product" in q["sql"] for q in ctx.captured_queries))
+
+    def test_local_write_does_not_adopt_bump_from_another_process(self):
+        self._names("free")
+        index = suggest.get_index()
+        # importer di proses lain menulis produk + bump versi; index proses ini tidak tahu
+        CatalogVersion.objects.filter(pk=1).update(value=F("value") + 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(product_name="Free Band", description="x", price=5)
+        self.assertEqual(index.version, get_catalog_version() - 2)
+
+        index.built_at -= suggest.REBUILD_INTERVAL + 1
+        with patch.object(suggest, "_start_rebuild") as start:
+            suggest.get_index()
+        start.assert_called_once_with(index)
+
+    def test_trie_top_cache_recomputed_after_remove(self):
+        index = SuggestIndex()
+        for i in range(60):
+            index.add(i, f"Mat {i:02d}")
+        self.assertEqual(index.suggest("mat", 2), [{"id": "0", "name": "Mat 00"}, {"id": "1", "name": "Mat 01"}])
+        index.remove(0)
+        index.remove(1)
+        self.assertEqual([r["name"] for r in index.suggest("ma", 2)], ["Mat 02", "Mat 03"])
+        for i in range(2, 60):
+            index.remove(i)
+        self.assertEqual(index.root.children, {})
+
+
+class ProductNeighborTests(TestCase):
+    def setUp(self):
+        self.make = lambda name, desc: Product.objects.create(product_name=name, description=desc, price=1)
+        self.bottle = self.make("Steel Water Bottle", "insulated steel bottle keeps water cold")
+        self.bottle2 = self.make("Steel Bottle Lite", "light insulated steel water bottle")
+        self.mat = self.make("Yoga Mat", "non slip yoga mat for pilates")
+        self.mat2 = self.make("Pilates Mat Pro", "thick pilates mat, non slip")
+
+    def _run(self, *args):
+        out = StringIO()
+        call_command("build_product_neighbors", *args, stdout=out)
+        return out.getvalue()
+
+    def test_full_build_and_detail_views_read_neighbors(self):
+        self._run("--k", "2")
+        self.assertEqual(similar_products(self.bottle)[0], self.bottle2)
+        self.assertEqual(similar_products(self.mat)[0], self.mat2)
+        self.assertFalse(ProductNeighbor.objects.filter(product=self.mat, neighbor=self.mat).exists())
+        with CaptureQueriesContext(connection) as ctx:
+            similar_products(self.mat)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+        data = self.client.get(reverse("catalog:api_product_detail", args=[self.bottle.pk])).json()
+        self.assertEqual(data["similar"][0]["id"], str(self.bottle2.pk))
+        self.assertNotIn("description", data["similar"][0])
+        resp = self.client.get(reverse("catalog:detail", args=[self.mat.pk]))
+        self.assertContains(resp, "Similar products")
+        self.assertEqual(resp.context["similar"][0], self.mat2)
+
+    def test_missing_only_adds_new_products_incrementally(self):
+        self._run("--k", "1")
+        before = dict(ProductNeighbor.objects.filter(product=self.mat).values_list("neighbor_id", "score"))
+        twin = self.make("Yoga Mat", "non slip yoga mat for pilates")
+        out = self._run("--k", "1", "--missing-only")
+        self.assertIn("1 produk dihitung", out)
+        self.assertEqual(similar_products(twin), [self.mat])
+        # produk lama yang lebih mirip ke produk baru ikut diperbarui
+        self.assertEqual(similar_products(self.mat), [twin])
+        self.assertNotEqual(before, dict(ProductNeighbor.objects.filter(product=self.mat)
+                                         .values_list("neighbor_id", "score")))
+        self.assertEqual(similar_products(self.bottle), [self.bottle2])
+
+
+class ProductCardCacheTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.p = Product.objects.create(product_name="Grip Socks", description="d", price=50_000)
+        self.customer = User.objects.create_user(username="buyer", password="pw")
+        self.staff = User.objects.create_user(username="boss", password="pw", is_staff=True)
+
+    def _cards(self, user=None):
+        request = RequestFactory().get("/")
+        request.user = user or AnonymousUser()
+        return request, render_cards(Product.objects.filter(pk=self.p.pk), request)
+
+    def test_second_render_is_served_from_cache(self):
+        with patch.object(cards, "_render", wraps=cards._render) as render:
+            _, first = self._cards()
+            _, second = self._cards()
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertIn("Grip Socks", first[0])
+
+    def test_product_save_invalidates_card(self):
+        self._cards()
+        self.p.price = 75_000
+        self.p.save()
+        _, cards = self._cards()
+        self.assertIn("75,000", cards[0])
+        # .update() (jalur stok checkout) juga ikut berubah key-nya
+        type(self.p).objects.filter(pk=self.p.pk).update(inStock=False)
+        _, cards = self._cards()
+        self.assertIn("Out of Stock", cards[0])
+
+    def test_viewer_state_and_csrf_token(self):
+        _, anon = self._cards()
+        _, staff = self._cards(self.staff)
+        with patch("catalog.cards.get_token", return_value="tok-buyer"):
+            _, customer = self._cards(self.customer)
+        self.assertIn("/user/login", anon[0])
+        self.assertIn("data-open-edit", staff[0])
+        self.assertNotIn("data-open-edit", customer[0])
+        self.assertIn('value="tok-buyer"', customer[0])
+        self.assertNotIn("__lume_card_csrf__", customer[0])
+
+    def test_shop_page_stitches_cached_cards(self):
+        self.client.get(reverse("main:show_main"))
+        with patch("catalog.cards._render") as render:
+            resp = self.client.get(reverse("main:show_main"))
+        render.assert_not_called()
+        self.assertContains(resp, f'id="card-{self.p.pk}"')
+        resp = self.client.get(reverse("main:landing"))
+        self.assertContains(resp, f'id="card-{self.p.pk}"')
+
+
+def bomb_fetch(url):
+    return fake_fetch(url)  # 10x10 > MAX_IMAGE_PIXELS * 2 saat test -> DecompressionBombError
@@ -0,0 +1,217 @@
+"""
+Pipeline thumbnail lokal (pengganti images.weserv.nl).
+
+Alur:
+1. Product.save() menyimpan URL lokal ``/catalog/thumbs/<key>/<size>.webp``
+   di ``thumbnail_proxied`` (``key`` = hash dari URL sumber).
+2. Request pertama ke URL itu -> view ``catalog.views.thumbnail`` mengambil
+   gambar sumber SEKALI lewat fetcher (bisa diganti via settings),
+   resize ke ukuran tetap, lalu simpan ke disk secara content-addressed.
+3. Request berikutnya langsung dilayani dari disk dengan cache header panjang.
+
+Layout di THUMBNAIL_ROOT:
+    objects/ab/abcdef....webp   -> isi file, nama = sha256 konten (dedupe antar produk)
+    refs/<key>-<size>           -> pointer ke sha256 konten
+"""
+import hashlib
+import io
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+
+# (lebar, tinggi) -> crop "cover" seperti parameter weserv sebelumnya
+SIZES = {
+    "card": (624, 468),     # kartu 312px @2x, rasio 4:3
+    "detail": (1280, 960),
+}
+DEFAULT_SIZE = "card"
+
+# naikkan kalau SIZES / encoder berubah supaya URL lama (immutable) tidak dipakai ulang
+PIPELINE_VERSION = "1"
+FORMAT = "WEBP"
+EXTENSION = "webp"
+CONTENT_TYPE = "image/webp"
+QUALITY = 82
+
+FAILURE_TTL = 600  # detik; sumber yang gagal tidak di-fetch ulang selama ini
+LOCK_TTL = 60      # detik; batas lock per key kalau proses pemegangnya mati
+LOCK_WAIT = 5      # detik; request lain menunggu hasil fetch yang sedang jalan
+
+
+class ThumbnailError(Exception):
+    pass
+
+
+class ThumbnailBusy(ThumbnailError):
+    """Thumbnail sedang dibuat request lain dan belum selesai dalam LOCK_WAIT."""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def thumbnail_root() -> Path:
+    return Path(_setting("THUMBNAIL_ROOT", Path(settings.MEDIA_ROOT) / "thumbs"))
+
+
+def source_key(url: str) -> str:
+    return hashlib.sha256(f"{PIPELINE_VERSION}:{url}".encode()).hexdigest()[:32]
+
+
+def thumbnail_path(url: str, size: str = DEFAULT_SIZE) -> str:
+    """URL lokal (path absolut situs) untuk thumbnail ``url`` pada ukuran ``size``."""
+    if not url:
+        return ""
+    return key_path(source_key(url), size)
+
+
+def key_path(key: str, size: str = DEFAULT_SIZE) -> str:
+    prefix = _setting("THUMBNAIL_URL", "/catalog/thumbs/")
+    return f"{prefix}{key}/{size}.{EXTENSION}"
+
+
+# ==========================
+# Fetcher
+# ==========================
+
+def http_fetch(url: str) -> bytes:
+    """Fetcher default: HTTP GET dengan timeout & batas ukuran."""
+    import requests
+
+    max_bytes = _setting("THUMBNAIL_MAX_SOURCE_BYTES", 10 * 1024 * 1024)
+    timeout = _setting("THUMBNAIL_FETCH_TIMEOUT", 10)
+    try:
+        with requests.get(url, timeout=timeout, stream=True, headers={"User-Agent": "Lume-Thumbnailer/1.0"}) as resp:
+            resp.raise_for_status()
+            buf = io.BytesIO()
+            for chunk in resp.iter_content(64 * 1024):
+                buf.write(chunk)
+                if buf.tell() > max_bytes:
+                    raise ThumbnailError("Source image too large")
+            return buf.getvalue()
+    except requests.RequestException as e:
+        raise ThumbnailError(str(e)) from e
+
+
+def get_fetcher():
+    return import_string(_setting("THUMBNAIL_FETCHER", "catalog.thumbnails.http_fetch"))
+
+
+# ==========================
+# Resize + store
+# ==========================
+
+def render(data: bytes, size: str) -> bytes:
+    from PIL import Image, ImageOps
+
+    # decode Pillow bisa gagal di mana saja (open, transpose, load saat resize, save)
+    # dengan macam-macam exception: DecompressionBombError, OSError, SyntaxError,
+    # ValueError, ... -> semua dijadikan ThumbnailError supaya di-cache negatif
+    try:
+        img = Image.open(io.BytesIO(data))
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+        img = ImageOps.fit(img, SIZES[size], Image.Resampling.LANCZOS)
+        out = io.BytesIO()
+        img.save(out, FORMAT, quality=QUALITY, method=4)
+    except Exception as e:
+        raise ThumbnailError("Source is not a readable image") from e
+    return out.getvalue()
+
+
+def _atomic_write(path: Path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def _object_path(digest: str) -> Path:
+    return thumbnail_root() / "objects" / digest[:2] / f"{digest}.{EXTENSION}"
+
+
+def _ref_path(key: str, size: str) -> Path:
+    return thumbnail_root() / "refs" / f"{key}-{size}"
+
+
+def lookup(key: str, size: str):
+    """(path, digest) kalau thumbnail sudah ada di disk, selain itu None."""
+    try:
+        digest = _ref_path(key, size).read_text().strip()
+    except FileNotFoundError:
+        return None
+    path = _object_path(digest)
+    return (path, digest) if path.exists() else None
+
+
+def store(key: str, size: str, data: bytes):
+    digest = hashlib.sha256(data).hexdigest()
+    path = _object_path(digest)
+    if not path.exists():
+        _atomic_write(path, data)
+    _atomic_write(_ref_path(key, size), digest.encode())
+    return path, digest
+
+
+def ensure_thumbnail(url: str, size: str = DEFAULT_SIZE):
+    """
+    Pastikan thumbnail ``url`` @ ``size`` ada di disk, fetch + resize kalau belum.
+    Return (path, digest). Raise ThumbnailError kalau sumber gagal diambil/dibaca.
+    """
+    if size not in SIZES:
+        raise ThumbnailError(f"Unknown size: {size}")
+    key = source_key(url)
+    hit = lookup(key, size)
+    if hit:
+        return hit
+
+    fail_key = f"thumbs:fail:{key}"
+    if cache.get(fail_key):
+        raise ThumbnailError("Source recently failed")
+
+    # hanya satu request per key yang fetch; sisanya menunggu hasilnya di disk
+    lock_key = f"thumbs:lock:{key}"
+    if not cache.add(lock_key, True, LOCK_TTL):
+        return _wait_for(key, size, fail_key)
+    try:
+        hit = lookup(key, size)  # bisa saja baru selesai dibuat pemegang lock sebelumnya
+        if hit:
+            return hit
+        try:
+            data = get_fetcher()(url)
+            rendered = {s: render(data, s) for s in SIZES}  # sekali fetch, semua ukuran
+        except ThumbnailError:
+            cache.set(fail_key, True, FAILURE_TTL)
+            raise
+        except Exception as e:  # fetcher custom boleh raise apa saja
+            cache.set(fail_key, True, FAILURE_TTL)
+            raise ThumbnailError(str(e)) from e
+        for s, blob in rendered.items():
+            store(key, s, blob)
+        return lookup(key, size)
+    finally:
+        cache.delete(lock_key)
+
+
+def _wait_for(key, size, fail_key):
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.1)
+        hit = lookup(key, size)
+        if hit:
+            return hit
+        if cache.get(fail_key):
+            raise ThumbnailError("Source recently failed")
+    raise ThumbnailBusy("Thumbnail is being generated")
@@ -13,8 +13,12 @@ urlpatterns = [
     path("products/<uuid:pk>/edit/",       views.product_update,     name="product_edit"),
     path("products/<uuid:pk>/delete/", views.product_delete, name="product_delete"),
     path("products/<uuid:id>/", views.product_detail, name="detail"),
+    path("thumbs/<str:key>/<str:size>.webp", views.thumbnail, name="thumbnail"),
     
     path("api/products/", api.api_products, name="api_products"),
+    path("api/suggest/", api.api_suggest, name="api_suggest"),
+    path("api/products/export/", api.api_products_export, name="api_products_export"),
+    path("api/products/bulk/", api.api_products_bulk, name="api_products_bulk"),
     path("api/products/<uuid:pk>/", api.api_product_detail, name="api_product_detail"),
     path("api/products/create/", api.api_product_create, name="api_product_create"),
     path("api/products/<uuid:pk>/update/", api.api_product_update, name="api_product_update"),
@@ -0,0 +1,99 @@
+"""
+Versi katalog + cache respons JSON dengan ETag.
+
+Setiap write ke Product / ClassSessions menaikkan ``catalog version``.
+Respons endpoint katalog di-cache per versi, dan ETag-nya diturunkan dari
+versi + URL (+ state wishlist user kalau relevan), jadi ``If-None-Match``
+bisa dijawab 304 hanya dengan membaca versi (1 query pk), tanpa query katalog.
+
+Versinya disimpan di DB (``CatalogVersion``, 1 row), bukan di cache: cache
+default (LocMemCache) per proses, jadi ``incr`` di satu worker tidak terlihat
+worker lain dan mereka terus melayani respons/ETag lama.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+
+from .wishlist import cache_token as wishlist_cache_token
+
+VERSION_PK = 1
+RESPONSE_CACHE_TIMEOUT = 60 * 10
+
+
+def get_catalog_version() -> int:
+    from .models import CatalogVersion
+
+    version = CatalogVersion.objects.filter(pk=VERSION_PK).values_list("value", flat=True).first()
+    if version is None:
+        # row dibuat migrasi 0009; jaga-jaga kalau terhapus. Mulai dari timestamp
+        # supaya tidak mengulang versi yang mungkin masih ada di cache.
+        row, _ = CatalogVersion.objects.get_or_create(pk=VERSION_PK, defaults={"value": int(time.time() * 1000)})
+        version = row.value
+    return version
+
+
+def _bump():
+    from .models import CatalogVersion
+
+    if not CatalogVersion.objects.filter(pk=VERSION_PK).update(value=F("value") + 1):
+        get_catalog_version()
+
+
+def bump_catalog_version():
+    """
+    Naikkan versi setelah commit. UPDATE-nya jalan di autocommit, jadi row versi
+    tidak ikut terkunci sepanjang transaksi caller (checkout, bulk upsert, ...);
+    worker lain juga baru bisa melihat data baru setelah commit.
+    """
+    transaction.on_commit(_bump)
+
+
+def catalog_cached(per_user=False, timeout=RESPONSE_CACHE_TIMEOUT):
+    """
+    Decorator untuk view GET katalog.
+
+    per_user=True -> respons bergantung state wishlist user (is_wishlisted),
+    jadi token wishlist ikut masuk ke key/ETag. User dengan wishlist yang sama
+    (mis. semua anonymous) berbagi entry cache yang sama.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(request, *args, **kwargs)
+
+            version = get_catalog_version()
+            variant = ""
+            if per_user:
+                variant = wishlist_cache_token(request.user)
+            digest = hashlib.sha1(f"{request.build_absolute_uri()}|{variant}".encode()).hexdigest()[:20]
+            etag = f'"c{version}-{digest}"'
+
+            if etag in parse_etags(request.headers.get("If-None-Match", "")):
+                response = HttpResponseNotModified()
+            else:
+                key = f"catalog:resp:{version}:{digest}"
+                hit = cache.get(key)
+                if hit is not None:
+                    content_type, body = hit
+                    response = HttpResponse(body, content_type=content_type)
+                else:
+                    response = view(request, *args, **kwargs)
+                    if response.status_code != 200 or response.streaming:
+                        return response
+                    cache.set(key, (response["Content-Type"], response.content), timeout)
+
+            response["ETag"] = etag
+            response["Cache-Control"] = "no-cache"  # boleh disimpan client, wajib revalidasi
+            if per_user:
+                patch_vary_headers(response, ("Cookie",))
+            return response
+        return wrapper
+    return decorator
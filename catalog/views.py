@@ -3,12 +3,16 @@ from django.template.loader import render_to_string
 from django.http import JsonResponse, HttpResponseNotAllowed
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required, user_passes_test
-from .models import Product
+from .cards import render_cards
+from .models import Product, similar_products
 from .forms import ProductForm
 from django.views.decorators.http import require_POST
 from django.http import JsonResponse, HttpResponse, HttpResponseNotAllowed
 from django.shortcuts import redirect
 from catalog.models import Product
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from . import thumbnails
+import re
 
 # semua endpoint admin guarded oleh helper sederhana ini
 def is_admin(u): return u.is_staff
@@ -91,4 +95,48 @@ def product_create(request):
 
 def product_detail(request, id):
     p = get_object_or_404(Product, pk=id)
-    return render(request, "catalog/product_detail.html", {"p": p})
+    similar = similar_products(p)
+    return render(request, "catalog/product_detail.html", {
+        "p": p,
+        "similar": similar,
+        "similar_cards": render_cards(similar, request),
+    })
+
+
+_THUMB_KEY_RE = re.compile(r"^[0-9a-f]{32}$")
+THUMB_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@require_http_methods(["GET", "HEAD"])
+def thumbnail(request, key, size):
+    # URL thumbnail immutable (key = hash URL sumber + versi pipeline), jadi aman di-cache setahun
+    if size not in thumbnails.SIZES or not _THUMB_KEY_RE.match(key):
+        raise Http404("Unknown thumbnail")
+
+    hit = thumbnails.lookup(key, size)
+    if hit is None:
+        # cache miss: cari URL sumber lewat kolom thumbnail_proxied (ter-index)
+        source = (Product.objects
+                  .filter(thumbnail_proxied=thumbnails.key_path(key))
+                  .values_list("thumbnail_normalized", flat=True)
+                  .first())
+        if not source:
+            raise Http404("Unknown thumbnail")
+        try:
+            hit = thumbnails.ensure_thumbnail(source, size)
+        except thumbnails.ThumbnailBusy:
+            resp = HttpResponse("Thumbnail is being generated", status=503)
+            resp["Retry-After"] = "1"
+            return resp
+        except thumbnails.ThumbnailError:
+            raise Http404("Thumbnail source unavailable")
+
+    path, digest = hit
+    etag = f'"{digest}"'
+    if request.headers.get("If-None-Match") == etag:
+        resp = HttpResponseNotModified()
+    else:
+        resp = FileResponse(open(path, "rb"), content_type=thumbnails.CONTENT_TYPE)
+    resp["ETag"] = etag
+    resp["Cache-Control"] = THUMB_CACHE_CONTROL
+    return resp
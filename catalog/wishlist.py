@@ -0,0 +1,124 @@
+"""
+Cache membership wishlist per user.
+
+Listing katalog butuh flag ``is_wishlisted`` untuk setiap produk; daripada
+query ``values_list`` tiap request, ID wishlist user disimpan di cache sebagai
+satu blob ``bytes`` (16 byte per UUID). Cache ini hanya untuk jalur baca.
+
+Key blob memuat versi wishlist user (``WishlistVersion``, 1 row per user di DB).
+Setiap write ke ``User.wishlist`` (signal ``m2m_changed``) menaikkan versi itu
+setelah commit, jadi semua worker - termasuk yang cache-nya per proses
+(LocMemCache) - langsung membaca key baru dan mengisinya ulang dari DB.
+Keputusan write (mis. toggle) selalu dari DB, bukan dari blob ini.
+"""
+import hashlib
+from uuid import UUID
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+CACHE_TIMEOUT = 60 * 60
+_KEY = "wishlist:ids:{}:{}"
+
+
+class WishlistIds:
+    """Set ID produk read-only; ``in`` menerima UUID maupun string."""
+
+    __slots__ = ("_ids",)
+
+    def __init__(self, raw=b""):
+        self._ids = frozenset(raw[i:i + 16] for i in range(0, len(raw), 16))
+
+    @classmethod
+    def from_pks(cls, pks):
+        return cls(_pack(pks))
+
+    def __contains__(self, pk):
+        try:
+            return _to_bytes(pk) in self._ids
+        except (ValueError, TypeError, AttributeError):
+            return False
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __iter__(self):
+        return (str(UUID(bytes=b)) for b in self._ids)
+
+
+EMPTY = WishlistIds()
+
+
+def _to_bytes(pk):
+    return (pk if isinstance(pk, UUID) else UUID(str(pk))).bytes
+
+
+def _pack(pks):
+    return b"".join(sorted({_to_bytes(pk) for pk in pks}))
+
+
+def _version(user_id) -> int:
+    from .models import WishlistVersion
+
+    return WishlistVersion.objects.filter(pk=user_id).values_list("value", flat=True).first() or 0
+
+
+def _key(user_id, version):
+    return _KEY.format(user_id, version)
+
+
+def get_wishlist_ids(user) -> WishlistIds:
+    """ID wishlist ``user`` dari cache (1 query pk untuk versi); query wishlist hanya saat cache miss."""
+    if not user or not getattr(user, "is_authenticated", False):
+        return EMPTY
+    key = _key(user.pk, _version(user.pk))
+    raw = cache.get(key)
+    if raw is None:
+        raw = _pack(user.wishlist.values_list("id", flat=True))
+        cache.set(key, raw, CACHE_TIMEOUT)
+    return WishlistIds(raw)
+
+
+def cache_token(user) -> str:
+    """Token pendek yang berubah setiap isi wishlist user berubah (untuk key/ETag respons)."""
+    if not user or not getattr(user, "is_authenticated", False):
+        return ""
+    ids = get_wishlist_ids(user)
+    if not ids:
+        return ""
+    return hashlib.sha1(b"".join(sorted(ids._ids))).hexdigest()[:12]
+
+
+def invalidate(user_ids):
+    """Naikkan versi wishlist ``user_ids``: blob lama di cache mana pun tidak terpakai lagi."""
+    from .models import WishlistVersion
+
+    for user_id in set(user_ids):
+        if WishlistVersion.objects.filter(pk=user_id).update(value=F("value") + 1):
+            continue
+        try:
+            with transaction.atomic():
+                WishlistVersion.objects.create(user_id=user_id, value=1)
+        except IntegrityError:  # dibuat request lain barusan
+            WishlistVersion.objects.filter(pk=user_id).update(value=F("value") + 1)
+
+
+def on_wishlist_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    """
+    Receiver ``m2m_changed`` untuk ``User.wishlist.through``.
+    Diterapkan setelah commit supaya rollback tidak meninggalkan cache yang salah.
+    """
+    if reverse:
+        # product.wishlisted_by.add(user...) -> yang berubah adalah user di pk_set
+        if action == "pre_clear":
+            # saat clear, pk_set kosong -> ambil dulu user mana saja yang terdampak
+            user_ids = list(instance.wishlisted_by.values_list("pk", flat=True))
+            transaction.on_commit(lambda: invalidate(user_ids))
+        elif action in ("post_add", "post_remove"):
+            transaction.on_commit(lambda: invalidate(pk_set))
+        return
+
+    if action in ("post_add", "post_remove", "post_clear"):
+        user_id = instance.pk
+        transaction.on_commit(lambda: invalidate([user_id]))
@@ -1,7 +1,63 @@
 from django.contrib import admin
 from django.db.models import Count
+from catalog.csv_export import Column, csv_export_action
 from .models import ProductOrder, ProductOrderItem, BookingOrder, BookingOrderItem
 
+# export CSV streaming, 1 baris per item order
+export_product_orders = csv_export_action(
+    [
+        Column("order_id", "id"),
+        Column("created_at"),
+        Column("user", "user.username"),
+        Column("receiver_name"),
+        Column("receiver_phone"),
+        Column("address_line1"),
+        Column("address_line2", default=False),
+        Column("city"),
+        Column("province"),
+        Column("postal_code"),
+        Column("country", default=False),
+        Column("subtotal"),
+        Column("shipping_fee"),
+        Column("total"),
+        Column("notes", default=False),
+    ],
+    filename="product_orders.csv",
+    items="items",
+    item_columns=[
+        Column("product_id", default=False),
+        Column("product_name"),
+        Column("unit_price"),
+        Column("quantity"),
+        Column("line_total"),
+    ],
+    select_related=("user",),
+    description="Export selected orders to CSV",
+)
+
+export_booking_orders = csv_export_action(
+    [
+        Column("order_id", "id"),
+        Column("created_at"),
+        Column("user", "user.username"),
+        Column("subtotal"),
+        Column("total"),
+        Column("notes", default=False),
+    ],
+    filename="booking_orders.csv",
+    items="items",
+    item_columns=[
+        Column("booking_id", default=False),
+        Column("session_title"),
+        Column("occurrence_date"),
+        Column("occurrence_start_time"),
+        Column("unit_price"),
+        Column("quantity"),
+    ],
+    select_related=("user",),
+    description="Export selected orders to CSV",
+)
+
 class ReadOnlyAdmin(admin.ModelAdmin):
     """Admin base class untuk membuat model read-only di Django Admin."""
 
@@ -52,6 +108,7 @@ class BookingOrderItemInline(admin.TabularInline):
 @admin.register(ProductOrder)
 class ProductOrderAdmin(ReadOnlyAdmin):
     inlines = [ProductOrderItemInline]
+    actions = (export_product_orders,)
     date_hierarchy = "created_at"
     list_display = ("id", "user", "receiver_name", "city", "total", "items_count", "created_at")
     list_filter = ("created_at", "city", "province", "country")
@@ -84,6 +141,7 @@ class ProductOrderAdmin(ReadOnlyAdmin):
 @admin.register(BookingOrder)
 class BookingOrderAdmin(ReadOnlyAdmin):
     inlines = [BookingOrderItemInline]
+    actions = (export_booking_orders,)
     date_hierarchy = "created_at"
     list_display = ("id", "user", "total", "items_count", "created_at")
     list_filter = ("created_at",)
@@ -1,17 +1,18 @@
 # checkout/api.py
 
-from decimal import Decimal
 import json
 
 from django.contrib.auth.decorators import login_required
 from django.db import transaction
-from django.db.models import F
 from django.http import JsonResponse, HttpResponseBadRequest
 from django.shortcuts import get_object_or_404
 from django.views.decorators.csrf import csrf_exempt
 
 from cart.models import Cart
+from cart.reservations import InsufficientStock, take_stock
+from bookingkelas.counters import booking_confirmed
 from bookingkelas.models import Booking, ClassSessions
+from .pricing import cart_items, price_items, with_line_totals
 from .models import (
     ProductOrder,
     ProductOrderItem,
@@ -53,7 +54,7 @@ def _serialize_cart_item(ci):
         "product_name": product_name,
         "unit_price": float(ci.product.price),
         "quantity": ci.quantity,
-        "line_total": float(ci.product.price * ci.quantity),
+        "line_total": float(ci.line_total),  # anotasi pricing.with_line_totals
     }
 
 
@@ -91,26 +92,12 @@ def cart_summary_api(request):
     if request.method != "GET":
         return HttpResponseBadRequest("GET required.")
 
-    cart = get_object_or_404(
-        Cart.objects.prefetch_related("items__product"),
-        user=request.user
-    )
-
-    qs = cart.items.select_related("product")
-    if request.GET.get("selected") == "1":
-        qs = qs.filter(is_selected=True)
-
-    items = list(qs)
-    subtotal = sum(ci.product.price * ci.quantity for ci in items)
-    shipping = ProductOrder.FLAT_SHIPPING if items else Decimal("0")
-    total = subtotal + shipping
+    items = cart_items(request)
+    pricing = price_items(items)
 
     return JsonResponse({
-        "items": [_serialize_cart_item(ci) for ci in items],
-        "subtotal": float(subtotal),
-        "shipping": float(shipping),
-        "total": float(total),
-        "count": sum(ci.quantity for ci in items),
+        "items": [_serialize_cart_item(ci) for ci in with_line_totals(items).order_by("id")],
+        **pricing.as_json(),
     })
 
 
@@ -187,78 +174,57 @@ def cart_checkout_api(request):
     receiver_name = user.get_full_name() or user.username
     receiver_phone = getattr(user, "phone", "") or ""
 
-    with transaction.atomic():
-        # 1. Kunci stok product yang terlibat
-        locked = {}
-        for ci in selected_qs.select_related("product"):
-            PModel = type(ci.product)
-            p = PModel.objects.select_for_update().get(pk=ci.product_id)
-            locked[ci.product_id] = p
-
-            if hasattr(p, "stock") and p.stock is not None:
-                if p.stock < ci.quantity:
-                    product_name = getattr(
-                        p, "name", getattr(p, "product_name", "produk")
-                    )
-                    return JsonResponse(
-                        {
-                            "success": False,
-                            "message": f"Stok {product_name} tidak mencukupi.",
-                        },
-                        status=400,
-                    )
-
-        # 2. Buat ProductOrder (tanpa form, langsung dari data)
-        order = ProductOrder.objects.create(
-            user=user,
-            cart=cart,
-            receiver_name=receiver_name,
-            receiver_phone=receiver_phone,
-            address_line1=data.get("address_line1", ""),
-            address_line2=data.get("address_line2", ""),
-            city=data.get("city", ""),
-            province=data.get("province", ""),
-            postal_code=data.get("postal_code", ""),
-            country=data.get("country", ""),
-            notes=data.get("notes", ""),
-        )
-
-        # 3. Buat ProductOrderItem + update stok
-        for ci in selected_qs:
-            p = locked.get(ci.product_id, ci.product)
-
-            ProductOrderItem.objects.create(
-                order=order,
-                product=ci.product,
-                product_name=getattr(
-                    ci.product, "product_name",
-                    getattr(ci.product, "name", str(ci.product))
-                ),
-                unit_price=ci.product.price,
-                quantity=ci.quantity,
+    try:
+        with transaction.atomic():
+            # 1. Ambil stok lewat UPDATE kondisional (hold cart dipakai dulu kalau reservasi aktif)
+            items = list(selected_qs)
+            take_stock(cart, items)
+
+            # 2. Buat ProductOrder (tanpa form, langsung dari data)
+            order = ProductOrder.objects.create(
+                user=user,
+                cart=cart,
+                receiver_name=receiver_name,
+                receiver_phone=receiver_phone,
+                address_line1=data.get("address_line1", ""),
+                address_line2=data.get("address_line2", ""),
+                city=data.get("city", ""),
+                province=data.get("province", ""),
+                postal_code=data.get("postal_code", ""),
+                country=data.get("country", ""),
+                notes=data.get("notes", ""),
             )
 
-            if hasattr(p, "stock") and p.stock is not None:
-                PModel = type(p)
-                PModel.objects.filter(pk=p.pk).update(
-                    stock=F("stock") - ci.quantity
+            # 3. Buat ProductOrderItem
+            for ci in items:
+                ProductOrderItem.objects.create(
+                    order=order,
+                    product=ci.product,
+                    product_name=getattr(
+                        ci.product, "product_name",
+                        getattr(ci.product, "name", str(ci.product))
+                    ),
+                    unit_price=ci.product.price,
+                    quantity=ci.quantity,
                 )
 
-        # 4. Update inStock jika stok habis
-        for p in locked.values():
-            if hasattr(p, "inStock"):
-                p.refresh_from_db(fields=["stock"])
-                if p.stock is not None and p.stock <= 0 and getattr(p, "inStock", True):
-                    type(p).objects.filter(pk=p.pk).update(inStock=False)
+            # 4. Hitung ulang subtotal, shipping, total
+            order.recalc_totals()
+            order.save(update_fields=["subtotal", "shipping_fee", "total"])
 
-        # 5. Hitung ulang subtotal, shipping, total
-        order.recalc_totals()
-        order.save(update_fields=["subtotal", "shipping_fee", "total"])
-
-        # 6. Hapus item yang sudah di-checkout dari cart
-        selected_ids = list(selected_qs.values_list("id", flat=True))
-        transaction.on_commit(
-            lambda: cart.items.filter(id__in=selected_ids).delete()
+            # 5. Hapus item yang sudah di-checkout dari cart
+            selected_ids = [ci.id for ci in items]
+            transaction.on_commit(
+                lambda: cart.items.filter(id__in=selected_ids).delete()
+            )
+    except InsufficientStock as e:
+        product_name = getattr(e.product, "name", getattr(e.product, "product_name", "produk"))
+        return JsonResponse(
+            {
+                "success": False,
+                "message": f"Stok {product_name} tidak mencukupi.",
+            },
+            status=400,
         )
 
     return JsonResponse(
@@ -377,6 +343,7 @@ def booking_checkout_api(request, booking_id):
             order_items__isnull=False,
         ).count()
         session_to_book.save(update_fields=["capacity_current"])
+        booking_confirmed(session_to_book.id)
 
         order.recalc_totals()
         order.save(update_fields=["subtotal", "total"])
@@ -410,6 +377,8 @@ def order_history_json(request):
                 # Cek apakah model Product punya 'proxied_thumbnail' (dari file catalog/models.py Anda)
                 if hasattr(item.product, 'proxied_thumbnail'):
                     img_url = item.product.proxied_thumbnail
+                    if img_url.startswith("/"):
+                        img_url = request.build_absolute_uri(img_url)
                 # Fallback ke field thumbnail biasa
                 elif item.product.thumbnail:
                     img_url = item.product.thumbnail
@@ -0,0 +1,69 @@
+"""
+Harga cart dihitung di database, dipakai semua view checkout supaya angkanya identik.
+
+    price_items(items)      -> CartPricing (1 query aggregate)
+    with_line_totals(items) -> queryset item + anotasi ``line_total``
+    cart_items(request)     -> CartItem milik user (tanpa query Cart), ``?selected=1`` = yang dicentang
+
+``items`` = queryset CartItem (mis. ``cart.items.filter(is_selected=True)``).
+Ongkir flat ``ProductOrder.FLAT_SHIPPING``, hanya kalau ada item.
+"""
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.db.models import BigIntegerField, Count, F, Sum
+from django.db.models.functions import Cast
+
+from cart.models import CartItem
+
+from .models import ProductOrder
+
+
+def line_total_expr():
+    # bigint: price * quantity bisa lewat batas integer 32-bit di Postgres
+    return Cast("product__price", BigIntegerField()) * F("quantity")
+
+
+def with_line_totals(items):
+    return items.select_related("product").annotate(line_total=line_total_expr())
+
+
+def cart_items(request):
+    items = CartItem.objects.filter(cart__user=request.user)
+    if request.GET.get("selected") == "1":
+        items = items.filter(is_selected=True)
+    return items
+
+
+@dataclass(frozen=True)
+class CartPricing:
+    subtotal: Decimal
+    shipping: Decimal
+    total: Decimal
+    count: int   # sum(quantity)
+    lines: int   # jumlah baris item
+
+    def as_json(self) -> dict:
+        return {
+            "subtotal": float(self.subtotal),
+            "shipping": float(self.shipping),
+            "total": float(self.total),
+            "count": self.count,
+        }
+
+
+def price_items(items) -> CartPricing:
+    row = items.order_by().aggregate(
+        subtotal=Sum(line_total_expr()),
+        count=Sum("quantity"),
+        lines=Count("id"),
+    )
+    subtotal = Decimal(row["subtotal"] or 0)
+    shipping = ProductOrder.FLAT_SHIPPING if row["lines"] else Decimal("0")
+    return CartPricing(
+        subtotal=subtotal,
+        shipping=shipping,
+        total=subtotal + shipping,
+        count=row["count"] or 0,
+        lines=row["lines"],
+    )
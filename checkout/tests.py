@@ -4,9 +4,14 @@ from unittest import mock
 
 from django.contrib.auth import get_user_model
 from django.http import HttpResponse
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
+from cart.models import Cart
+from cart.reservations import add_item
+from checkout.pricing import price_items
+from catalog.models import Product
+
 from .forms import CartCheckoutForm
 from .models import ProductOrder, ProductOrderItem
 
@@ -98,17 +103,14 @@ class CheckoutViewsTest(TestCase):
         self.assertIn("/user/login/", resp["Location"])
 
     @mock.patch("checkout.views.render")
-    @mock.patch("checkout.views.get_object_or_404")
-    def test_cart_checkout_page_renders_totals(self, m_get_obj, m_render):
+    def test_cart_checkout_page_renders_totals(self, m_render):
         self.client.login(username="u1", password="pw")
 
-        p1 = FakeProduct(price=Decimal("10000.00"), pk=1)
-        p2 = FakeProduct(price=Decimal("20000.00"), pk=2)
-        ci1 = FakeCartItem(product=p1, quantity=1, is_selected=True, product_id=1)
-        ci2 = FakeCartItem(product=p2, quantity=2, is_selected=True, product_id=2)
-        cart = FakeCart([ci1, ci2])
+        # totals dihitung di DB (checkout/pricing.py) -> pakai row asli, bukan FakeCart
+        cart = Cart.objects.create(user=self.user)
+        cart.add(Product.objects.create(product_name="P1", price=10000, description=""), 1)
+        cart.add(Product.objects.create(product_name="P2", price=20000, description=""), 2)
 
-        m_get_obj.side_effect = lambda *a, **k: cart
         m_render.side_effect = lambda req, tpl, ctx: HttpResponse(f"OK {ctx['total']}")
 
         url = reverse("checkout:cart_checkout_page")
@@ -187,16 +189,14 @@ class CheckoutViewsTest(TestCase):
         self.assertEqual(resp.status_code, 302)
         self.assertIn(reverse("checkout:cart_checkout_page"), resp["Location"])
 
-    @mock.patch("checkout.views.get_object_or_404")
-    def test_cart_summary_json_ok(self, m_get_obj):
+    def test_cart_summary_json_ok(self):
         self.client.login(username="u1", password="pw")
 
-        p1 = FakeProduct(price=Decimal("12000.00"), pk=1)
-        p2 = FakeProduct(price=Decimal("5000.00"), pk=2)
-        sel = FakeCartItem(product=p1, quantity=2, is_selected=True, product_id=1)
-        nos = FakeCartItem(product=p2, quantity=10, is_selected=False, product_id=2)
-        cart = FakeCart([sel, nos])
-        m_get_obj.side_effect = lambda *a, **k: cart
+        cart = Cart.objects.create(user=self.user)
+        cart.add(Product.objects.create(product_name="P1", price=12000, description=""), 2)
+        nos = cart.add(Product.objects.create(product_name="P2", price=5000, description=""), 10)
+        nos.is_selected = False
+        nos.save(update_fields=["is_selected"])
 
         url = reverse("checkout:cart_summary_json")
         resp = self.client.get(url, {"selected": "1"})
@@ -305,3 +305,96 @@ class CheckoutFormsModelsTest(TestCase):
         self.assertEqual(order.subtotal, Decimal("25000.00"))
         self.assertEqual(order.shipping_fee, Decimal("10000.00"))
         self.assertEqual(order.total, Decimal("35000.00"))
+
+
+class OrderCsvExportAdminTest(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser(username="root", password="pw"))
+        buyer = User.objects.create_user(username="buyer", password="pw")
+        self.order = ProductOrder.objects.create(
+            user=buyer, receiver_name="B", receiver_phone="1", address_line1="Jl. Y",
+            city="Depok", province="Jabar", postal_code="16424",
+        )
+        ProductOrderItem.objects.create(order=self.order, product_name="Mat",
+                                        unit_price=Decimal("20000.00"), quantity=2)
+        ProductOrderItem.objects.create(order=self.order, product_name="Ball",
+                                        unit_price=Decimal("5000.00"), quantity=1)
+
+    def test_product_orders_export_one_row_per_item(self):
+        import csv, io
+        from django.contrib.admin import helpers
+        resp = self.client.post(reverse("admin:checkout_productorder_changelist"), {
+            "action": "export_product_orders_csv", "index": 0, "csv_export": "1",
+            helpers.ACTION_CHECKBOX_NAME: [str(self.order.pk)],
+            "columns": ["order_id", "user", "product_name", "quantity", "line_total"],
+        })
+        self.assertTrue(resp.streaming)
+        rows = list(csv.reader(io.StringIO(b"".join(resp.streaming_content).decode())))
+        self.assertEqual(rows[0], ["order_id", "user", "product_name", "quantity", "line_total"])
+        self.assertEqual(sorted(r[2:] for r in rows[1:]), [["Ball", "1", "5000.00"], ["Mat", "2", "40000.00"]])
+        self.assertEqual({r[1] for r in rows[1:]}, {"buyer"})
+
+
+@override_settings(CART_HOLD_TTL=600)
+class CartCheckoutStockTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="holder", password="pw")
+        self.client.force_login(self.user)
+        self.mat = Product.objects.create(product_name="Mat", price=20000, stock=2, description="")
+        self.ball = Product.objects.create(product_name="Ball", price=5000, stock=1, description="")
+        self.cart = Cart.objects.create(user=self.user)
+        self.body = {"address_line1": "Jl. Z", "city": "Depok", "province": "Jabar",
+                     "postal_code": "16424", "country": "Indonesia"}
+
+    def test_checkout_sells_held_stock(self):
+        add_item(self.cart, self.mat, 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(reverse("checkout:cart_checkout_api"), self.body)
+        self.assertTrue(resp.json()["success"])
+        self.mat.refresh_from_db()
+        self.assertEqual((self.mat.stock, self.mat.reserved, self.mat.inStock), (0, 0, False))
+        self.assertFalse(self.cart.items.exists())
+
+    def test_shortage_rolls_back_whole_checkout(self):
+        add_item(self.cart, self.mat, 1)
+        self.cart.add(self.ball, 1)  # tanpa hold
+        Product.objects.filter(pk=self.ball.pk).update(stock=0)
+        resp = self.client.post(reverse("checkout:cart_checkout_api"), self.body)
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("Ball", resp.json()["message"])
+        self.mat.refresh_from_db()
+        self.assertEqual((self.mat.stock, self.mat.reserved), (2, 1))
+        self.assertFalse(ProductOrder.objects.exists())
+
+
+class CartPricingTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="pricer", password="pw")
+        self.client.force_login(self.user)
+        self.cart = Cart.objects.create(user=self.user)
+        mat = Product.objects.create(product_name="Mat", price=150000, stock=50000, description="")
+        ball = Product.objects.create(product_name="Ball", price=5000, stock=5, description="")
+        self.cart.add(mat, 20000)  # 3e9: lewat batas int 32-bit
+        ball_item = self.cart.add(ball, 3)
+        ball_item.is_selected = False
+        ball_item.save(update_fields=["is_selected"])
+
+    def test_price_items_is_one_aggregate_query(self):
+        with self.assertNumQueries(1):
+            pricing = price_items(self.cart.items.all())
+        self.assertEqual(pricing.subtotal, Decimal("3000015000"))
+        self.assertEqual(pricing.total, Decimal("3000015000") + ProductOrder.FLAT_SHIPPING)
+        self.assertEqual((pricing.count, pricing.lines), (20003, 2))
+        empty = price_items(self.cart.items.none())
+        self.assertEqual((empty.subtotal, empty.shipping, empty.total, empty.count), (0, 0, 0, 0))
+
+    def test_all_summary_endpoints_share_totals(self):
+        for selected in ("", "1"):
+            page = self.client.get(reverse("checkout:cart_summary_json"), {"selected": selected}).json()
+            api = self.client.get(reverse("checkout:cart_summary_api"), {"selected": selected}).json()
+            self.assertEqual(page, {k: api[k] for k in ("subtotal", "shipping", "total", "count")})
+            self.assertEqual(sum(i["line_total"] for i in api["items"]), api["subtotal"])
+        self.assertEqual(api["count"], 20000)
+        resp = self.client.get(reverse("checkout:cart_checkout_page"))
+        self.assertEqual((resp.context["subtotal"], resp.context["items_count"]), (Decimal("3000000000"), 20000))
+        self.assertEqual([ci.line_total for ci in resp.context["cart_items"]], [3000000000])
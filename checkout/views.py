@@ -1,5 +1,3 @@
-from decimal import Decimal
-
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.db import transaction
@@ -7,46 +5,38 @@ from django.http import HttpResponseBadRequest, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from .forms import CartCheckoutForm
 from .models import ProductOrder, ProductOrderItem, BookingOrder, BookingOrderItem
+from .pricing import cart_items, price_items, with_line_totals
 from cart.models import Cart
+from cart.reservations import InsufficientStock, take_stock
+from bookingkelas.counters import booking_confirmed
 from bookingkelas.models import Booking, ClassSessions
-from django.db.models import F
 from django.views.decorators.csrf import csrf_exempt
 import json
 
 
 @login_required(login_url="/user/login/")
 def cart_checkout_page(request):
-    cart = get_object_or_404(
-        Cart.objects.prefetch_related("items__product"),
-        user=request.user
-    )
-
-    items_qs = cart.items.select_related("product").filter(is_selected=True)
-    items = list(items_qs)
+    selected = cart_items(request).filter(is_selected=True)
+    items = list(with_line_totals(selected).order_by("id"))
 
     if not items:
         messages.error(request, "Pilih dulu item yang mau di-checkout.")
         return redirect("cart:page")
 
-    subtotal = sum(ci.product.price * ci.quantity for ci in items)
-    shipping = ProductOrder.FLAT_SHIPPING if items else Decimal("0")
-    total = subtotal + shipping
+    pricing = price_items(selected)
 
     for ci in items:
         ci.display_name = getattr(ci.product, "product_name",
                             getattr(ci.product, "name", str(ci.product)))
-        ci.line_total = ci.product.price * ci.quantity
-
-    items_count = sum(ci.quantity for ci in items)
 
     form = CartCheckoutForm()
     return render(request, "checkout/cart_checkout_page.html", {
         "form": form,
         "cart_items": items,
-        "subtotal": subtotal,
-        "shipping": shipping,
-        "total": total,
-        "items_count": items_count,    
+        "subtotal": pricing.subtotal,
+        "shipping": pricing.shipping,
+        "total": pricing.total,
+        "items_count": pricing.count,
         "payment_method": "Cash on Delivery",
     })
 
@@ -76,58 +66,45 @@ def checkout_cart_create(request):
     receiver_phone = getattr(user, "phone", "") or ""
     cd = form.cleaned_data
 
-    with transaction.atomic():
-        locked = {}
-        for ci in selected_qs.select_related("product"):
-            PModel = type(ci.product)
-            p = PModel.objects.select_for_update().get(pk=ci.product_id)
-            locked[ci.product_id] = p
-
-            if hasattr(p, "stock") and p.stock is not None:
-                if p.stock < ci.quantity:
-                    messages.error(request, f"Stok {getattr(p, 'name', getattr(p, 'product_name', 'produk'))} tidak mencukupi.")
-                    return redirect("cart:page")
-
-        order = ProductOrder.objects.create(
-            user=user,
-            cart=cart,
-            receiver_name=receiver_name,
-            receiver_phone=receiver_phone,
-            address_line1=cd["address_line1"],
-            address_line2=cd.get("address_line2", ""),
-            city=cd["city"],
-            province=cd["province"],
-            postal_code=cd["postal_code"],
-            country=cd["country"],
-            notes=cd.get("notes", ""),
-        )
-
-        for ci in selected_qs:
-            p = locked.get(ci.product_id, ci.product)
-
-            ProductOrderItem.objects.create(
-                order=order,
-                product=ci.product,
-                product_name=getattr(ci.product, "product_name", getattr(ci.product, "name", str(ci.product))),
-                unit_price=ci.product.price,
-                quantity=ci.quantity,
+    try:
+        with transaction.atomic():
+            items = list(selected_qs)
+            # stok diambil lewat UPDATE kondisional (hold cart dipakai dulu kalau reservasi aktif),
+            # tanpa select_for_update tiap product
+            take_stock(cart, items)
+
+            order = ProductOrder.objects.create(
+                user=user,
+                cart=cart,
+                receiver_name=receiver_name,
+                receiver_phone=receiver_phone,
+                address_line1=cd["address_line1"],
+                address_line2=cd.get("address_line2", ""),
+                city=cd["city"],
+                province=cd["province"],
+                postal_code=cd["postal_code"],
+                country=cd["country"],
+                notes=cd.get("notes", ""),
             )
 
-            if hasattr(p, "stock") and p.stock is not None:
-                PModel = type(p)
-                PModel.objects.filter(pk=p.pk).update(stock=F("stock") - ci.quantity)
-
-        for p in locked.values():
-            if hasattr(p, "inStock"):
-                p.refresh_from_db(fields=["stock"])
-                if p.stock is not None and p.stock <= 0 and getattr(p, "inStock", True):
-                    type(p).objects.filter(pk=p.pk).update(inStock=False)
-
-        order.recalc_totals()
-        order.save(update_fields=["subtotal", "shipping_fee", "total"])
-
-        selected_ids = list(selected_qs.values_list("id", flat=True))
-        transaction.on_commit(lambda: cart.items.filter(id__in=selected_ids).delete())
+            for ci in items:
+                ProductOrderItem.objects.create(
+                    order=order,
+                    product=ci.product,
+                    product_name=getattr(ci.product, "product_name", getattr(ci.product, "name", str(ci.product))),
+                    unit_price=ci.product.price,
+                    quantity=ci.quantity,
+                )
+
+            order.recalc_totals()
+            order.save(update_fields=["subtotal", "shipping_fee", "total"])
+
+            selected_ids = [ci.id for ci in items]
+            transaction.on_commit(lambda: cart.items.filter(id__in=selected_ids).delete())
+    except InsufficientStock as e:
+        p = e.product
+        messages.error(request, f"Stok {getattr(p, 'name', getattr(p, 'product_name', 'produk'))} tidak mencukupi.")
+        return redirect("cart:page")
 
     return redirect("checkout:order_confirmed")
 
@@ -186,6 +163,7 @@ def booking_checkout(request, booking_id):
                 order_items__isnull=False
             ).count()
             session_to_book.save(update_fields=["capacity_current"])
+            booking_confirmed(booking.session.id)
             
             order.recalc_totals() 
             order.save(update_fields=["subtotal", "total"])
@@ -209,22 +187,7 @@ def booking_checkout(request, booking_id):
 
 @login_required(login_url="/user/login/")
 def cart_summary_json(request):
-    cart = get_object_or_404(Cart.objects.prefetch_related("items__product"), user=request.user)
-
-    qs = cart.items.select_related("product")
-    if request.GET.get("selected") == "1":
-        qs = qs.filter(is_selected=True)
-
-    items = list(qs)
-    subtotal = sum(ci.product.price * ci.quantity for ci in items)
-    shipping = ProductOrder.FLAT_SHIPPING if items else Decimal("0")
-    total = subtotal + shipping
-    return JsonResponse({
-        "subtotal": float(subtotal),
-        "shipping": float(shipping),
-        "total": float(total),
-        "count": sum(ci.quantity for ci in items),
-    })
+    return JsonResponse(price_items(cart_items(request)).as_json())
 
 @login_required(login_url="/user/login/")
 def order_confirmed(request):
@@ -295,7 +258,8 @@ def process_booking_payment_api(request):
             
             # 5. ✅ UPDATE KAPASITAS DI SINI (Setelah Payment Sukses)
             session_locked.capacity_current += 1
-            session_locked.save()
+            session_locked.save(update_fields=["capacity_current"])
+            booking_confirmed(session_locked.id)
             
             return JsonResponse({"status": "success", "message": "Payment successful!"})
 
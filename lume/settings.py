@@ -122,6 +122,25 @@ else:
     }
 
 
+# Cache
+# Dipakai cache wishlist, count katalog, dll. Di production (multi worker) set REDIS_URL
+# supaya semua worker berbagi cache yang sama (butuh package `redis`).
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'lume',
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -166,6 +185,17 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 WHITENOISE_USE_FINDERS = True  # serve app/static files even if collectstatic was skipped
 MEDIA_URL = "media/"
 MEDIA_ROOT = BASE_DIR / "media"
+
+# Thumbnail produk di-resize & di-cache lokal (catalog/thumbnails.py), bukan lewat images.weserv.nl
+THUMBNAIL_ROOT = MEDIA_ROOT / "thumbs"
+THUMBNAIL_URL = "/catalog/thumbs/"
+THUMBNAIL_FETCHER = os.getenv("THUMBNAIL_FETCHER", "catalog.thumbnails.http_fetch")
+THUMBNAIL_FETCH_TIMEOUT = 10
+THUMBNAIL_MAX_SOURCE_BYTES = 10 * 1024 * 1024
+
+# Reservasi stok saat add-to-cart (cart/reservations.py): lama hold dalam detik, 0 = nonaktif.
+# Hold yang expired dilepas `manage.py sweep_cart_holds` (cron / --every).
+CART_HOLD_TTL = int(os.getenv('CART_HOLD_TTL', '0'))
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
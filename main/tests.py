@@ -5,114 +5,55 @@ from unittest.mock import patch, MagicMock
 
 class MainBase(TestCase):
     def setUp(self):
+        from django.core.cache import cache
+        # versi katalog ada di DB dan ikut di-rollback per test -> key cache count bisa terulang
+        cache.clear()
         self.client = Client()
 
 
 
-class FakeItem:
-    def __init__(self, id_hex, name, desc, price):
-        self.id = f"{id_hex[0:8]}-{id_hex[8:12]}-{id_hex[12:16]}-{id_hex[16:20]}-{id_hex[20:32]}"
-        self.product_name = name
-        self.description = desc
-        self.price = price
-
-
-class FakeQS:
-    def __init__(self, items):
-        self._items = list(items)
-
-    def _clone(self, items):
-        return FakeQS(items)
-
-    def all(self):
-        return self
-
-    def filter(self, *args, **kwargs):
-        items = self._items
-        if "price__gte" in kwargs:
-            lo = kwargs["price__gte"]
-            items = [x for x in items if x.price >= lo]
-        if "price__lt" in kwargs:
-            hi = kwargs["price__lt"]
-            items = [x for x in items if x.price < hi]
-        term = None
-        for k, v in kwargs.items():
-            if k.endswith("__icontains"):
-                term = str(v).lower()
-        if not term and args:
-            q = args[0]
-            children = getattr(q, "children", None)
-            if children:
-                for (k, v) in children:
-                    if k.endswith("__icontains"):
-                        term = str(v).lower()
-                        break
-        if term:
-            items = [x for x in items if term in x.product_name.lower() or term in x.description.lower()]
-        return self._clone(items)
-
-    def order_by(self, *fields):
-        items = self._items
-        for field in reversed(fields):
-            rev = field.startswith("-")
-            key = field[1:] if rev else field
-            if key == "price":
-                items = sorted(items, key=lambda x: x.price, reverse=rev)
-            elif key == "id":
-                items = sorted(items, key=lambda x: x.id, reverse=rev)
-        return self._clone(items)
-
-    def count(self):
-        return len(self._items)
-
-    def __iter__(self):
-        return iter(self._items)
-
-    def __len__(self):
-        return len(self._items)
-
-    def __getitem__(self, sl):
-        return self._items[sl]
-
-
 class ShowMainTests(MainBase):
-    @patch("main.views.Product")
-    def test_show_main_basic_pagination_and_total(self, Product):
-        items = [FakeItem(f"{i:032x}", f"Prod {i}", "desc", price=1000 * i) for i in range(1, 21)]
-        qs = FakeQS(items)
-        Product.objects.all.return_value = qs
-        resp = self.client.get(reverse("main:show_main"), {"page": 1})
+    def _make(self, name, price, desc="desc"):
+        from catalog.models import Product
+        return Product.objects.create(product_name=name, description=desc, price=price)
+
+    def test_show_main_basic_pagination_and_total(self):
+        for i in range(1, 21):
+            self._make(f"Prod {i}", 1000 * i)
+        resp = self.client.get(reverse("main:show_main"))
         self.assertEqual(resp.status_code, 200)
         ctx = resp.context
         self.assertIn("page_obj", ctx)
         self.assertEqual(ctx["total_found"], 20)
         self.assertEqual(len(ctx["page_obj"].object_list), 12)
+        self.assertTrue(ctx["page_obj"].has_next)
+
+        resp2 = self.client.get(reverse("main:show_main"), {"cursor": ctx["page_obj"].next_cursor})
+        page2 = resp2.context["page_obj"]
+        self.assertEqual(len(page2.object_list), 8)
+        self.assertFalse(page2.has_next)
+        self.assertTrue(page2.has_previous)
+        seen = {p.pk for p in ctx["page_obj"].object_list} | {p.pk for p in page2.object_list}
+        self.assertEqual(len(seen), 20)
+
+        resp3 = self.client.get(reverse("main:show_main"), {"cursor": page2.prev_cursor})
+        self.assertEqual(
+            [p.pk for p in resp3.context["page_obj"].object_list],
+            [p.pk for p in ctx["page_obj"].object_list],
+        )
 
-    @patch("main.views.Product")
-    def test_show_main_search_q(self, Product):
-        items = [
-            FakeItem(f"{1:032x}", "Yoga Mat", "Good mat", 150000),
-            FakeItem(f"{2:032x}", "Bottle", "Water bottle", 80000),
-        ]
-        qs = FakeQS(items)
-        Product.objects.all.return_value = qs
+    def test_show_main_search_q(self):
+        self._make("Yoga Mat", 150000, "Good mat")
+        self._make("Bottle", 80000, "Water bottle")
         resp = self.client.get(reverse("main:show_main"), {"q": "yoga"})
         self.assertEqual(resp.status_code, 200)
         ctx = resp.context
         self.assertEqual(ctx["total_found"], 1)
         self.assertEqual(ctx["page_obj"].object_list[0].product_name, "Yoga Mat")
 
-    @patch("main.views.Product")
-    def test_show_main_price_filter_and_order(self, Product):
-        items = [
-            FakeItem(f"{1:032x}", "A", "x", 150_000),
-            FakeItem(f"{2:032x}", "B", "x", 300_000),
-            FakeItem(f"{3:032x}", "C", "x", 700_000),
-            FakeItem(f"{4:032x}", "D", "x", 1_500_000),
-            FakeItem(f"{5:032x}", "E", "x", 6_000_000),
-        ]
-        qs = FakeQS(items)
-        Product.objects.all.return_value = qs
+    def test_show_main_price_filter_and_order(self):
+        for name, price in [("A", 150_000), ("B", 300_000), ("C", 700_000), ("D", 1_500_000), ("E", 6_000_000)]:
+            self._make(name, price, "x")
         resp = self.client.get(reverse("main:show_main"), {"price": "200k-500k", "order": "-price"})
         self.assertEqual(resp.status_code, 200)
         ctx = resp.context
@@ -124,11 +65,17 @@ class ShowMainTests(MainBase):
         self.assertEqual(resp2.context["total_found"], 1)
         self.assertEqual(resp2.context["page_obj"].object_list[0].price, 6_000_000)
 
+    def test_show_main_bad_cursor_falls_back_to_first_page(self):
+        self._make("Only", 1000)
+        resp = self.client.get(reverse("main:show_main"), {"cursor": "garbage"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.context["page_obj"].object_list), 1)
+
 
 class LandingHighlightsTests(MainBase):
-    @patch("main.views.render_to_string")
+    @patch("main.views.render_cards")
     @patch("main.views.Product")
-    def test_landing_highlights_respects_exclude_and_count(self, Product, render_to_string):
+    def test_landing_highlights_respects_exclude_and_count(self, Product, render_cards):
         p1 = MagicMock()
         p1.id = 101
         p2 = MagicMock()
@@ -137,7 +84,7 @@ class LandingHighlightsTests(MainBase):
         Product.objects.filter.return_value = qs
         qs.exclude.return_value = qs
         qs.order_by.return_value = [p1, p2]
-        render_to_string.side_effect = [
+        render_cards.return_value = [
             "<div>card101</div>",
             "<div>card102</div>",
         ]
@@ -153,3 +100,60 @@ class LandingHighlightsTests(MainBase):
         self.assertIn("card101", payload["cards"][0])
         self.assertIn("wrap-102", payload["cards"][1])
         self.assertIn("card102", payload["cards"][1])
+
+
+class HotQueryIndexTests(TestCase):
+    """EXPLAIN tiap query hot path harus memakai index (lihat migrasi *_hot_query_indexes)."""
+
+    def setUp(self):
+        from bookingkelas.models import Booking, ClassSessions
+        from cart.models import Cart
+        from catalog.models import Product
+        from django.contrib.auth import get_user_model
+        User = get_user_model()
+        self.user = User.objects.create_user(username="idx", password="pw")
+        self.cart = Cart.objects.create(user=self.user)
+        self.session = ClassSessions.objects.create(
+            title="Core - Monday", category="daily", instructor="A", price=1, room="R1", time="10.00 AM - 11.30 AM",
+        )
+        Booking.objects.create(user=self.user, session=self.session)
+        self.product = Product.objects.create(product_name="P", description="d", price=1)
+
+    def assertUsesIndex(self, qs, index_name=None):
+        from django.db import connection
+        if connection.vendor == "postgresql":
+            # tabel test kecil -> planner lebih suka seq scan; paksa supaya yang diuji ketersediaan index
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        plan = qs.explain()
+        if index_name:
+            self.assertIn(index_name, plan)
+        self.assertRegex(plan, r"USING (COVERING )?INDEX|USING INTEGER PRIMARY KEY|Index (Only )?Scan")
+        self.assertNotIn("TEMP B-TREE FOR ORDER BY", plan)
+        return plan
+
+    def test_catalog_orderings(self):
+        from catalog.models import Product
+        self.assertUsesIndex(Product.objects.filter(inStock=True).order_by("-id")[:4], "catalog_prod_instock_id_idx")
+        self.assertUsesIndex(Product.objects.order_by("price", "-id")[:12], "catalog_prod_price_id_idx")
+        self.assertUsesIndex(Product.objects.order_by("-price", "-id")[:12], "catalog_prod_price_desc_idx")
+
+    def test_selected_cart_items(self):
+        # SQLite bisa pilih index (cart, version) yang prefix-nya sama; yang penting lewat index per cart
+        self.assertUsesIndex(self.cart.items.filter(is_selected=True), "cart_item_cart_")
+
+    def test_active_bookings(self):
+        from bookingkelas.models import Booking
+        self.assertUsesIndex(
+            Booking.objects.filter(user=self.user, session=self.session, is_cancelled=False),
+            "booking_user_sess_cancel_idx",
+        )
+        self.assertUsesIndex(
+            Booking.objects.filter(user=self.user, is_cancelled=False).order_by("-created_at"),
+            "booking_active_user_idx",
+        )
+
+    def test_order_items_by_product(self):
+        from checkout.models import ProductOrderItem
+        # FK product sudah ter-index otomatis oleh Django
+        self.assertUsesIndex(ProductOrderItem.objects.filter(product=self.product), "product_id")
@@ -1,10 +1,10 @@
 from django.shortcuts import render
+from catalog.cards import render_cards
 from catalog.models import Product
+from catalog.search import search_products
+from catalog.pagination import InvalidCursor, cached_count, keyset_page
 from bookingkelas.models import ClassSessions, WEEKDAYS
-from django.core.paginator import Paginator
-from django.db.models import Count, Q
 from django.http import JsonResponse
-from django.template.loader import render_to_string
 
 PRICE_RANGES = [
     ("0-200k", "≤ Rp200.000", 0, 200_000),
@@ -22,14 +22,9 @@ def landing_view(request):
     highlights = Product.objects.all().order_by("-id")[:8]
     weekday_map = _weekday_map()
 
-    qs = (
-        ClassSessions.objects
-        .annotate(num_bookings=Count("bookings", distinct=True))
-        .filter(num_bookings__gt=0)
-        .order_by("-num_bookings", "-id")  
-    )
-
-    qs = qs[:6]
+    # counter total_bookings di-maintain signal/checkout (bookingkelas/counters.py) -> top-N ter-index
+    popular = ClassSessions.objects.filter(total_bookings__gt=0)
+    qs = popular.order_by("-total_bookings", "-id")[:6]
 
     def serialize_sessions(queryset):
         data = []
@@ -44,7 +39,7 @@ def landing_view(request):
                 "price": s.price,
                 "capacity_current": s.capacity_current,
                 "capacity_max": s.capacity_max,
-                "num_bookings": s.num_bookings,
+                "num_bookings": s.total_bookings,
                 "days_names_list": days_names,
                 "id": s.id,
                 "category": s.category,
@@ -53,34 +48,30 @@ def landing_view(request):
 
     sessions = serialize_sessions(qs)
 
+    shown = list(highlights[:6])
     context = {
         "highlights": highlights,
+        "highlight_cards": list(zip(shown, render_cards(shown, request))),
         "sessions": sessions,
+        # category disimpan lowercase (CATEGORY_CHOICES) -> exact match supaya index kepakai
         "daily_classes": serialize_sessions(
-            ClassSessions.objects
-            .annotate(num_bookings=Count("bookings", distinct=True))
-            .filter(num_bookings__gt=0, category__iexact="daily")
-            .order_by("-num_bookings")[:3]
+            popular.filter(category="daily").order_by("-total_bookings", "-id")[:3]
         ),
         "weekly_classes": serialize_sessions(
-            ClassSessions.objects
-            .annotate(num_bookings=Count("bookings", distinct=True))
-            .filter(num_bookings__gt=0, category__iexact="weekly")
-            .order_by("-num_bookings")[:3]
+            popular.filter(category="weekly").order_by("-total_bookings", "-id")[:3]
         ),
     }
 
     return render(request, "landing.html", context)
 
+SHOP_PAGE_SIZE = 12
+
 def show_main(request):
     q = (request.GET.get("q") or "").strip()                 
-    qs = Product.objects.all().order_by("-id")
+    qs = Product.objects.all()
 
     if q:
-        qs = qs.filter(
-            Q(product_name__icontains=q) |
-            Q(description__icontains=q)
-        )
+        qs = search_products(qs, q, ordered=False)  # full-text + ranking relevansi
 
     selected_price = request.GET.get("price", "")
     if selected_price:
@@ -94,18 +85,24 @@ def show_main(request):
 
     order = request.GET.get("order")
     if order in {"price", "-price"}:
-        qs = qs.order_by(order, "-id")
+        ordering = order
+    else:
+        ordering = "relevance" if q else "-id"
 
-    paginator = Paginator(qs, 12)
-    page_obj = paginator.get_page(request.GET.get("page"))
+    # keyset pagination: cursor opaque dari link prev/next, bukan nomor halaman
+    try:
+        page_obj = keyset_page(qs, ordering, request.GET.get("cursor"), SHOP_PAGE_SIZE)
+    except InvalidCursor:
+        page_obj = keyset_page(qs, ordering, None, SHOP_PAGE_SIZE)
 
     return render(request, "main.html", {
         "page_obj": page_obj,
+        "cards": list(zip(page_obj.object_list, render_cards(page_obj.object_list, request))),
         "price_ranges": PRICE_RANGES,
         "selected_price": selected_price,
         "order": order or "",
         "q": q,                                  
-        "total_found": qs.count(),               
+        "total_found": cached_count(qs),               
     })
     
 def landing_highlights(request):
@@ -118,14 +115,10 @@ def landing_highlights(request):
           .exclude(id__in=exclude_ids)
           .order_by("-id"))[:count]
 
-    cards = []
-    for p in qs:
-        card_html = render_to_string(
-            "product_card.html",
-            {"p": p, "user": request.user},
-            request=request,
-        )
-        wrapper = f'<div class="w-[312px]" data-card-wrapper id="wrap-{p.id}">{card_html}</div>'
-        cards.append(wrapper)
+    products = list(qs)
+    cards = [
+        f'<div class="w-[312px]" data-card-wrapper id="wrap-{p.id}">{card_html}</div>'
+        for p, card_html in zip(products, render_cards(products, request))
+    ]
 
     return JsonResponse({"ok": True, "cards": cards, "count": len(cards)})
\ No newline at end of file